@@ -0,0 +1,553 @@
+# bench.py
+"""
+Benchmarks de Magnesium.
+
+Uso:
+    python src/bench.py snapshot [--files N] [--size BYTES] [--workers 1,2,4]
+    python src/bench.py compress [--corpus DIR]
+    python src/bench.py merge-base [--commits N] [--branches B]
+    python src/bench.py diff-memory [--lines N] [--changes C]
+    python src/bench.py diff [--corpus DIR] [--edits E]
+    python src/bench.py diff-algorithms [--corpus DIR] [--edits E]
+    python src/bench.py renames [--files N]
+    python src/bench.py hashes [--entries N] [--commits C]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+from hashlib import sha256
+from pathlib import Path
+from time import perf_counter
+
+from magnesium.interfaces.data_compressor import (
+    Bz2Compressor,
+    DataCompressor,
+    GzipCompressor,
+    LzmaCompressor,
+    NoCompressor,
+    ZlibCompressor,
+    ZstdCompressor,
+    zstd,
+)
+from magnesium.application.merge import ahead_behind, is_ancestor, merge_base
+from magnesium.interfaces.commit_graph import LocalCommitGraph
+from magnesium.interfaces.differ import (
+    Differ,
+    HeuristicDiff,
+    HistogramDiff,
+    MyersDiff,
+    PatienceDiff,
+)
+from magnesium.interfaces.data_encoder import Utf8Encoder
+from magnesium.interfaces.file_store import LocalFileStore
+from magnesium.interfaces.object_path_builder import LocalObjectPathBuilder
+from magnesium.object_values import (
+    Blob,
+    Commit,
+    DirEntry,
+    Email,
+    FileEntry,
+    Sha256Hash,
+    Tree,
+)
+from mg import SimpleSnapshotTool
+
+
+def _make_work_dir(root: Path, files: int, size: int) -> Path:
+    """Crea un directorio de trabajo con archivos de texto pseudoaleatorios"""
+    work_dir = root / "work"
+    rng = random.Random(1234)
+    words = [f"palabra{i}" for i in range(512)]
+    for i in range(files):
+        directory = work_dir / f"dir{i % 32}"
+        directory.mkdir(parents=True, exist_ok=True)
+        lines: list[str] = []
+        written = 0
+        while written < size:
+            line = " ".join(rng.choices(words, k=12)) + "\n"
+            lines.append(line)
+            written += len(line)
+        (directory / f"file{i}.txt").write_text("".join(lines), encoding="utf-8")
+    return work_dir
+
+
+def bench_snapshot(files: int, size: int, workers: list[int]):
+    """Mide build_tree sobre un árbol nuevo con distinta cantidad de hilos"""
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = _make_work_dir(Path(tmp), files, size)
+        print(f"snapshot: {files} archivos de ~{size} bytes")
+
+        baseline: float | None = None
+        tree_hash = None
+        for count in workers:
+            # Repositorio vacío en cada corrida para no reutilizar objetos
+            repo_dir = Path(tmp) / f"repo-{count}"
+            tool = SimpleSnapshotTool(str(work_dir), str(repo_dir), workers=count)
+
+            start = perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = tool.build_tree(work_dir)
+            elapsed = perf_counter() - start
+
+            baseline = baseline or elapsed
+            if tree_hash is not None and result.sha != tree_hash:
+                raise AssertionError(f"Tree distinto con {count} hilos")
+            tree_hash = result.sha
+            speedup = baseline / elapsed
+            print(f"  workers={count:<3} {elapsed:8.3f}s  speedup x{speedup:.2f}")
+
+
+def _load_corpus(corpus: Path) -> list[bytes]:
+    """Lee todos los archivos de un directorio, ignorando los ocultos"""
+    files: list[bytes] = []
+    for path in sorted(corpus.rglob("*")):
+        relative = path.relative_to(corpus)
+        if any(part.startswith(".") for part in relative.parts):
+            continue
+        if path.is_file():
+            files.append(path.read_bytes())
+    return files
+
+
+def bench_compress(corpus: Path):
+    """Compara velocidad y relación de compresión de cada codec, objeto a objeto"""
+    files = _load_corpus(corpus)
+    total = sum(len(data) for data in files)
+    print(f"compress: {len(files)} archivos, {total / 1e6:.1f} MB de {corpus}")
+
+    codecs: list[tuple[str, DataCompressor]] = [
+        ("none", NoCompressor()),
+        ("gzip-9", GzipCompressor(9)),
+        ("zlib-1", ZlibCompressor(1)),
+        ("zlib-6", ZlibCompressor(6)),
+        ("bz2-9", Bz2Compressor(9)),
+        ("lzma-6", LzmaCompressor(6)),
+    ]
+    if zstd is not None:
+        codecs += [("zstd-3", ZstdCompressor(3)), ("zstd-19", ZstdCompressor(19))]
+
+    print(f"  {'codec':<8} {'ratio':>7} {'comp MB/s':>10} {'decomp MB/s':>12}")
+    for name, codec in codecs:
+        start = perf_counter()
+        compressed = [codec.compress(data) for data in files]
+        compress_time = perf_counter() - start
+
+        start = perf_counter()
+        for data in compressed:
+            _ = codec.decompress(data)
+        decompress_time = perf_counter() - start
+
+        ratio = total / max(1, sum(len(data) for data in compressed))
+        compress_speed = total / 1e6 / max(compress_time, 1e-9)
+        decompress_speed = total / 1e6 / max(decompress_time, 1e-9)
+        print(
+            f"  {name:<8} {ratio:7.2f} {compress_speed:10.1f} {decompress_speed:12.1f}"
+        )
+
+
+def _make_graph(
+    root: Path, commits: int, branches: int
+) -> tuple[LocalCommitGraph, list[Sha256Hash], list[Sha256Hash]]:
+    """
+    Arma un grafo sintético. Con branches=1 es una historia lineal; si no,
+    cada commit cae en una rama al azar y de vez en cuando mezcla otra rama.
+    Devuelve el grafo, todos los commits y la punta de cada rama.
+    """
+    rng = random.Random(1234)
+    graph = LocalCommitGraph(root / "graph", LocalFileStore())
+    tree = Sha256Hash(sha256(b"tree").hexdigest())
+    email = Email("bench@magnesium.cl")
+    start = datetime(2020, 1, 1)
+
+    shas: list[Sha256Hash] = []
+    tips: list[Sha256Hash | None] = [None] * branches
+    batch: list[tuple[Sha256Hash, Commit]] = []
+    for i in range(commits):
+        branch = rng.randrange(branches)
+        parents = [tips[branch]] if tips[branch] is not None else []
+        if branches > 1 and rng.random() < 0.2:
+            other = tips[rng.randrange(branches)]
+            if other is not None and other not in parents:
+                parents.append(other)
+        if not parents and shas:
+            # Las ramas nuevas salen de algún commit anterior
+            parents = [shas[rng.randrange(len(shas))]]
+
+        sha = Sha256Hash(sha256(str(i).encode()).hexdigest())
+        commit = Commit(
+            "bench", email, f"c{i}", start + timedelta(minutes=i), tree, parents
+        )
+        batch.append((sha, commit))
+        shas.append(sha)
+        tips[branch] = sha
+
+        if len(batch) == 10000:
+            graph.add(batch)
+            batch = []
+    graph.add(batch)
+    return graph, shas, [tip for tip in tips if tip is not None]
+
+
+def bench_merge_base(commits: int, branches: int):
+    """Mide is_ancestor, merge_base y ahead_behind sobre DAGs sintéticos"""
+    for name, count in (("lineal", 1), ("con merges", branches)):
+        with tempfile.TemporaryDirectory() as tmp:
+            start = perf_counter()
+            graph, shas, tips = _make_graph(Path(tmp), commits, count)
+            print(
+                f"merge-base: {commits} commits, {name} "
+                f"(grafo en {perf_counter() - start:.2f}s)"
+            )
+
+            head = shas[-1]
+            queries = [
+                ("is_ancestor(raíz, head)", lambda: is_ancestor(graph, shas[0], head)),
+                ("is_ancestor(head, raíz)", lambda: is_ancestor(graph, head, shas[0])),
+                (
+                    "merge_base(head, medio)",
+                    lambda: merge_base(graph, head, shas[len(shas) // 2]),
+                ),
+                (
+                    "merge_base(ramas)",
+                    lambda: merge_base(graph, tips[0], tips[-1], *tips[1:-1]),
+                ),
+                ("ahead_behind(ramas)", lambda: ahead_behind(graph, tips[0], tips[-1])),
+            ]
+            for label, query in queries:
+                start = perf_counter()
+                result = query()
+                elapsed = perf_counter() - start
+                if isinstance(result, Sha256Hash):
+                    result = result.sha[:8]
+                print(f"  {label:<26} {elapsed * 1000:10.2f} ms  {result}")
+
+
+def _make_versions(lines: int, changes: int) -> tuple[list[str], list[str]]:
+    """Dos versiones de un archivo de texto que difieren en `changes` lugares"""
+    rng = random.Random(1234)
+    base = [f"línea {i} {rng.random()}\n" for i in range(lines)]
+    source = list(base)
+    for _ in range(changes):
+        position = rng.randrange(len(source))
+        kind = rng.randrange(3)
+        if kind == 0:
+            source[position] = f"cambio {rng.random()}\n"
+        elif kind == 1:
+            source.insert(position, f"nueva {rng.random()}\n")
+        elif len(source) > 1:
+            del source[position]
+    # Como al leer dos blobs: las líneas iguales son strings distintos
+    return base, "".join(source).splitlines(keepends=True)
+
+
+def bench_diff_memory(lines: int, changes: int):
+    """Compara tiempo y pico de memoria del Myers clásico y el lineal"""
+    base, source = _make_versions(lines, changes)
+    print(f"diff-memory: {lines} líneas, {changes} cambios")
+
+    # Sin preprocesar, para medir sólo el algoritmo
+    classic_threshold = 2 * (len(base) + len(source))
+    for name, differ in (
+        ("clásico", MyersDiff(linear_threshold=classic_threshold, preprocess=False)),
+        ("lineal", MyersDiff(linear_threshold=0, preprocess=False)),
+        ("auto", MyersDiff()),
+    ):
+        tracemalloc.start()
+        start = perf_counter()
+        opcodes = differ.diff_lines(base, source)
+        elapsed = perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        edits = sum(
+            base_length + source_length
+            for operation, _, base_length, _, source_length in opcodes
+            if operation != "equal"
+        )
+        print(
+            f"  {name:<8} {elapsed:8.3f}s  pico {peak / 1e6:9.1f} MB  "
+            f"{edits} líneas editadas"
+        )
+
+
+def bench_diff(corpus: Path, edits: int):
+    """
+    Diff de archivos de código con unos pocos cambios, con y sin el
+    preprocesamiento de líneas (recorte, enteros y descarte de únicas)
+    """
+    rng = random.Random(1234)
+    pairs: list[tuple[list[str], list[str]]] = []
+    for data in _load_corpus(corpus):
+        base = data.decode("utf-8", errors="replace").splitlines(keepends=True)
+        if len(base) < 20:
+            continue
+        source = list(base)
+        for _ in range(edits):
+            position = rng.randrange(len(source))
+            source[position] = f"editada {rng.random()}\n"
+        # Como al leer dos blobs: las líneas iguales son strings distintos
+        pairs.append((base, "".join(source).splitlines(keepends=True)))
+
+    total = sum(len(base) for base, _ in pairs)
+    print(f"diff: {len(pairs)} archivos, {total} líneas, {edits} cambios por archivo")
+
+    baseline: float | None = None
+    for name, differ in (
+        ("sin preprocesar", MyersDiff(preprocess=False)),
+        ("preprocesado", MyersDiff()),
+    ):
+        # El mejor de varios intentos, para no medir ruido
+        elapsed = float("inf")
+        for _ in range(5):
+            start = perf_counter()
+            for base, source in pairs:
+                differ.diff_lines(base, source)
+            elapsed = min(elapsed, perf_counter() - start)
+        baseline = baseline or elapsed
+        print(f"  {name:<16} {elapsed:8.3f}s  speedup x{baseline / elapsed:.2f}")
+
+
+def _edit_like_a_developer(
+    rng: random.Random, lines: list[str], edits: int
+) -> list[str]:
+    """Cambios típicos: líneas editadas, bloques movidos y bloques nuevos"""
+    source = list(lines)
+    for _ in range(edits):
+        kind = rng.randrange(3)
+        position = rng.randrange(len(source))
+        if kind == 0:
+            source[position] = f"    editada = {rng.random()}\n"
+        elif kind == 1:
+            # Mover un bloque de hasta 10 líneas
+            length = rng.randint(1, 10)
+            block = source[position : position + length]
+            del source[position : position + length]
+            target = rng.randrange(len(source) + 1)
+            source[target:target] = block
+        else:
+            block = ["\n", "    {\n", f"    {rng.random()}\n", "    }\n"]
+            source[position:position] = block
+    return "".join(source).splitlines(keepends=True)
+
+
+def bench_diff_algorithms(corpus: Path, edits: int):
+    """Compara tiempo, tamaño del script y cantidad de hunks de cada algoritmo"""
+    rng = random.Random(1234)
+    pairs: list[tuple[list[str], list[str]]] = []
+    for data in _load_corpus(corpus):
+        base = data.decode("utf-8", errors="replace").splitlines(keepends=True)
+        if len(base) >= 20:
+            pairs.append((base, _edit_like_a_developer(rng, base, edits)))
+
+    total = sum(len(base) for base, _ in pairs)
+    print(f"diff-algorithms: {len(pairs)} archivos, {total} líneas")
+    print(f"  {'algoritmo':<10} {'tiempo':>9} {'editadas':>9} {'hunks':>7}")
+
+    differs: list[tuple[str, Differ]] = [
+        ("myers", MyersDiff()),
+        ("patience", PatienceDiff()),
+        ("histogram", HistogramDiff()),
+        ("heuristic", HeuristicDiff()),
+    ]
+    for name, differ in differs:
+        edited = 0
+        hunks = 0
+        start = perf_counter()
+        for base, source in pairs:
+            for operation, _, base_length, _, source_length in differ.diff_lines(
+                base, source
+            ):
+                if operation != "equal":
+                    edited += base_length + source_length
+                    hunks += 1
+        elapsed = perf_counter() - start
+        print(f"  {name:<10} {elapsed:8.3f}s {edited:9} {hunks:7}")
+
+
+def bench_renames(files: int):
+    """
+    Un refactor que mueve todos los archivos de directorio y edita una
+    línea en cada uno; uno de cada diez se reescribe entero.
+    """
+    rng = random.Random(1234)
+    words = [f"palabra{i}" for i in range(512)]
+    with tempfile.TemporaryDirectory() as tmp:
+        tool = SimpleSnapshotTool(tmp, str(Path(tmp) / ".mg"))
+        repository = tool.repository
+
+        old_files: list[FileEntry] = []
+        new_files: list[FileEntry] = []
+        for i in range(files):
+            lines = [" ".join(rng.choices(words, k=8)) + "\n" for _ in range(40)]
+            old_files.append(
+                FileEntry(f"file{i}.py", 0o644, repository.save(Blob("".join(lines))))
+            )
+            if i % 10 == 0:
+                lines = [" ".join(rng.choices(words, k=8)) + "\n" for _ in range(40)]
+            else:
+                lines[rng.randrange(len(lines))] = f"editada {i}\n"
+            new_files.append(
+                FileEntry(f"file{i}.py", 0o644, repository.save(Blob("".join(lines))))
+            )
+
+        def tree(name: str, entries: list[FileEntry]) -> Tree:
+            directory = repository.save(Tree(directories=[], files=entries))
+            return Tree(directories=[DirEntry(name, 0o755, directory)], files=[])
+
+        base, source = tree("viejo", old_files), tree("nuevo", new_files)
+        print(f"renames: {files} archivos movidos y editados")
+        for name, differ in (
+            ("sin renombres", MyersDiff(repository, rename_threshold=None)),
+            ("renombres", MyersDiff(repository)),
+            ("con copias", MyersDiff(repository, detect_copies=True)),
+        ):
+            start = perf_counter()
+            result = differ.diff_trees(base, source)
+            elapsed = perf_counter() - start
+            print(
+                f"  {name:<14} {elapsed:8.3f}s  "
+                f"renombrados={len(result.renamed_files)} "
+                f"copiados={len(result.copied_files)} "
+                f"agregados={len(result.added_files)}"
+            )
+
+
+def bench_hashes(entries: int, commits: int):
+    """Crear hashes, leer un tree grande y reconstruir el índice del log"""
+    digests = [sha256(str(i).encode()).hexdigest() for i in range(entries)]
+    start = perf_counter()
+    hashes = [Sha256Hash(digest) for digest in digests]
+    elapsed = perf_counter() - start
+    print(f"hashes: {entries} entradas, {commits} commits")
+    print(f"  {'crear Sha256Hash':<24} {elapsed / entries * 1e9:10.0f} ns c/u")
+
+    start = perf_counter()
+    unique = len(set(hashes))
+    elapsed = perf_counter() - start
+    print(f"  {'conjunto de hashes':<24} {elapsed / entries * 1e9:10.0f} ns c/u")
+    assert unique == entries
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tool = SimpleSnapshotTool(tmp, str(Path(tmp) / ".mg"))
+        repository = tool.repository
+        blob = repository.save(Blob("contenido\n"))
+        tree = repository.save(
+            Tree(
+                directories=[],
+                files=[FileEntry(f"file{i}.txt", 0o644, blob) for i in range(entries)],
+            )
+        )
+
+        # Los padres distintos hacen que cada commit sea otro objeto
+        parent: Sha256Hash | None = None
+        email = Email("bench@magnesium.cl")
+        date = datetime(2020, 1, 1)
+        for i in range(commits):
+            commit = Commit(
+                "bench", email, f"c{i}", date, tree, [parent] if parent else []
+            )
+            parent = repository.save(commit)
+            tool.log_repo.push(parent)
+
+        elapsed = min(_timed(lambda: repository.load(tree)) for _ in range(10))
+        tracemalloc.start()
+        loaded = repository.load(tree)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del loaded
+        print(f"  {'cargar el tree':<24} {elapsed * 1000:10.2f} ms  {size // 1024} KiB")
+
+        def rebuild_log():
+            log = type(tool.log_repo)(
+                Path(tmp) / ".mg" / "logs",
+                LocalFileStore(),
+                Utf8Encoder(),
+                LocalObjectPathBuilder(Path(tmp) / ".mg" / "objects"),
+                repository,
+            )
+            return len(log)
+
+        elapsed = min(_timed(rebuild_log) for _ in range(5))
+        print(f"  {'índice del log':<24} {elapsed * 1000:10.2f} ms")
+
+
+def _timed(function) -> float:
+    start = perf_counter()
+    function()
+    return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de Magnesium")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot = commands.add_parser("snapshot", help="Snapshot serial vs paralelo")
+    snapshot.add_argument("--files", type=int, default=2000)
+    snapshot.add_argument("--size", type=int, default=64 * 1024)
+    snapshot.add_argument(
+        "--workers",
+        default=",".join(
+            str(n) for n in sorted({1, 2, 4, os.cpu_count() or 1})
+        ),
+    )
+
+    compress = commands.add_parser("compress", help="Velocidad vs relación")
+    compress.add_argument(
+        "--corpus", type=Path, default=Path(__file__).resolve().parent.parent
+    )
+
+    graph = commands.add_parser("merge-base", help="Consultas sobre el DAG")
+    graph.add_argument("--commits", type=int, default=100_000)
+    graph.add_argument("--branches", type=int, default=8)
+
+    memory = commands.add_parser("diff-memory", help="Memoria del diff de Myers")
+    memory.add_argument("--lines", type=int, default=5000)
+    memory.add_argument("--changes", type=int, default=500)
+
+    diff = commands.add_parser("diff", help="Diff con y sin preprocesamiento")
+    diff.add_argument(
+        "--corpus", type=Path, default=Path(__file__).resolve().parent.parent
+    )
+    diff.add_argument("--edits", type=int, default=5)
+
+    algorithms = commands.add_parser("diff-algorithms", help="Comparar algoritmos")
+    algorithms.add_argument(
+        "--corpus", type=Path, default=Path(__file__).resolve().parent.parent
+    )
+    algorithms.add_argument("--edits", type=int, default=10)
+
+    renames = commands.add_parser("renames", help="Detección de renombres")
+    renames.add_argument("--files", type=int, default=10_000)
+
+    hashes = commands.add_parser("hashes", help="Costo de los Sha256Hash")
+    hashes.add_argument("--entries", type=int, default=20_000)
+    hashes.add_argument("--commits", type=int, default=2000)
+
+    args = parser.parse_args()
+    if args.command == "snapshot":
+        workers = [int(n) for n in args.workers.split(",")]
+        bench_snapshot(args.files, args.size, workers)
+    elif args.command == "compress":
+        bench_compress(args.corpus)
+    elif args.command == "merge-base":
+        bench_merge_base(args.commits, args.branches)
+    elif args.command == "diff-memory":
+        bench_diff_memory(args.lines, args.changes)
+    elif args.command == "diff":
+        bench_diff(args.corpus, args.edits)
+    elif args.command == "diff-algorithms":
+        bench_diff_algorithms(args.corpus, args.edits)
+    elif args.command == "renames":
+        bench_renames(args.files)
+    elif args.command == "hashes":
+        bench_hashes(args.entries, args.commits)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,473 @@
 """
 A module to merge two commits.
+
+Las consultas de ancestros se resuelven sobre el grafo de commits, sin
+cargar objetos: se recorre el DAG desde ambos lados a la vez, siempre por el
+commit de mayor generación, y se corta en cuanto lo que queda por visitar es
+común a los dos lados. Un commit nunca es ancestro de otro de generación
+menor o igual, lo que permite podar las búsquedas.
+
+La mezcla de trees es de tres vías: una entrada que sólo cambió de un lado
+se toma de ese lado sin cargarla, así que sólo se leen los subtrees y blobs
+que cambiaron en los dos lados. Los blobs se mezclan línea a línea (diff3).
 """
 
+import io
+from collections.abc import Iterator
+from heapq import heappop, heappush
+
+from ..interfaces.commit_graph import CommitGraph
+from ..interfaces.differ import Differ, MyersDiff
+from ..interfaces.object_repository import ObjectRepository
+from ..object_values import (
+    Blob,
+    ConflictHunk,
+    DirEntry,
+    FileEntry,
+    MergeConflict,
+    MergeResult,
+    Sha256Hash,
+    Tree,
+)
+
+# Marcas del recorrido: alcanzable desde el primer lado, desde el segundo, y
+# ancestro de una base ya encontrada
+_LEFT = 1
+_RIGHT = 2
+_BOTH = _LEFT | _RIGHT
+_STALE = 4
+
+# Una entrada de tree: (es directorio, modo, sha)
+type _Entry = tuple[bool, int, Sha256Hash]
+
+
+def merge(
+    repository: ObjectRepository,
+    graph: CommitGraph,
+    ours: Sha256Hash,
+    theirs: Sha256Hash,
+    differ: Differ | None = None,
+) -> MergeResult:
+    """
+    Mezcla los trees de dos commits a partir de su mejor base común. Guarda
+    los trees y blobs resultantes (con marcadores donde hay conflictos) y
+    devuelve el tree junto con la lista de conflictos; crear el commit de
+    merge queda a cargo de quien llama.
+    """
+    base = merge_base(graph, ours, theirs)
+    tree, conflicts = merge_trees(
+        repository,
+        graph.tree(base) if base is not None else None,
+        graph.tree(ours),
+        graph.tree(theirs),
+        differ,
+    )
+    return MergeResult(tree=tree, base=base, conflicts=conflicts)
+
+
+def merge_trees(
+    repository: ObjectRepository,
+    base: Sha256Hash | None,
+    ours: Sha256Hash | None,
+    theirs: Sha256Hash | None,
+    differ: Differ | None = None,
+) -> tuple[Sha256Hash | None, list[MergeConflict]]:
+    """Mezcla de tres vías entre trees; None representa un tree ausente"""
+    conflicts: list[MergeConflict] = []
+    tree = _merge_trees(
+        repository, differ or MyersDiff(), base, ours, theirs, "", conflicts
+    )
+    return tree, conflicts
+
+
+def merge_blobs(
+    base: Blob,
+    ours: Blob,
+    theirs: Blob,
+    differ: Differ | None = None,
+    labels: tuple[str, str] = ("ours", "theirs"),
+) -> tuple[Blob, list[ConflictHunk]]:
+    """
+    diff3 entre blobs de texto. Las regiones que cambiaron de un solo lado se
+    toman de ese lado; las que cambiaron distinto en los dos quedan entre
+    marcadores de conflicto y se devuelven también como ConflictHunk.
+
+    Se mezclan los bytes tal cual: lo que no es UTF-8 llega a las líneas (y
+    a los ConflictHunk) como surrogates y vuelve a los mismos bytes.
+    """
+    if ours.content == theirs.content:
+        return ours, []
+
+    differ = differ or MyersDiff()
+    base_lines = _lines(base)
+    ours_lines = _lines(ours)
+    theirs_lines = _lines(theirs)
+
+    ours_matches = _matches(differ.diff_lines(base_lines, ours_lines))
+    theirs_matches = _matches(differ.diff_lines(base_lines, theirs_lines))
+    # Líneas de la base que siguen iguales en los dos lados
+    stable = [line for line in ours_matches if line in theirs_matches]
+
+    merged: list[str] = []
+    hunks: list[ConflictHunk] = []
+    o = a = b = 0
+    next_stable = 0
+    while True:
+        # Avanzar mientras los tres coincidan
+        while (
+            o < len(base_lines)
+            and ours_matches.get(o) == a
+            and theirs_matches.get(o) == b
+        ):
+            merged.append(base_lines[o])
+            o, a, b = o + 1, a + 1, b + 1
+
+        while next_stable < len(stable) and stable[next_stable] < o:
+            next_stable += 1
+        if next_stable < len(stable):
+            end = stable[next_stable]
+            end_a, end_b = ours_matches[end], theirs_matches[end]
+        else:
+            end, end_a, end_b = len(base_lines), len(ours_lines), len(theirs_lines)
+
+        base_chunk = base_lines[o:end]
+        ours_chunk = ours_lines[a:end_a]
+        theirs_chunk = theirs_lines[b:end_b]
+        if ours_chunk == base_chunk or ours_chunk == theirs_chunk:
+            merged.extend(theirs_chunk)
+        elif theirs_chunk == base_chunk:
+            merged.extend(ours_chunk)
+        else:
+            hunks.append(
+                ConflictHunk(
+                    position=len(merged),
+                    base=base_chunk,
+                    ours=ours_chunk,
+                    theirs=theirs_chunk,
+                )
+            )
+            merged.append(f"<<<<<<< {labels[0]}\n")
+            merged.extend(_terminated(ours_chunk))
+            merged.append("=======\n")
+            merged.extend(_terminated(theirs_chunk))
+            merged.append(f">>>>>>> {labels[1]}\n")
+
+        if next_stable >= len(stable):
+            break
+        o, a, b = end, end_a, end_b
+
+    return Blob(content="".join(merged).encode("utf-8", "surrogateescape")), hunks
+
+
+def is_ancestor(graph: CommitGraph, a: Sha256Hash, b: Sha256Hash) -> bool:
+    """True si a es ancestro de b (un commit es ancestro de sí mismo)"""
+    return _is_ancestor(graph, graph.position(a), graph.position(b))
+
+
+def merge_bases(
+    graph: CommitGraph, a: Sha256Hash, b: Sha256Hash, *more: Sha256Hash
+) -> list[Sha256Hash]:
+    """
+    Todos los ancestros comunes más cercanos (ninguno es ancestro de otro),
+    de mayor a menor generación. Con más de dos commits se buscan los
+    ancestros comunes a todos.
+    """
+    bases = _merge_bases(graph, graph.position(a), graph.position(b))
+    for other in more:
+        target = graph.position(other)
+        candidates: set[int] = set()
+        for base in bases:
+            candidates.update(_merge_bases(graph, base, target))
+        bases = _remove_redundant(graph, list(candidates))
+    return [graph.sha_at(position) for position in bases]
+
+
+def merge_base(
+    graph: CommitGraph, a: Sha256Hash, b: Sha256Hash, *more: Sha256Hash
+) -> Sha256Hash | None:
+    """La mejor base para mezclar, o None si no hay historia en común"""
+    bases = merge_bases(graph, a, b, *more)
+    return bases[0] if bases else None
+
+
+def ahead_behind(graph: CommitGraph, a: Sha256Hash, b: Sha256Hash) -> tuple[int, int]:
+    """
+    Cuántos commits alcanzables desde a no lo son desde b (ahead), y
+    cuántos alcanzables desde b no lo son desde a (behind).
+    """
+    ahead = 0
+    behind = 0
+    for _, flags in _paint(graph, graph.position(a), graph.position(b)):
+        if flags == _LEFT:
+            ahead += 1
+        elif flags == _RIGHT:
+            behind += 1
+    return ahead, behind
+
+
+def _is_ancestor(graph: CommitGraph, ancestor: int, descendant: int) -> bool:
+    if ancestor == descendant:
+        return True
+
+    # Nada por debajo de esta generación puede llevar hasta el ancestro
+    minimum = graph.generation_at(ancestor)
+    if graph.generation_at(descendant) <= minimum:
+        return False
+
+    visited = {descendant}
+    stack = [descendant]
+    while stack:
+        for parent in graph.parent_positions(stack.pop()):
+            if parent == ancestor:
+                return True
+            if parent in visited or graph.generation_at(parent) <= minimum:
+                continue
+            visited.add(parent)
+            stack.append(parent)
+    return False
+
+
+def _merge_bases(graph: CommitGraph, a: int, b: int) -> list[int]:
+    if a == b:
+        return [a]
+
+    bases = [
+        position for position, flags in _paint(graph, a, b) if flags == _BOTH
+    ]
+    return _remove_redundant(graph, bases)
+
+
+def _paint(graph: CommitGraph, a: int, b: int) -> Iterator[tuple[int, int]]:
+    """
+    Recorre los ancestros de a y b de mayor a menor generación, marcando de
+    qué lado se alcanza cada uno. Cuando un commit es alcanzable desde los
+    dos lados y no es ancestro de otra base, es una base: se marca STALE y la
+    marca se propaga a sus ancestros. El recorrido termina cuando sólo quedan
+    commits STALE en la cola.
+
+    Devuelve cada commit visitado con sus marcas finales (sin STALE); las
+    bases son los que quedan con las dos marcas.
+    """
+    if a == b:
+        yield a, _BOTH
+        return
+
+    flags: dict[int, int] = {a: _LEFT, b: _RIGHT}
+    queue: list[tuple[int, int]] = []
+    heappush(queue, (-graph.generation_at(a), a))
+    heappush(queue, (-graph.generation_at(b), b))
+    # Commits en la cola que todavía no son STALE
+    active = 2
+
+    while active:
+        _, position = heappop(queue)
+        current = flags[position]
+        if not current & _STALE:
+            active -= 1
+            if current & _BOTH == _BOTH:
+                yield position, _BOTH
+                current |= _STALE
+            else:
+                yield position, current
+        # Los commits STALE también propagan la marca: sus ancestros quedan
+        # descartados como bases
+        for parent in graph.parent_positions(position):
+            previous = flags.get(parent, 0)
+            if previous & current == current:
+                continue
+            updated = previous | current
+            flags[parent] = updated
+
+            if previous == 0:
+                heappush(queue, (-graph.generation_at(parent), parent))
+                if not updated & _STALE:
+                    active += 1
+            elif updated & _STALE and not previous & _STALE:
+                active -= 1
+
+
+def _remove_redundant(graph: CommitGraph, bases: list[int]) -> list[int]:
+    """Descarta las bases que son ancestros de otra base"""
+    bases = sorted(bases, key=graph.generation_at, reverse=True)
+    result: list[int] = []
+    for base in bases:
+        # Sólo una base de mayor generación puede descender de esta
+        if not any(_is_ancestor(graph, base, other) for other in result):
+            result.append(base)
+    return result
+
+
+def _merge_trees(
+    repository: ObjectRepository,
+    differ: Differ,
+    base: Sha256Hash | None,
+    ours: Sha256Hash | None,
+    theirs: Sha256Hash | None,
+    path: str,
+    conflicts: list[MergeConflict],
+) -> Sha256Hash | None:
+    # Si un lado no cambió, el resultado es el otro: no hace falta cargar nada
+    if ours == theirs or base == ours:
+        return theirs
+    if base == theirs:
+        return ours
+
+    base_entries = _load_entries(repository, base)
+    ours_entries = _load_entries(repository, ours)
+    theirs_entries = _load_entries(repository, theirs)
+
+    directories: list[DirEntry] = []
+    files: list[FileEntry] = []
+    names = base_entries.keys() | ours_entries.keys() | theirs_entries.keys()
+    for name in sorted(names):
+        merged = _merge_entry(
+            repository,
+            differ,
+            base_entries.get(name),
+            ours_entries.get(name),
+            theirs_entries.get(name),
+            f"{path}/{name}" if path else name,
+            conflicts,
+        )
+        if merged is None:
+            continue
+        is_dir, mode, sha = merged
+        if is_dir:
+            directories.append(DirEntry(name=name, mode=mode, sha=sha))
+        else:
+            files.append(FileEntry(name=name, mode=mode, sha=sha))
+
+    # Un directorio que quedó vacío desaparece
+    if not directories and not files:
+        return None
+    return repository.save(Tree(directories=directories, files=files))
+
+
+def _merge_entry(
+    repository: ObjectRepository,
+    differ: Differ,
+    base: _Entry | None,
+    ours: _Entry | None,
+    theirs: _Entry | None,
+    path: str,
+    conflicts: list[MergeConflict],
+) -> _Entry | None:
+    if ours == theirs or base == ours:
+        return theirs
+    if base == theirs:
+        return ours
+
+    # Cambió de los dos lados
+    if ours is None or theirs is None:
+        kept = ours if ours is not None else theirs
+        assert kept is not None
+        conflicts.append(_conflict(path, "modify/delete", base, ours, theirs))
+        return kept
+
+    if ours[0] and theirs[0]:
+        tree = _merge_trees(
+            repository,
+            differ,
+            base[2] if base is not None and base[0] else None,
+            ours[2],
+            theirs[2],
+            path,
+            conflicts,
+        )
+        return (True, ours[1], tree) if tree is not None else None
+
+    if ours[0] != theirs[0]:
+        conflicts.append(_conflict(path, "file/directory", base, ours, theirs))
+        return ours
+
+    # Archivo en los dos lados: gana el modo que cambió respecto de la base
+    base_file = base if base is not None and not base[0] else None
+    base_mode = base_file[1] if base_file is not None else ours[1]
+    mode = theirs[1] if ours[1] == base_mode else ours[1]
+    if ours[2] == theirs[2]:
+        return (False, mode, ours[2])
+
+    kind = "content" if base_file is not None else "add/add"
+    base_blob = (
+        _load_blob(repository, base_file[2]) if base_file is not None else Blob(b"")
+    )
+    ours_blob = _load_blob(repository, ours[2])
+    theirs_blob = _load_blob(repository, theirs[2])
+    if base_blob.is_binary() or ours_blob.is_binary() or theirs_blob.is_binary():
+        # Un binario no se puede mezclar por líneas: queda la versión propia
+        conflicts.append(_conflict(path, kind, base_file, ours, theirs))
+        return (False, mode, ours[2])
+
+    blob, hunks = merge_blobs(base_blob, ours_blob, theirs_blob, differ)
+    if hunks:
+        conflicts.append(_conflict(path, kind, base_file, ours, theirs, hunks))
+    return (False, mode, repository.save(blob))
+
+
+def _load_entries(
+    repository: ObjectRepository, sha: Sha256Hash | None
+) -> dict[str, _Entry]:
+    if sha is None:
+        return {}
+    tree = repository.load(sha)
+    if not isinstance(tree, Tree):
+        raise ValueError(f"Object {sha.sha} is not a Tree")
+
+    entries: dict[str, _Entry] = {}
+    for directory in tree.directories:
+        entries[directory.name] = (True, directory.mode, directory.sha)
+    for file in tree.files:
+        entries[file.name] = (False, file.mode, file.sha)
+    return entries
+
+
+def _load_blob(repository: ObjectRepository, sha: Sha256Hash) -> Blob:
+    blob = repository.load(sha)
+    if not isinstance(blob, Blob):
+        raise ValueError(f"Object {sha.sha} is not a Blob")
+    return blob
+
+
+def _conflict(
+    path: str,
+    kind: str,
+    base: _Entry | None,
+    ours: _Entry | None,
+    theirs: _Entry | None,
+    hunks: list[ConflictHunk] | None = None,
+) -> MergeConflict:
+    return MergeConflict(
+        path=path,
+        kind=kind,
+        base=base[2] if base is not None else None,
+        ours=ours[2] if ours is not None else None,
+        theirs=theirs[2] if theirs is not None else None,
+        hunks=hunks or [],
+    )
+
+
+def _lines(blob: Blob) -> list[str]:
+    """
+    Las líneas del blob cortadas sólo en "\n". A diferencia de get_lines(),
+    los bytes que no son UTF-8 no se reemplazan: se conservan con
+    surrogateescape para que el resultado no altere el contenido.
+    """
+    text = bytes(blob.content).decode("utf-8", "surrogateescape")
+    return io.StringIO(text, newline="\n").readlines()
+
+
+def _matches(opcodes: list[tuple[str, int, int, int, int]]) -> dict[int, int]:
+    """Línea de la base -> línea del otro lado, para las líneas iguales"""
+    matches: dict[int, int] = {}
+    for operation, base_start, base_length, source_start, _ in opcodes:
+        if operation == "equal":
+            for offset in range(base_length):
+                matches[base_start + offset] = source_start + offset
+    return matches
+
 
-def merge():
-    pass
+def _terminated(lines: list[str]) -> list[str]:
+    """Asegura que el marcador que sigue quede en su propia línea"""
+    if lines and not lines[-1].endswith("\n"):
+        return lines[:-1] + [lines[-1] + "\n"]
+    return lines
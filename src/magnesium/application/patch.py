@@ -0,0 +1,285 @@
+"""
+A module to render diffs as unified patches.
+
+Todo se genera línea a línea: los hunks salen directamente de los tramos
+del diff y el patch de un commit recorre el diff recursivo de trees
+archivo por archivo, así que nunca se arma el texto completo en memoria.
+"""
+
+from collections.abc import Iterator
+
+from ..interfaces.differ import Differ, MyersDiff
+from ..interfaces.object_repository import ObjectRepository
+from ..object_values import (
+    Blob,
+    Commit,
+    FileEntry,
+    OpcodeBlobDiff,
+    Sha256Hash,
+    Tree,
+)
+
+NO_NEWLINE: str = "\\ No newline at end of file\n"
+
+
+def unified_hunks(diff: OpcodeBlobDiff, context: int = 3) -> Iterator[str]:
+    """
+    Genera las líneas de los hunks ("@@ ... @@", " ", "-", "+") con
+    `context` líneas iguales alrededor de cada cambio.
+    """
+    for group in _grouped_opcodes(diff.opcodes, context):
+        _, base_start, _, source_start, _ = group[0]
+        _, last_base, last_base_length, last_source, last_source_length = group[-1]
+        base_end = last_base + last_base_length
+        source_end = last_source + last_source_length
+        yield (
+            f"@@ -{_format_range(base_start, base_end)} "
+            f"+{_format_range(source_start, source_end)} @@\n"
+        )
+
+        for operation, base_start, base_length, source_start, source_length in group:
+            if operation == "equal":
+                for line in diff.base_lines[base_start : base_start + base_length]:
+                    yield from _format_line(" ", line)
+                continue
+            for line in diff.base_lines[base_start : base_start + base_length]:
+                yield from _format_line("-", line)
+            for line in diff.source_lines[
+                source_start : source_start + source_length
+            ]:
+                yield from _format_line("+", line)
+
+
+def unified_diff(
+    base_path: str | None,
+    source_path: str | None,
+    diff: OpcodeBlobDiff,
+    context: int = 3,
+) -> Iterator[str]:
+    """Cabeceras "---"/"+++" seguidas de los hunks; None es /dev/null"""
+    hunks = unified_hunks(diff, context)
+    first = next(hunks, None)
+    if first is None:
+        return
+
+    yield f"--- {'a/' + base_path if base_path is not None else '/dev/null'}\n"
+    yield f"+++ {'b/' + source_path if source_path is not None else '/dev/null'}\n"
+    yield first
+    yield from hunks
+
+
+def commit_patch(
+    repository: ObjectRepository,
+    commit: Sha256Hash,
+    parent: Sha256Hash | None = None,
+    differ: Differ | None = None,
+    context: int = 3,
+) -> Iterator[str]:
+    """
+    El patch completo de un commit respecto de `parent` (por defecto, su
+    primer padre; si no tiene, contra un tree vacío). El differ tiene que
+    tener acceso al repositorio para recorrer los subdirectorios.
+    """
+    differ = differ or MyersDiff(repository)
+    commit_object = _load(repository, commit, Commit)
+    if parent is None and commit_object.parents:
+        parent = commit_object.parents[0]
+
+    source_tree = _load(repository, commit_object.tree, Tree)
+    if parent is None:
+        base_tree = Tree(directories=[], files=[])
+    else:
+        parent_object = _load(repository, parent, Commit)
+        if parent_object.tree == commit_object.tree:
+            return
+        base_tree = _load(repository, parent_object.tree, Tree)
+
+    if not (source_tree.files or source_tree.directories) and not (
+        base_tree.files or base_tree.directories
+    ):
+        return
+
+    tree_diff = differ.diff_trees(base_tree, source_tree)
+
+    # (ruta, entrada vieja, entrada nueva, parecido, es copia), por ruta
+    changes: list[
+        tuple[str, FileEntry | None, FileEntry | None, int | None, bool]
+    ] = []
+    changes += [
+        (e.content.name, None, e.content, None, False) for e in tree_diff.added_files
+    ]
+    changes += [
+        (e.content.name, e.content, None, None, False)
+        for e in tree_diff.deleted_files
+    ]
+    changes += [
+        (e.content.name, e.previous, e.content, None, False)
+        for e in tree_diff.modified_files
+    ]
+    changes += [
+        (e.content.name, e.previous, e.content, e.similarity, False)
+        for e in tree_diff.renamed_files
+    ]
+    changes += [
+        (e.content.name, e.previous, e.content, e.similarity, True)
+        for e in tree_diff.copied_files
+    ]
+    changes.sort(key=lambda change: change[0])
+
+    for _, previous, current, similarity, copy in changes:
+        yield from file_patch(
+            repository, differ, previous, current, context, similarity, copy
+        )
+
+
+def file_patch(
+    repository: ObjectRepository,
+    differ: Differ,
+    previous: FileEntry | None,
+    current: FileEntry | None,
+    context: int = 3,
+    similarity: int | None = None,
+    copy: bool = False,
+) -> Iterator[str]:
+    """
+    El patch de un archivo, con la cabecera "diff --git" y sus metadatos.
+    Si los nombres difieren es un renombre (o una copia, con `copy`).
+    """
+    assert previous is not None or current is not None
+    base_path = previous.name if previous is not None else None
+    source_path = current.name if current is not None else None
+    old_name = base_path if base_path is not None else source_path
+    new_name = source_path if source_path is not None else base_path
+
+    yield f"diff --git a/{old_name} b/{new_name}\n"
+    if previous is None and current is not None:
+        yield f"new file mode {_git_mode(current.mode)}\n"
+    elif current is None and previous is not None:
+        yield f"deleted file mode {_git_mode(previous.mode)}\n"
+    elif previous is not None and current is not None:
+        if previous.name != current.name:
+            if similarity is None and previous.sha == current.sha:
+                similarity = 100
+            if similarity is not None:
+                yield f"similarity index {similarity}%\n"
+            kind = "copy" if copy else "rename"
+            yield f"{kind} from {previous.name}\n"
+            yield f"{kind} to {current.name}\n"
+        if previous.mode != current.mode:
+            yield f"old mode {_git_mode(previous.mode)}\n"
+            yield f"new mode {_git_mode(current.mode)}\n"
+
+    if previous is not None and current is not None and previous.sha == current.sha:
+        return
+    old_sha = previous.sha.sha[:7] if previous is not None else "0" * 7
+    new_sha = current.sha.sha[:7] if current is not None else "0" * 7
+    if previous is not None and current is not None and previous.mode == current.mode:
+        yield f"index {old_sha}..{new_sha} {_git_mode(current.mode)}\n"
+    else:
+        yield f"index {old_sha}..{new_sha}\n"
+
+    base = (
+        _load(repository, previous.sha, Blob) if previous is not None else Blob(b"")
+    )
+    source = _load(repository, current.sha, Blob) if current is not None else Blob(b"")
+    if base.is_binary() or source.is_binary():
+        yield (
+            f"Binary files {'a/' + base_path if base_path else '/dev/null'} and "
+            f"{'b/' + source_path if source_path else '/dev/null'} differ\n"
+        )
+        return
+
+    # Los shas ya se conocen: un differ con caché no vuelve a hashear
+    diff = differ.diff_shas(
+        repository,
+        previous.sha if previous is not None else repository.hash_object(base),
+        current.sha if current is not None else repository.hash_object(source),
+        base,
+        source,
+    )
+    if not isinstance(diff, OpcodeBlobDiff):
+        raise TypeError("The differ must return opcode-based blob diffs")
+    yield from unified_diff(base_path, source_path, diff, context)
+
+
+def _grouped_opcodes(
+    opcodes: list[tuple[str, int, int, int, int]], context: int
+) -> Iterator[list[tuple[str, int, int, int, int]]]:
+    """
+    Agrupa los tramos en hunks: los cambios separados por menos de
+    2 * context líneas iguales van en el mismo hunk (como difflib).
+    """
+    if not any(operation != "equal" for operation, *_ in opcodes):
+        return
+
+    opcodes = list(opcodes)
+    # Recortar el contexto del principio y del final
+    operation, base_start, base_length, source_start, source_length = opcodes[0]
+    if operation == "equal":
+        skip = max(0, base_length - context)
+        opcodes[0] = (
+            "equal",
+            base_start + skip,
+            base_length - skip,
+            source_start + skip,
+            source_length - skip,
+        )
+    operation, base_start, base_length, source_start, source_length = opcodes[-1]
+    if operation == "equal":
+        keep = min(context, base_length)
+        opcodes[-1] = ("equal", base_start, keep, source_start, keep)
+
+    group: list[tuple[str, int, int, int, int]] = []
+    for opcode in opcodes:
+        operation, base_start, base_length, source_start, source_length = opcode
+        # Un tramo igual largo cierra el hunk y abre el siguiente
+        if operation == "equal" and base_length > 2 * context:
+            group.append(("equal", base_start, context, source_start, context))
+            yield group
+            skip = base_length - context
+            group = [
+                (
+                    "equal",
+                    base_start + skip,
+                    context,
+                    source_start + skip,
+                    context,
+                )
+            ]
+            continue
+        group.append(opcode)
+
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _format_range(start: int, end: int) -> str:
+    """Rango de un hunk en el formato de diff -u"""
+    length = end - start
+    if length == 1:
+        return f"{start + 1}"
+    if length == 0:
+        return f"{start},0"
+    return f"{start + 1},{length}"
+
+
+def _format_line(prefix: str, line: str) -> Iterator[str]:
+    if line.endswith("\n"):
+        yield prefix + line
+    else:
+        yield prefix + line + "\n"
+        yield NO_NEWLINE
+
+
+def _git_mode(mode: int) -> str:
+    """Modo al estilo git: los archivos llevan el tipo 100000"""
+    return f"{0o100000 | mode:o}"
+
+
+def _load[Object: (Blob, Tree, Commit)](
+    repository: ObjectRepository, sha: Sha256Hash, kind: type[Object]
+) -> Object:
+    loaded = repository.load(sha)
+    if not isinstance(loaded, kind):
+        raise ValueError(f"Object {sha.sha} is not a {kind.__name__}")
+    return loaded
@@ -0,0 +1,331 @@
+import os
+import struct
+import sys
+from collections import OrderedDict
+from hashlib import sha256
+from pathlib import Path
+from threading import Lock, get_ident
+from typing import override
+
+from ..object_values import Blob, InlineDiff, Sha256Hash, Tree
+from ..object_values.diffs import OpcodeBlobDiff, TreeDiff
+from .differ import Differ
+from .file_store import FileStore
+from .object_repository import ObjectRepository
+
+
+class CachedDiffer(Differ):
+    """
+    Decorador con caché para los diffs de blobs de cualquier Differ.
+
+    Los blobs se direccionan por contenido, así que el diff entre dos shas
+    con el mismo algoritmo nunca cambia y una entrada nunca queda
+    desactualizada. Hay dos niveles:
+      - en memoria, LRU por cantidad de entradas y por lo que ocupan las
+        líneas decodificadas que guarda cada diff: los pares que se piden
+        seguido no recalculan ni cargan nada
+      - en disco, en cache_dir: guarda sólo los tramos del diff, así que
+        un acierto evita el diff pero no la carga de los blobs. Se acota
+        por tamaño y se desalojan primero las entradas usadas hace más
+        tiempo (la fecha de modificación se actualiza en cada acierto)
+
+    La clave es (sha base, sha fuente, algoritmo). Si no se indica
+    algorithm, se arma con la clase del differ y sus opciones simples.
+    Los diffs de trees y de líneas se delegan sin caché.
+    """
+
+    MAGIC: bytes = b"MGDC\x01"
+    OPERATIONS: tuple[str, ...] = ("equal", "delete", "insert", "replace")
+
+    _HEADER = struct.Struct(">I")
+    _OPCODE = struct.Struct(">BIIII")
+
+    _differ: Differ
+    _repository: ObjectRepository
+    _cache_dir: Path
+    _store: FileStore
+    _algorithm: str
+    _max_entries: int
+    _max_bytes: int
+    _max_disk_bytes: int
+    _entries: OrderedDict[str, tuple[OpcodeBlobDiff, int]]
+    _size: int
+    _disk_size: int | None
+    _lock: Lock
+    _hits: int
+    _disk_hits: int
+    _misses: int
+
+    def __init__(
+        self,
+        differ: Differ,
+        repository: ObjectRepository,
+        cache_dir: Path,
+        store: FileStore,
+        algorithm: str | None = None,
+        max_entries: int = 256,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+    ) -> None:
+        self._differ = differ
+        self._repository = repository
+        self._cache_dir = cache_dir
+        self._store = store
+        self._algorithm = algorithm or self._describe(differ)
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        # Se calcula recién en la primera escritura
+        self._disk_size = None
+        self._lock = Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def disk_hits(self) -> int:
+        return self._disk_hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @override
+    def diff_blobs(self, base: Blob, source: Blob) -> OpcodeBlobDiff:
+        base_sha = self._repository.hash_object(base)
+        source_sha = self._repository.hash_object(source)
+        return self._diff(base_sha, source_sha, base, source, self._repository)
+
+    @override
+    def diff_shas(
+        self,
+        repository: ObjectRepository,
+        base: Sha256Hash,
+        source: Sha256Hash,
+        base_blob: Blob | None = None,
+        source_blob: Blob | None = None,
+    ) -> OpcodeBlobDiff:
+        # Los shas ya son la clave: no se vuelve a hashear, y con un acierto
+        # en memoria no se carga ninguno de los dos blobs
+        return self._diff(base, source, base_blob, source_blob, repository)
+
+    @override
+    def diff_trees(self, base: Tree, source: Tree) -> TreeDiff:
+        return self._differ.diff_trees(base, source)
+
+    @override
+    def diff_lines(
+        self, base: list[str], source: list[str]
+    ) -> list[tuple[str, int, int, int, int]]:
+        return self._differ.diff_lines(base, source)
+
+    @override
+    def diff_inline(
+        self,
+        diff: OpcodeBlobDiff,
+        granularity: str = "word",
+        max_line_length: int = 1000,
+        time_budget: float = 0.1,
+    ) -> list[InlineDiff]:
+        return self._differ.diff_inline(
+            diff, granularity, max_line_length, time_budget
+        )
+
+    def clear(self):
+        """Vacía la caché en memoria; la de disco se mantiene"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _diff(
+        self,
+        base_sha: Sha256Hash,
+        source_sha: Sha256Hash,
+        base: Blob | None,
+        source: Blob | None,
+        repository: ObjectRepository,
+    ) -> OpcodeBlobDiff:
+        key = sha256(
+            f"{base_sha.sha}:{source_sha.sha}:{self._algorithm}".encode()
+        ).hexdigest()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._copy(cached[0])
+
+        if base is None:
+            base = self._load_blob(repository, base_sha)
+        if source is None:
+            source = self._load_blob(repository, source_sha)
+
+        diff = None
+        opcodes = self._read_entry(key)
+        if opcodes is not None:
+            try:
+                diff = OpcodeBlobDiff(opcodes, base.get_lines(), source.get_lines())
+                self._disk_hits += 1
+            except AssertionError:
+                # Tramos que no cubren los blobs: la entrada no sirve
+                diff = None
+        if diff is None:
+            self._misses += 1
+            diff = self._differ.diff_blobs(base, source)
+            self._write_entry(key, diff.opcodes)
+
+        self._insert(key, diff, self._footprint(diff))
+        return self._copy(diff)
+
+    def _insert(self, key: str, diff: OpcodeBlobDiff, size: int):
+        # Un diff más grande que toda la caché no se guarda en memoria
+        if size > self._max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[key] = (diff, size)
+            self._size += size
+
+            while (
+                len(self._entries) > self._max_entries or self._size > self._max_bytes
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    @staticmethod
+    def _copy(diff: OpcodeBlobDiff) -> OpcodeBlobDiff:
+        """
+        Un diff nuevo sobre los mismos tramos y líneas: las listas que arma
+        al pedirlas son propias, así que quien las modifique no altera la caché
+        """
+        return OpcodeBlobDiff(diff.opcodes, diff.base_lines, diff.source_lines)
+
+    @staticmethod
+    def _footprint(diff: OpcodeBlobDiff) -> int:
+        """
+        Memoria aproximada de un diff en la caché: las listas de líneas ya
+        decodificadas y los tramos, no el tamaño de los blobs en disco
+        """
+        size = sys.getsizeof(diff.opcodes) + sum(map(sys.getsizeof, diff.opcodes))
+        for lines in (diff.base_lines, diff.source_lines):
+            size += sys.getsizeof(lines) + sum(map(sys.getsizeof, lines))
+        return size
+
+    def _entry_path(self, key: str) -> Path:
+        return self._cache_dir / key[:2] / key[2:]
+
+    def _read_entry(self, key: str) -> list[tuple[str, int, int, int, int]] | None:
+        path = self._entry_path(key)
+        try:
+            data = self._store.read(path)
+        except FileNotFoundError:
+            return None
+
+        # Una entrada rota (por ejemplo, una escritura cortada) es un fallo
+        if not data.startswith(self.MAGIC):
+            return None
+        try:
+            (count,) = self._HEADER.unpack_from(data, len(self.MAGIC))
+            offset = len(self.MAGIC) + self._HEADER.size
+            if len(data) != offset + count * self._OPCODE.size:
+                return None
+            opcodes = [
+                (self.OPERATIONS[operation], *positions)
+                for operation, *positions in self._OPCODE.iter_unpack(data[offset:])
+            ]
+        except (struct.error, IndexError):
+            return None
+
+        # Usada recién: queda al final del orden de desalojo
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return opcodes
+
+    def _write_entry(self, key: str, opcodes: list[tuple[str, int, int, int, int]]):
+        data = b"".join(
+            [
+                self.MAGIC,
+                self._HEADER.pack(len(opcodes)),
+                *(
+                    self._OPCODE.pack(self.OPERATIONS.index(operation), *positions)
+                    for operation, *positions in opcodes
+                ),
+            ]
+        )
+        # Se escribe aparte y se mueve, para que nadie lea una entrada a medias.
+        # El temporal es propio de cada proceso e hilo
+        path = self._entry_path(key)
+        temp_file = path.with_name(f"{path.name}.{os.getpid()}.{get_ident()}.tmp")
+        self._store.write(temp_file, data)
+        self._store.move(temp_file, path)
+
+        with self._lock:
+            if self._disk_size is None:
+                self._disk_size = sum(size for _, _, size in self._disk_entries())
+            else:
+                self._disk_size += len(data)
+            if self._disk_size > self._max_disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        """Borra las entradas menos usadas hasta bajar a 3/4 del límite"""
+        entries = sorted(self._disk_entries())
+        target = self._max_disk_bytes * 3 // 4
+        size = sum(entry_size for _, _, entry_size in entries)
+        for _, path, entry_size in entries:
+            if size <= target:
+                break
+            try:
+                self._store.delete(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        self._disk_size = size
+
+    def _disk_entries(self) -> list[tuple[int, Path, int]]:
+        """(fecha de modificación, ruta, tamaño) de cada entrada en disco"""
+        entries: list[tuple[int, Path, int]] = []
+        if not self._cache_dir.exists():
+            return entries
+        for directory in os.scandir(self._cache_dir):
+            if not directory.is_dir():
+                continue
+            for file in os.scandir(directory.path):
+                if file.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = file.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, Path(file.path), stat.st_size))
+        return entries
+
+    def _load_blob(self, repository: ObjectRepository, sha: Sha256Hash) -> Blob:
+        blob = repository.load(sha)
+        if not isinstance(blob, Blob):
+            raise ValueError(f"Object {sha.sha} is not a Blob")
+        return blob
+
+    @staticmethod
+    def _describe(differ: Differ) -> str:
+        """Clase del differ y sus opciones simples, en orden"""
+        options = ",".join(
+            f"{name}={value!r}"
+            for name, value in sorted(vars(differ).items())
+            if isinstance(value, (bool, int, float, str))
+        )
+        return f"{type(differ).__name__}({options})"
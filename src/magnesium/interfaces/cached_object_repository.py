@@ -0,0 +1,168 @@
+import copy
+from collections import OrderedDict
+from collections.abc import Iterable
+from threading import Lock
+from typing import override
+
+from ..object_values import Blob, Commit, Sha256Hash, Tree
+from .object_repository import ObjectRepository
+
+
+class CachedObjectRepository(ObjectRepository):
+    """
+    Decorador con caché LRU para cualquier ObjectRepository.
+
+    Los objetos se direccionan por contenido, así que una entrada nunca queda
+    desactualizada: sólo se invalida cuando el objeto se borra. La caché está
+    acotada por cantidad de entradas y por tamaño aproximado en bytes.
+
+    Los objetos son mutables, así que load() entrega siempre una copia: quien
+    modifique lo que recibe no altera lo que guarda la caché.
+    """
+
+    _repository: ObjectRepository
+    _max_entries: int
+    _max_bytes: int
+    _entries: OrderedDict[Sha256Hash, tuple[Blob | Tree | Commit, int]]
+    _size: int
+    _lock: Lock
+    _hits: int
+    _misses: int
+    _evictions: int
+
+    def __init__(
+        self,
+        repository: ObjectRepository,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        self._repository = repository
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    @property
+    def size(self) -> int:
+        """Tamaño aproximado en bytes de los objetos en caché"""
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @override
+    def init(self):
+        self._repository.init()
+
+    @override
+    def exists(self, sha: Sha256Hash) -> bool:
+        with self._lock:
+            if sha in self._entries:
+                return True
+        return self._repository.exists(sha)
+
+    @override
+    def hash_object(self, object: Blob | Tree | Commit) -> Sha256Hash:
+        return self._repository.hash_object(object)
+
+    @override
+    def save(self, object: Blob | Tree | Commit) -> Sha256Hash:
+        return self._repository.save(object)
+
+    @override
+    def save_many(self, objects: Iterable[Blob | Tree | Commit]) -> list[Sha256Hash]:
+        return self._repository.save_many(objects)
+
+    @override
+    def load(self, sha: Sha256Hash) -> Blob | Tree | Commit:
+        with self._lock:
+            cached = self._entries.get(sha)
+            if cached is not None:
+                self._entries.move_to_end(sha)
+                self._hits += 1
+                return self._copy(cached[0])
+            self._misses += 1
+
+        object = self._repository.load(sha)
+        self._insert(sha, object)
+        return self._copy(object)
+
+    @override
+    def delete(self, sha: Sha256Hash) -> Blob | Tree | Commit:
+        with self._lock:
+            cached = self._entries.pop(sha, None)
+            if cached is not None:
+                self._size -= cached[1]
+        return self._repository.delete(sha)
+
+    def clear(self):
+        """Vacía la caché sin tocar el repositorio"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _insert(self, key: Sha256Hash, object: Blob | Tree | Commit):
+        size = self._estimate_size(object)
+        # Un objeto más grande que toda la caché no se guarda
+        if size > self._max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[key] = (object, size)
+            self._size += size
+
+            while (
+                len(self._entries) > self._max_entries or self._size > self._max_bytes
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self._evictions += 1
+
+    @staticmethod
+    def _copy(object: Blob | Tree | Commit) -> Blob | Tree | Commit:
+        """
+        Copia las partes mutables del objeto. Los bytes, los hashes y las
+        fechas son inmutables y se comparten
+        """
+        copied = copy.copy(object)
+        if isinstance(copied, Tree):
+            copied.directories = [copy.copy(entry) for entry in copied.directories]
+            copied.files = [copy.copy(entry) for entry in copied.files]
+        elif isinstance(copied, Commit):
+            copied.email = copy.copy(copied.email)
+            copied.parents = list(copied.parents)
+        return copied
+
+    def _estimate_size(self, object: Blob | Tree | Commit) -> int:
+        """Tamaño aproximado del contenido del objeto"""
+        if isinstance(object, Blob):
+            return len(object.content)
+        elif isinstance(object, Tree):
+            entries = object.directories + object.files
+            return sum(64 + len(entry.name) for entry in entries)
+        else:
+            return (
+                len(object.author)
+                + len(object.email.email)
+                + len(object.message)
+                + 64 * (1 + len(object.parents))
+            )
@@ -0,0 +1,405 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Iterable
+from hashlib import sha256
+from pathlib import Path
+from struct import Struct
+from typing import override
+
+from ..object_values import Commit, Sha256Hash
+from .file_store import FileStore
+
+
+class CommitGraph(ABC):
+    """
+    A compact, append-friendly copy of the commit DAG: for every commit it
+    keeps its parents, tree, timestamp and generation number, so ancestry
+    questions can be answered without loading commit objects.
+
+    The generation number of a root commit is 1, and every other commit has
+    a generation one greater than the maximum of its parents.
+
+    Walks over many commits can use integer positions instead of shas.
+    Positions are only stable until the next call to add.
+    """
+
+    @abstractmethod
+    def contains(self, sha: Sha256Hash) -> bool:
+        pass
+
+    @abstractmethod
+    def parents(self, sha: Sha256Hash) -> list[Sha256Hash]:
+        pass
+
+    @abstractmethod
+    def generation(self, sha: Sha256Hash) -> int:
+        pass
+
+    @abstractmethod
+    def timestamp(self, sha: Sha256Hash) -> int:
+        pass
+
+    @abstractmethod
+    def tree(self, sha: Sha256Hash) -> Sha256Hash:
+        pass
+
+    @abstractmethod
+    def add(self, commits: Iterable[tuple[Sha256Hash, Commit]]) -> int:
+        pass
+
+    @abstractmethod
+    def position(self, sha: Sha256Hash) -> int:
+        pass
+
+    @abstractmethod
+    def sha_at(self, position: int) -> Sha256Hash:
+        pass
+
+    @abstractmethod
+    def parent_positions(self, position: int) -> list[int]:
+        pass
+
+    @abstractmethod
+    def generation_at(self, position: int) -> int:
+        pass
+
+
+class _GraphLayer:
+    """Una capa del grafo cargada en memoria"""
+
+    __slots__ = ("path", "base", "shas", "records", "edges")
+
+    path: Path
+    base: int
+    shas: list[bytes]
+    records: list[tuple[bytes, int, int, int, int]]
+    edges: list[int]
+
+    def __init__(
+        self,
+        path: Path,
+        base: int,
+        shas: list[bytes],
+        records: list[tuple[bytes, int, int, int, int]],
+        edges: list[int],
+    ) -> None:
+        self.path = path
+        self.base = base
+        self.shas = shas
+        self.records = records
+        self.edges = edges
+
+    def find(self, sha: bytes) -> int | None:
+        position = bisect_left(self.shas, sha)
+        if position < len(self.shas) and self.shas[position] == sha:
+            return self.base + position
+        return None
+
+
+class LocalCommitGraph(CommitGraph):
+    """
+    Grafo de commits guardado en archivos locales, por capas.
+
+    Cada capa es un archivo graph-<id>.layer con:
+      - MAGIC + cantidad + posición base
+      - tabla de shas ordenada, para buscar con bisección
+      - un registro por commit: tree, timestamp, generación y el rango de sus
+        padres en la tabla de aristas
+      - tabla de aristas: posiciones globales de los padres
+
+    La posición global de un commit es la base de su capa más su lugar en la
+    tabla de shas. Las capas sólo apuntan a sí mismas o a capas anteriores.
+
+    El archivo graph-chain lista las capas en orden. Cada add escribe una
+    capa nueva con sólo los commits nuevos; si la capa anterior no es al
+    menos el doble de grande, se fusionan, así que hay O(log n) capas.
+    """
+
+    MAGIC: bytes = b"MGCG\x01"
+    CHAIN_FILE: str = "graph-chain"
+
+    _HEADER: Struct = Struct(">II")
+    _RECORD: Struct = Struct(">32sqIIH")
+    _EDGE: Struct = Struct(">I")
+
+    _base_dir: Path
+    _store: FileStore
+    _layers: list[_GraphLayer]
+    _loaded_mtime: int | None
+
+    def __init__(self, base_dir: Path, store: FileStore) -> None:
+        self._base_dir = base_dir
+        self._store = store
+        self._layers = []
+        self._loaded_mtime = None
+        self._refresh()
+
+    def __len__(self) -> int:
+        if not self._layers:
+            return 0
+        last = self._layers[-1]
+        return last.base + len(last.shas)
+
+    @override
+    def contains(self, sha: Sha256Hash) -> bool:
+        return self._locate(sha.digest) is not None
+
+    @override
+    def parents(self, sha: Sha256Hash) -> list[Sha256Hash]:
+        return [
+            self.sha_at(position)
+            for position in self.parent_positions(self.position(sha))
+        ]
+
+    @override
+    def generation(self, sha: Sha256Hash) -> int:
+        return self.generation_at(self.position(sha))
+
+    @override
+    def timestamp(self, sha: Sha256Hash) -> int:
+        return self._record_at(self.position(sha))[1]
+
+    @override
+    def tree(self, sha: Sha256Hash) -> Sha256Hash:
+        return Sha256Hash.from_bytes(self._record_at(self.position(sha))[0])
+
+    @override
+    def add(self, commits: Iterable[tuple[Sha256Hash, Commit]]) -> int:
+        """
+        Agrega los commits que falten. Los padres de cada commit tienen que
+        estar en el grafo o venir en la misma llamada, en cualquier orden.
+        Devuelve la cantidad de commits agregados.
+        """
+        self._refresh()
+
+        # (tree, timestamp, padres) de cada commit nuevo
+        pending: dict[bytes, tuple[bytes, int, list[bytes]]] = {}
+        for sha, commit in commits:
+            raw_sha = sha.digest
+            if raw_sha in pending or self._locate(raw_sha) is not None:
+                continue
+            pending[raw_sha] = (
+                commit.tree.digest,
+                int(commit.date.timestamp()),
+                [parent.digest for parent in commit.parents],
+            )
+
+        if not pending:
+            return 0
+
+        entries = self._with_generations(pending)
+        previous = self._layers
+        layers = previous + [self._build_layer(len(self), entries)]
+        written = {layers[-1].path}
+
+        # Fusionar mientras la capa anterior no sea el doble de la nueva
+        while len(layers) > 1 and len(layers[-2].shas) < 2 * len(layers[-1].shas):
+            self._layers = layers
+            merged = self._layer_entries(layers[-2], layers[-1])
+            # Los padres fuera de las capas fusionadas están más abajo
+            self._layers = layers[:-2]
+            layers = layers[:-2] + [self._build_layer(layers[-2].base, merged)]
+            written.add(layers[-1].path)
+
+        self._layers = previous
+        self._save_chain(layers, written)
+        return len(pending)
+
+    @override
+    def position(self, sha: Sha256Hash) -> int:
+        """Posición global del commit; KeyError si no está en el grafo"""
+        position = self._locate(sha.digest)
+        if position is None:
+            raise KeyError(f"Commit {sha.sha} not found in commit graph")
+        return position
+
+    @override
+    def sha_at(self, position: int) -> Sha256Hash:
+        return Sha256Hash.from_bytes(self._sha_at(position))
+
+    @override
+    def parent_positions(self, position: int) -> list[int]:
+        layer = self._layer_at(position)
+        _, _, _, start, count = layer.records[position - layer.base]
+        return layer.edges[start : start + count]
+
+    @override
+    def generation_at(self, position: int) -> int:
+        return self._record_at(position)[2]
+
+    def _with_generations(
+        self, pending: dict[bytes, tuple[bytes, int, list[bytes]]]
+    ) -> dict[bytes, tuple[bytes, int, int, list[bytes]]]:
+        """Calcula la generación de cada commit nuevo, sin recursión"""
+        generations: dict[bytes, int] = {}
+        for root in pending:
+            stack = [root]
+            while stack:
+                raw_sha = stack[-1]
+                if raw_sha in generations:
+                    stack.pop()
+                    continue
+
+                missing = [
+                    parent
+                    for parent in pending[raw_sha][2]
+                    if parent in pending and parent not in generations
+                ]
+                if missing:
+                    stack.extend(missing)
+                    continue
+
+                generation = 0
+                for parent in pending[raw_sha][2]:
+                    if parent in pending:
+                        generation = max(generation, generations[parent])
+                        continue
+                    position = self._locate(parent)
+                    if position is None:
+                        raise ValueError(
+                            f"Parent {parent.hex()} of {raw_sha.hex()} "
+                            "is not in the commit graph"
+                        )
+                    generation = max(generation, self.generation_at(position))
+                generations[raw_sha] = generation + 1
+                stack.pop()
+
+        return {
+            raw_sha: (tree, timestamp, generations[raw_sha], parents)
+            for raw_sha, (tree, timestamp, parents) in pending.items()
+        }
+
+    def _layer_entries(
+        self, *layers: _GraphLayer
+    ) -> dict[bytes, tuple[bytes, int, int, list[bytes]]]:
+        """Vuelve a expresar las capas por sha, para reescribirlas juntas"""
+        entries: dict[bytes, tuple[bytes, int, int, list[bytes]]] = {}
+        for layer in layers:
+            for raw_sha, (tree, timestamp, generation, start, count) in zip(
+                layer.shas, layer.records
+            ):
+                parents = [
+                    self._sha_at(position)
+                    for position in layer.edges[start : start + count]
+                ]
+                entries[raw_sha] = (tree, timestamp, generation, parents)
+        return entries
+
+    def _build_layer(
+        self, base: int, entries: dict[bytes, tuple[bytes, int, int, list[bytes]]]
+    ) -> _GraphLayer:
+        """Escribe una capa con los commits dados a partir de la posición base"""
+        shas = sorted(entries)
+        positions = {raw_sha: base + i for i, raw_sha in enumerate(shas)}
+
+        records: list[tuple[bytes, int, int, int, int]] = []
+        edges: list[int] = []
+        for raw_sha in shas:
+            tree, timestamp, generation, parents = entries[raw_sha]
+            start = len(edges)
+            for parent in parents:
+                position = positions.get(parent)
+                if position is None:
+                    position = self._locate(parent)
+                assert position is not None
+                edges.append(position)
+            records.append((tree, timestamp, generation, start, len(parents)))
+
+        data = b"".join(
+            [
+                self.MAGIC,
+                self._HEADER.pack(len(shas), base),
+                *shas,
+                *(self._RECORD.pack(*record) for record in records),
+                *(self._EDGE.pack(edge) for edge in edges),
+            ]
+        )
+
+        # El nombre depende del contenido: una capa escrita nunca cambia
+        path = self._base_dir / f"graph-{sha256(data).hexdigest()}.layer"
+        self._store.write(path, data)
+        return _GraphLayer(path, base, shas, records, edges)
+
+    def _save_chain(self, layers: list[_GraphLayer], written: set[Path]):
+        """Reemplaza la cadena de capas y borra las que quedaron sin usar"""
+        previous = {layer.path for layer in self._layers} | written
+        serialized = "".join(f"{layer.path.name}\n" for layer in layers)
+
+        temp_file = self._base_dir / f"{self.CHAIN_FILE}.tmp"
+        self._store.write(temp_file, serialized.encode("ascii"))
+        self._store.move(temp_file, self._base_dir / self.CHAIN_FILE)
+
+        current = {layer.path for layer in layers}
+        for path in previous - current:
+            if path.exists():
+                self._store.delete(path)
+
+        self._layers = layers
+        self._loaded_mtime = (self._base_dir / self.CHAIN_FILE).stat().st_mtime_ns
+
+    def _refresh(self) -> bool:
+        """Recarga las capas si otro proceso cambió la cadena"""
+        chain_file = self._base_dir / self.CHAIN_FILE
+        if not chain_file.exists():
+            return False
+
+        mtime = chain_file.stat().st_mtime_ns
+        if mtime == self._loaded_mtime:
+            return False
+        self._loaded_mtime = mtime
+
+        layers: list[_GraphLayer] = []
+        for name in self._store.read(chain_file).decode("ascii").split():
+            layers.append(self._parse_layer(self._base_dir / name))
+        self._layers = layers
+        return True
+
+    def _parse_layer(self, path: Path) -> _GraphLayer:
+        data = self._store.read(path)
+        if not data.startswith(self.MAGIC):
+            raise ValueError(f"Invalid commit graph layer: {path}")
+
+        position = len(self.MAGIC)
+        count, base = self._HEADER.unpack_from(data, position)
+        position += self._HEADER.size
+
+        shas = [data[position + 32 * i : position + 32 * (i + 1)] for i in range(count)]
+        position += 32 * count
+
+        size = count * self._RECORD.size
+        records: list[tuple[bytes, int, int, int, int]] = list(
+            self._RECORD.iter_unpack(data[position : position + size])
+        )
+        position += size
+
+        edges = [edge for (edge,) in self._EDGE.iter_unpack(data[position:])]
+        return _GraphLayer(path, base, shas, records, edges)
+
+    def _locate(self, raw_sha: bytes) -> int | None:
+        position = self._find(raw_sha)
+        # Otro proceso pudo haber agregado commits: volver a cargar
+        if position is None and self._refresh():
+            position = self._find(raw_sha)
+        return position
+
+    def _find(self, raw_sha: bytes) -> int | None:
+        for layer in self._layers:
+            found = layer.find(raw_sha)
+            if found is not None:
+                return found
+        return None
+
+    def _layer_at(self, position: int) -> _GraphLayer:
+        # Hay pocas capas y las más nuevas son las más chicas
+        for layer in reversed(self._layers):
+            if position >= layer.base:
+                return layer
+        raise IndexError(f"Position {position} is not in the commit graph")
+
+    def _sha_at(self, position: int) -> bytes:
+        layer = self._layer_at(position)
+        return layer.shas[position - layer.base]
+
+    def _record_at(self, position: int) -> tuple[bytes, int, int, int, int]:
+        layer = self._layer_at(position)
+        return layer.records[position - layer.base]
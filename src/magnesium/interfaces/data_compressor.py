@@ -1,6 +1,16 @@
 from abc import ABC, abstractmethod
-from typing import override
+from collections.abc import Iterable, Iterator
+from typing import Protocol, override
+import bz2
 import gzip
+import lzma
+import zlib
+
+try:
+    # compression.zstd forma parte de la biblioteca estándar desde Python 3.14
+    from compression import zstd
+except ImportError:
+    zstd = None
 
 
 class DataCompressor(ABC):
@@ -8,6 +18,12 @@ class DataCompressor(ABC):
     A dependency that compresses/decompresses some bytes using a unified format.
     """
 
+    # True when decompress returns (a slice of) its input without copying, so
+    # callers can hand it a memory-mapped view instead of reading the file.
+    zero_copy: bool = False
+    # Codec tag stored in front of every object by TaggedCompressor
+    tag: int = -1
+
     @abstractmethod
     def compress(self, data: bytes) -> bytes:
         pass
@@ -16,14 +32,225 @@ class DataCompressor(ABC):
     def decompress(self, data: bytes) -> bytes:
         pass
 
+    def compress_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Compresses a sequence of chunks, yielding the compressed output in
+        pieces. The result must decompress with `decompress`. The default
+        implementation joins everything first; override it to stream.
+        """
+        yield self.compress(b"".join(chunks))
+
 
 class GzipCompressor(DataCompressor):
     """Compresor usando gzip"""
 
+    tag: int = 1
+
+    _level: int
+
+    def __init__(self, level: int = 9) -> None:
+        self._level = level
+
     @override
     def compress(self, data: bytes) -> bytes:
-        return gzip.compress(data)
+        return gzip.compress(data, compresslevel=self._level)
 
     @override
     def decompress(self, data: bytes) -> bytes:
         return gzip.decompress(data)
+
+    @override
+    def compress_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        # wbits=31 produce el mismo formato gzip que gzip.compress
+        yield from _stream(zlib.compressobj(self._level, zlib.DEFLATED, 31), chunks)
+
+
+class NoCompressor(DataCompressor):
+    """Compresor que guarda los datos tal cual (sin comprimir)"""
+
+    zero_copy: bool = True
+    tag: int = 0
+
+    @override
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    @override
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+    @override
+    def compress_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        yield from chunks
+
+
+class ZlibCompressor(DataCompressor):
+    """
+    Compresor zlib sin el header de gzip. Con niveles bajos (1-3) es varias
+    veces más rápido que gzip nivel 9 y comprime casi lo mismo.
+    """
+
+    tag: int = 2
+
+    _level: int
+
+    def __init__(self, level: int = 6) -> None:
+        self._level = level
+
+    @override
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self._level)
+
+    @override
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+    @override
+    def compress_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        yield from _stream(zlib.compressobj(self._level), chunks)
+
+
+class Bz2Compressor(DataCompressor):
+    """Compresor bzip2: más lento, pero comprime más el texto"""
+
+    tag: int = 3
+
+    _level: int
+
+    def __init__(self, level: int = 9) -> None:
+        self._level = level
+
+    @override
+    def compress(self, data: bytes) -> bytes:
+        return bz2.compress(data, self._level)
+
+    @override
+    def decompress(self, data: bytes) -> bytes:
+        return bz2.decompress(data)
+
+    @override
+    def compress_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        yield from _stream(bz2.BZ2Compressor(self._level), chunks)
+
+
+class LzmaCompressor(DataCompressor):
+    """Compresor LZMA (xz): la mejor relación, la menor velocidad"""
+
+    tag: int = 4
+
+    _preset: int
+
+    def __init__(self, preset: int = 6) -> None:
+        self._preset = preset
+
+    @override
+    def compress(self, data: bytes) -> bytes:
+        return lzma.compress(data, preset=self._preset)
+
+    @override
+    def decompress(self, data: bytes) -> bytes:
+        return lzma.decompress(data)
+
+    @override
+    def compress_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        yield from _stream(lzma.LZMACompressor(preset=self._preset), chunks)
+
+
+class ZstdCompressor(DataCompressor):
+    """Compresor Zstandard (requiere Python 3.14 o superior)"""
+
+    tag: int = 5
+
+    _level: int
+
+    def __init__(self, level: int = 3) -> None:
+        if zstd is None:
+            raise RuntimeError("Zstandard requires Python 3.14 (compression.zstd)")
+        self._level = level
+
+    @override
+    def compress(self, data: bytes) -> bytes:
+        return zstd.compress(data, level=self._level)
+
+    @override
+    def decompress(self, data: bytes) -> bytes:
+        return zstd.decompress(data)
+
+    @override
+    def compress_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        yield from _stream(zstd.ZstdCompressor(level=self._level), chunks)
+
+
+class TaggedCompressor(DataCompressor):
+    """
+    Compresor que antepone a cada objeto un byte con el codec usado, así un
+    mismo repositorio puede mezclar codecs y cambiar el codec por defecto sin
+    volver a escribir nada.
+
+    Los objetos escritos antes de existir las etiquetas son gzip puro y
+    empiezan con los bytes mágicos 1f 8b, que nunca son una etiqueta válida.
+    """
+
+    GZIP_MAGIC: bytes = b"\x1f\x8b"
+
+    _default: DataCompressor
+    _decoders: dict[int, DataCompressor]
+    _legacy: DataCompressor
+
+    def __init__(self, default: DataCompressor) -> None:
+        assert 0 <= default.tag < 256, "El compresor por defecto no tiene etiqueta"
+        self._default = default
+        self._legacy = GzipCompressor()
+        # Para descomprimir no importa el nivel: basta una instancia por codec
+        codecs: list[DataCompressor] = [
+            NoCompressor(),
+            GzipCompressor(),
+            ZlibCompressor(),
+            Bz2Compressor(),
+            LzmaCompressor(),
+        ]
+        self._decoders = {codec.tag: codec for codec in codecs}
+        if zstd is not None:
+            self._decoders[ZstdCompressor.tag] = ZstdCompressor()
+        self._decoders[default.tag] = default
+        self.zero_copy = default.zero_copy
+
+    @override
+    def compress(self, data: bytes) -> bytes:
+        return bytes([self._default.tag]) + self._default.compress(data)
+
+    @override
+    def decompress(self, data: bytes) -> bytes:
+        if data[:2] == self.GZIP_MAGIC:
+            return self._legacy.decompress(data)
+
+        # Un objeto vacío no tiene etiqueta: se rechaza igual que una desconocida
+        tag = data[0] if data else None
+        decoder = self._decoders.get(tag) if tag is not None else None
+        if decoder is None:
+            raise ValueError(f"Unknown compression codec tag: {tag}")
+        return decoder.decompress(data[1:])
+
+    @override
+    def compress_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        yield bytes([self._default.tag])
+        yield from self._default.compress_stream(chunks)
+
+
+class _IncrementalCompressor(Protocol):
+    """Compresores incrementales de la biblioteca estándar (zlib, bz2, ...)"""
+
+    def compress(self, data: bytes, /) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+def _stream(
+    compressor: _IncrementalCompressor, chunks: Iterable[bytes]
+) -> Iterator[bytes]:
+    """Alimenta un compresor incremental (compress/flush) bloque a bloque"""
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
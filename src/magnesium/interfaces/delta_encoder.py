@@ -0,0 +1,141 @@
+from abc import ABC, abstractmethod
+from typing import override
+
+
+class DeltaEncoder(ABC):
+    """
+    A dependency that describes some bytes as a copy/insert instruction stream
+    against a base, and rebuilds them back from that stream.
+    """
+
+    @abstractmethod
+    def make_delta(self, base: bytes, target: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def apply_delta(self, base: bytes, delta: bytes) -> bytes:
+        pass
+
+
+def _encode_varint(value: int) -> bytes:
+    """Codifica un entero no negativo en 7 bits por byte"""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _decode_varint(data: bytes, position: int) -> tuple[int, int]:
+    """Decodifica un entero y devuelve (valor, nueva posición)"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, position
+        shift += 7
+
+
+class LineDeltaEncoder(DeltaEncoder):
+    """
+    Delta por líneas.
+
+    Se indexan las líneas del base por contenido y se recorre el target: cada
+    racha de líneas que existe de forma contigua en el base se emite como una
+    instrucción COPY (offset, tamaño) y el resto como INSERT (datos literales).
+    Es lineal en el tamaño de ambos lados, a diferencia de un diff de Myers.
+    """
+
+    COPY: int = 0x01
+    INSERT: int = 0x02
+
+    # Cuántas apariciones de una misma línea del base se prueban como inicio
+    _max_candidates: int
+
+    def __init__(self, max_candidates: int = 8) -> None:
+        self._max_candidates = max_candidates
+
+    @override
+    def make_delta(self, base: bytes, target: bytes) -> bytes:
+        base_lines = base.splitlines(keepends=True)
+        target_lines = target.splitlines(keepends=True)
+
+        # Offset de cada línea del base y posiciones donde aparece cada contenido
+        base_offsets: list[int] = []
+        positions: dict[bytes, list[int]] = {}
+        offset = 0
+        for index, line in enumerate(base_lines):
+            base_offsets.append(offset)
+            offset += len(line)
+            positions.setdefault(line, []).append(index)
+        base_offsets.append(offset)
+
+        out = bytearray(_encode_varint(len(target)))
+        pending = bytearray()
+        i = 0
+        while i < len(target_lines):
+            best_start, best_length = -1, 0
+            for start in positions.get(target_lines[i], ())[: self._max_candidates]:
+                length = 1
+                while (
+                    i + length < len(target_lines)
+                    and start + length < len(base_lines)
+                    and base_lines[start + length] == target_lines[i + length]
+                ):
+                    length += 1
+                if length > best_length:
+                    best_start, best_length = start, length
+
+            if best_length == 0:
+                pending += target_lines[i]
+                i += 1
+                continue
+
+            if pending:
+                out += self._insert(pending)
+                pending.clear()
+            copy_offset = base_offsets[best_start]
+            copy_size = base_offsets[best_start + best_length] - copy_offset
+            out.append(self.COPY)
+            out += _encode_varint(copy_offset)
+            out += _encode_varint(copy_size)
+            i += best_length
+
+        if pending:
+            out += self._insert(pending)
+        return bytes(out)
+
+    @override
+    def apply_delta(self, base: bytes, delta: bytes) -> bytes:
+        target_size, position = _decode_varint(delta, 0)
+        out = bytearray()
+
+        while position < len(delta):
+            instruction = delta[position]
+            position += 1
+            if instruction == self.COPY:
+                copy_offset, position = _decode_varint(delta, position)
+                copy_size, position = _decode_varint(delta, position)
+                out += base[copy_offset : copy_offset + copy_size]
+            elif instruction == self.INSERT:
+                insert_size, position = _decode_varint(delta, position)
+                out += delta[position : position + insert_size]
+                position += insert_size
+            else:
+                raise ValueError(f"Invalid delta instruction: {instruction}")
+
+        if len(out) != target_size:
+            raise ValueError(
+                f"Delta size mismatch: expected {target_size}, got {len(out)}"
+            )
+        return bytes(out)
+
+    def _insert(self, data: bytearray) -> bytes:
+        return bytes([self.INSERT]) + _encode_varint(len(data)) + bytes(data)
@@ -1,25 +1,38 @@
+import re
 from abc import ABC, abstractmethod
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from heapq import nlargest
+from itertools import accumulate, chain, count
+from time import perf_counter
 from typing import override
 
 from ..object_values import (
     AddedDirEntry,
     AddedFileEntry,
+    CopiedFileEntry,
     DeletedDirEntry,
     DeletedFileEntry,
     FileEntry,
     DirEntry,
+    InlineDiff,
+    ModifiedFileEntry,
+    RenamedFileEntry,
+    Sha256Hash,
     Tree,
     UnchangedDirEntry,
     UnchangedFileEntry,
 )
 from ..object_values.blob import Blob
 from ..object_values.diffs import (
-    AddedLine,
-    BlobDiff,
-    DeletedLine,
+    OpcodeBlobDiff,
     TreeDiff,
-    UnchangedLine,
 )
+from .object_repository import ObjectRepository
+
+
+# Palabras, espacios y signos sueltos: los tokens del diff por palabras
+_WORD = re.compile(r"\w+|\s+|[^\w\s]")
 
 
 class Differ(ABC):
@@ -28,48 +41,337 @@ class Differ(ABC):
     """
 
     @abstractmethod
-    def diff_blobs(self, base: Blob, source: Blob) -> BlobDiff:
+    def diff_blobs(self, base: Blob, source: Blob) -> OpcodeBlobDiff:
+        """
+        The diff between two blobs, as opcodes over their lines. It is also a
+        BlobDiff, and can be passed to diff_inline.
+        """
         pass
 
+    def diff_shas(
+        self,
+        repository: ObjectRepository,
+        base: Sha256Hash,
+        source: Sha256Hash,
+        base_blob: Blob | None = None,
+        source_blob: Blob | None = None,
+    ) -> OpcodeBlobDiff:
+        """
+        The diff between two blobs stored in repository, given their shas.
+        Callers that already loaded a blob can pass it to avoid loading it
+        again. By default the missing blobs are loaded and diff_blobs is
+        called; differs that can use the shas themselves override it.
+        """
+        if base_blob is None:
+            base_blob = _load_blob(repository, base)
+        if source_blob is None:
+            source_blob = _load_blob(repository, source)
+        return self.diff_blobs(base_blob, source_blob)
+
     @abstractmethod
     def diff_trees(self, base: Tree, source: Tree) -> TreeDiff:
         pass
 
+    @abstractmethod
+    def diff_lines(
+        self, base: list[str], source: list[str]
+    ) -> list[tuple[str, int, int, int, int]]:
+        """
+        The edit script between two lists of lines, as consecutive
+        (operation, base_start, base_length, source_start, source_length)
+        tuples, where operation is "equal", "delete", "insert" or "replace".
+        """
+        pass
+
+    @abstractmethod
+    def diff_inline(
+        self,
+        diff: OpcodeBlobDiff,
+        granularity: str = "word",
+        max_line_length: int = 1000,
+        time_budget: float = 0.1,
+    ) -> list[InlineDiff]:
+        """
+        Refines the replaced lines of a blob diff at "word" or "char"
+        granularity. Lines longer than max_line_length are left as they are,
+        and refinement stops once time_budget seconds have passed.
+        """
+        pass
+
+
+@dataclass
+class _TreeChanges:
+    """Listas que se van llenando mientras se recorren los trees"""
+
+    added_files: list[AddedFileEntry] = field(default_factory=list)
+    deleted_files: list[DeletedFileEntry] = field(default_factory=list)
+    unchanged_files: list[UnchangedFileEntry] = field(default_factory=list)
+    modified_files: list[ModifiedFileEntry] = field(default_factory=list)
+    added_dirs: list[AddedDirEntry] = field(default_factory=list)
+    deleted_dirs: list[DeletedDirEntry] = field(default_factory=list)
+    unchanged_dirs: list[UnchangedDirEntry] = field(default_factory=list)
+
 
 class MyersDiff(Differ):
     """
     Implementación del algoritmo de Myers para calcular diferencias
     entre blobs y trees.
+
+    Con un repositorio, diff_trees recorre los subdirectorios: los que tienen
+    el mismo sha de los dos lados se reportan sin cambios y no se cargan, así
+    que el costo depende del tamaño del cambio y no del repositorio. Las
+    entradas se nombran con su ruta completa ("dir/sub/archivo").
+
+    El Myers clásico guarda una copia de V por cada paso d, O((n+m)·D) de
+    memoria. Si las dos secuencias suman más de linear_threshold líneas se
+    usa la variante lineal en espacio (dividir y conquistar por la "middle
+    snake"), que encuentra un script de la misma longitud mínima.
+
+    Antes de correr Myers (si preprocess está activo) se recortan el prefijo
+    y el sufijo comunes, cada línea se reemplaza por un entero (comparar
+    enteros es mucho más barato que comparar strings) y se descartan las
+    líneas que sólo aparecen de un lado, que nunca pueden coincidir.
+
+    Los archivos borrados y agregados con el mismo sha son renombres. Con un
+    repositorio, además se emparejan los que se parecen en al menos
+    rename_threshold por ciento (None lo desactiva): cada archivo se resume
+    en sus trozos (líneas de hasta 64 bytes) y un índice de trozo a archivo
+    elige, para cada agregado, a lo sumo rename_candidates borrados a
+    comparar, así que nunca se compara cada par ni se corre un diff
+    completo. Con detect_copies, un agregado parecido a un archivo que
+    sigue existiendo (modificado, o renombrado a otro lado) es una copia.
     """
 
-    def __init__(self) -> None:
-        pass
+    _repository: ObjectRepository | None
+    _linear_threshold: int
+    _preprocess: bool
+    _rename_threshold: int | None
+    _rename_candidates: int
+    _detect_copies: bool
+
+    # Tamaño máximo de un trozo de la huella de un archivo
+    CHUNK_SIZE: int = 64
+    # Trozos presentes en más archivos que esto (líneas en blanco,
+    # cabeceras de licencia) no sirven para elegir candidatos
+    COMMON_CHUNK: int = 64
+
+    def __init__(
+        self,
+        repository: ObjectRepository | None = None,
+        linear_threshold: int = 1024,
+        preprocess: bool = True,
+        rename_threshold: int | None = 50,
+        rename_candidates: int = 16,
+        detect_copies: bool = False,
+    ) -> None:
+        self._repository = repository
+        self._linear_threshold = linear_threshold
+        self._preprocess = preprocess
+        self._rename_threshold = rename_threshold
+        self._rename_candidates = rename_candidates
+        self._detect_copies = detect_copies
 
     @override
-    def diff_blobs(self, base: Blob, source: Blob) -> BlobDiff:
+    def diff_blobs(self, base: Blob, source: Blob) -> OpcodeBlobDiff:
         base_lines = base.get_lines()
         source_lines = source.get_lines()
-        path = self._myers_algorithm(base_lines, source_lines)
-        return self._build_blob_diff_from_path(path, base_lines, source_lines)
+        return OpcodeBlobDiff(
+            self.diff_lines(base_lines, source_lines), base_lines, source_lines
+        )
 
     @override
     def diff_trees(self, base: Tree, source: Tree) -> TreeDiff:
         """
         Calcula la diferencia entre dos árboles comparando directorios y archivos.
         """
+        changes = _TreeChanges()
+        self._diff_tree_level(base, source, "", changes)
+        renamed, copied = self._find_renames(changes)
+
         return TreeDiff(
-            added_files=self._find_added_files(base.files, source.files),
-            deleted_files=self._find_deleted_files(base.files, source.files),
-            unchanged_files=self._find_unchanged_files(base.files, source.files),
-            added_dirs=self._find_added_dirs(base.directories, source.directories),
-            deleted_dirs=self._find_deleted_dirs(base.directories, source.directories),
-            unchanged_dirs=self._find_unchanged_dirs(
-                base.directories, source.directories
-            ),
+            added_files=changes.added_files,
+            deleted_files=changes.deleted_files,
+            unchanged_files=changes.unchanged_files,
+            added_dirs=changes.added_dirs,
+            deleted_dirs=changes.deleted_dirs,
+            unchanged_dirs=changes.unchanged_dirs,
+            modified_files=changes.modified_files,
+            renamed_files=renamed,
+            copied_files=copied,
         )
 
-    def _myers_algorithm(
-        self, a: list[str], b: list[str]
+    @override
+    def diff_inline(
+        self,
+        diff: OpcodeBlobDiff,
+        granularity: str = "word",
+        max_line_length: int = 1000,
+        time_budget: float = 0.1,
+    ) -> list[InlineDiff]:
+        """
+        Las líneas de un tramo "replace" se emparejan en orden (la primera
+        borrada con la primera agregada, etc.) y cada par se vuelve a
+        comparar por palabras o caracteres con el mismo algoritmo.
+        """
+        if granularity not in ("word", "char"):
+            raise ValueError(f"Unknown granularity: {granularity}")
+
+        deadline = perf_counter() + time_budget
+        refined: list[InlineDiff] = []
+        for operation, base_start, base_length, source_start, source_length in (
+            diff.opcodes
+        ):
+            if operation != "replace":
+                continue
+            for offset in range(min(base_length, source_length)):
+                # Un archivo minificado no puede bloquear la vista del diff
+                if perf_counter() > deadline:
+                    return refined
+                base_line = diff.base_lines[base_start + offset]
+                source_line = diff.source_lines[source_start + offset]
+                if (
+                    len(base_line) > max_line_length
+                    or len(source_line) > max_line_length
+                ):
+                    continue
+                refined.append(
+                    InlineDiff(
+                        base_start + offset,
+                        source_start + offset,
+                        self._inline_opcodes(base_line, source_line, granularity),
+                    )
+                )
+        return refined
+
+    def _inline_opcodes(
+        self, base: str, source: str, granularity: str
+    ) -> list[tuple[str, int, int, int, int]]:
+        """Diff de dos líneas por tokens, con posiciones en caracteres"""
+        if granularity == "char":
+            base_tokens, source_tokens = list(base), list(source)
+        else:
+            base_tokens, source_tokens = _WORD.findall(base), _WORD.findall(source)
+
+        # Posición en la línea donde empieza cada token (más el largo total)
+        base_offsets = list(accumulate(map(len, base_tokens), initial=0))
+        source_offsets = list(accumulate(map(len, source_tokens), initial=0))
+        return [
+            (
+                operation,
+                base_offsets[base_start],
+                base_offsets[base_start + base_length] - base_offsets[base_start],
+                source_offsets[source_start],
+                source_offsets[source_start + source_length]
+                - source_offsets[source_start],
+            )
+            for operation, base_start, base_length, source_start, source_length in (
+                self.diff_lines(base_tokens, source_tokens)
+            )
+        ]
+
+    @override
+    def diff_lines(
+        self, base: list[str], source: list[str]
+    ) -> list[tuple[str, int, int, int, int]]:
+        opcodes: list[tuple[str, int, int, int, int]] = []
+        x = y = 0
+        for run_x, run_y, length in self._matching_runs(base, source) + [
+            (len(base), len(source), 0)
+        ]:
+            # Lo que hay entre dos tramos iguales es un cambio
+            if run_x > x or run_y > y:
+                if run_x == x:
+                    operation = "insert"
+                elif run_y == y:
+                    operation = "delete"
+                else:
+                    operation = "replace"
+                opcodes.append((operation, x, run_x - x, y, run_y - y))
+            if length:
+                opcodes.append(("equal", run_x, length, run_y, length))
+            x, y = run_x + length, run_y + length
+
+        return opcodes
+
+    def _matching_runs(self, a: list[str], b: list[str]) -> list[tuple[int, int, int]]:
+        """
+        Tramos de líneas iguales (inicio en a, inicio en b, largo), en orden.
+        Preprocesa las líneas antes de correr el algoritmo si corresponde.
+        """
+        if not self._preprocess:
+            return self._runs(self._core_matches(a, b))
+
+        # Prefijo y sufijo comunes
+        n, m = len(a), len(b)
+        start = 0
+        while start < n and start < m and a[start] == b[start]:
+            start += 1
+        end = 0
+        while end < n - start and end < m - start and a[n - end - 1] == b[m - end - 1]:
+            end += 1
+
+        # Cada línea distinta pasa a ser un entero (con map y zip el trabajo
+        # queda del lado de C)
+        a_middle = a[start : n - end]
+        b_middle = b[start : m - end]
+        ids = dict(zip(dict.fromkeys(chain(a_middle, b_middle)), count()))
+        a_ids = list(map(ids.__getitem__, a_middle))
+        b_ids = list(map(ids.__getitem__, b_middle))
+
+        # Las líneas que no están del otro lado son borrados/agregados seguros
+        in_a = set(a_ids)
+        in_b = set(b_ids)
+        a_kept = [x for x, line in enumerate(a_ids) if line in in_b]
+        b_kept = [y for y, line in enumerate(b_ids) if line in in_a]
+
+        core = self._core_matches(
+            [a_ids[x] for x in a_kept], [b_ids[y] for y in b_kept]
+        )
+
+        # Volver a las posiciones originales
+        runs = [(0, 0, start)] if start else []
+        runs += self._runs([(start + a_kept[x], start + b_kept[y]) for x, y in core])
+        if end:
+            runs.append((n - end, m - end, end))
+        return runs
+
+    def _core_matches[Line](
+        self, a: list[Line], b: list[Line]
+    ) -> list[tuple[int, int]]:
+        """Pares (x, y) de líneas iguales según el algoritmo, en orden"""
+        return self._myers_matches(a, b, 0, len(a), 0, len(b))
+
+    def _myers_matches[Line](
+        self,
+        a: list[Line],
+        b: list[Line],
+        a_start: int,
+        a_end: int,
+        b_start: int,
+        b_end: int,
+    ) -> list[tuple[int, int]]:
+        """Líneas iguales según Myers entre a[a_start:a_end] y b[b_start:b_end]"""
+        path = self._myers_algorithm(a[a_start:a_end], b[b_start:b_end])
+        return [
+            (a_start + x, b_start + y)
+            for x, y, operation in path
+            if operation == "equal"
+        ]
+
+    def _runs(self, matches: list[tuple[int, int]]) -> list[tuple[int, int, int]]:
+        """Agrupa pares de líneas iguales consecutivos en tramos"""
+        runs: list[tuple[int, int, int]] = []
+        for x, y in matches:
+            if runs:
+                run_x, run_y, length = runs[-1]
+                if run_x + length == x and run_y + length == y:
+                    runs[-1] = (run_x, run_y, length + 1)
+                    continue
+            runs.append((x, y, 1))
+        return runs
+
+    def _myers_algorithm[Line](
+        self, a: list[Line], b: list[Line]
     ) -> list[tuple[int, int, str]]:
         """
         Implementación del algoritmo de Myers para encontrar el camino de edición más corto.
@@ -80,6 +382,12 @@ class MyersDiff(Differ):
         """
         n, m = len(a), len(b)
         max_ = n + m
+        if max_ == 0:
+            return []
+        if max_ > self._linear_threshold:
+            path: list[tuple[int, int, str]] = []
+            self._linear_myers(a, b, 0, n, 0, m, path)
+            return path
 
         # V array para el algoritmo
         v = [0] * (2 * max_ + 1)
@@ -113,8 +421,8 @@ class MyersDiff(Differ):
 
         return []
 
-    def _build_path(
-        self, trace: list[list[int]], a: list[str], b: list[str]
+    def _build_path[Line](
+        self, trace: list[list[int]], a: list[Line], b: list[Line]
     ) -> list[tuple[int, int, str]]:
         """
         Reconstruye el camino desde el trace del algoritmo de Myers.
@@ -125,6 +433,14 @@ class MyersDiff(Differ):
         max_ = len(trace[0]) // 2
 
         for d in range(len(trace) - 1, -1, -1):
+            if d == 0:
+                # Lo que queda hasta el origen es una sola diagonal
+                while x > 0 and y > 0:
+                    path.append((x - 1, y - 1, "equal"))
+                    x -= 1
+                    y -= 1
+                break
+
             v = trace[d]
             k = x - y
 
@@ -153,100 +469,686 @@ class MyersDiff(Differ):
 
         return list(reversed(path))
 
-    def _build_blob_diff_from_path(
+    def _linear_myers[Line](
         self,
+        a: list[Line],
+        b: list[Line],
+        a_start: int,
+        a_end: int,
+        b_start: int,
+        b_end: int,
         path: list[tuple[int, int, str]],
-        base_lines: list[str],
-        source_lines: list[str],
-    ) -> BlobDiff:
+    ):
+        """
+        Myers en espacio lineal sobre a[a_start:a_end] y b[b_start:b_end].
+        Agrega el camino a path con las mismas tuplas que _build_path.
+        """
+        # Prefijo común
+        while a_start < a_end and b_start < b_end and a[a_start] == b[b_start]:
+            path.append((a_start, b_start, "equal"))
+            a_start += 1
+            b_start += 1
+
+        # Sufijo común: se agrega al final
+        suffix = 0
+        while (
+            a_start < a_end - suffix
+            and b_start < b_end - suffix
+            and a[a_end - suffix - 1] == b[b_end - suffix - 1]
+        ):
+            suffix += 1
+        a_end -= suffix
+        b_end -= suffix
+
+        if a_start == a_end or b_start == b_end:
+            for x in range(a_start, a_end):
+                path.append((x, b_start, "delete"))
+            for y in range(b_start, b_end):
+                path.append((a_end, y, "insert"))
+        else:
+            middle = self._middle_snake(a, b, a_start, a_end, b_start, b_end)
+            if middle is None:
+                # Nada en común: borrar todo y agregar todo
+                for x in range(a_start, a_end):
+                    path.append((x, b_start, "delete"))
+                for y in range(b_start, b_end):
+                    path.append((a_end, y, "insert"))
+            else:
+                x, y = middle
+                self._linear_myers(a, b, a_start, x, b_start, y, path)
+                self._linear_myers(a, b, x, a_end, y, b_end, path)
+
+        for offset in range(suffix):
+            path.append((a_end + offset, b_end + offset, "equal"))
+
+    def _middle_snake[Line](
+        self,
+        a: list[Line],
+        b: list[Line],
+        a_start: int,
+        a_end: int,
+        b_start: int,
+        b_end: int,
+    ) -> tuple[int, int] | None:
         """
-        Construye un BlobDiff desde el camino generado por Myers.
+        Avanza Myers desde el principio y desde el final a la vez hasta que
+        los caminos se cruzan. Devuelve el punto de cruce, que divide el
+        problema en dos mitades con la mitad de diferencias cada una.
         """
-        additions: list[AddedLine] = []
-        deletions: list[DeletedLine] = []
-        unchanged: list[UnchangedLine] = []
+        n = a_end - a_start
+        m = b_end - b_start
+        max_d = (n + m + 1) // 2
+        offset = max_d
+        forward = [-1] * (2 * max_d + 2)
+        backward = [-1] * (2 * max_d + 2)
+        forward[offset + 1] = 0
+        backward[offset + 1] = 0
+        delta = n - m
+        # Si delta es impar, los caminos se cruzan en un paso hacia adelante
+        check_forward = delta % 2 != 0
+        # Diagonales que ya se salieron de la grilla y no hace falta recorrer
+        forward_start = forward_end = backward_start = backward_end = 0
+
+        for d in range(max_d):
+            for k in range(-d + forward_start, d + 1 - forward_end, 2):
+                index = offset + k
+                if k == -d or (k != d and forward[index - 1] < forward[index + 1]):
+                    x = forward[index + 1]
+                else:
+                    x = forward[index - 1] + 1
+                y = x - k
+                while x < n and y < m and a[a_start + x] == b[b_start + y]:
+                    x += 1
+                    y += 1
+                forward[index] = x
 
-        current_position = 0
+                if x > n:
+                    forward_end += 2
+                elif y > m:
+                    forward_start += 2
+                elif check_forward:
+                    other = offset + delta - k
+                    if 0 <= other < len(backward) and backward[other] != -1:
+                        if x >= n - backward[other]:
+                            return a_start + x, b_start + y
 
-        for x, y, operation in path:
-            if operation == "equal":
-                unchanged.append(
-                    UnchangedLine(position=current_position, content=base_lines[x])
+            for k in range(-d + backward_start, d + 1 - backward_end, 2):
+                index = offset + k
+                if k == -d or (k != d and backward[index - 1] < backward[index + 1]):
+                    x = backward[index + 1]
+                else:
+                    x = backward[index - 1] + 1
+                y = x - k
+                while x < n and y < m and a[a_end - x - 1] == b[b_end - y - 1]:
+                    x += 1
+                    y += 1
+                backward[index] = x
+
+                if x > n:
+                    backward_end += 2
+                elif y > m:
+                    backward_start += 2
+                elif not check_forward:
+                    other = offset + delta - k
+                    if 0 <= other < len(forward) and forward[other] != -1:
+                        forward_x = forward[other]
+                        forward_y = forward_x - (other - offset)
+                        if forward_x >= n - x:
+                            return a_start + forward_x, b_start + forward_y
+
+        return None
+
+    def _diff_tree_level(
+        self, base: Tree, source: Tree, prefix: str, changes: _TreeChanges
+    ):
+        """Compara un nivel de los trees y baja a los subdirectorios que cambiaron"""
+        base_files = {f.name: f for f in base.files}
+        source_files = {f.name: f for f in source.files}
+        base_dirs = {d.name: d for d in base.directories}
+        source_dirs = {d.name: d for d in source.directories}
+
+        for name in sorted(base_files.keys() | source_files.keys()):
+            base_file = base_files.get(name)
+            source_file = source_files.get(name)
+            if base_file is not None and source_file is not None:
+                base_file = self._at_path(base_file, prefix)
+                source_file = self._at_path(source_file, prefix)
+                if (
+                    base_file.sha == source_file.sha
+                    and base_file.mode == source_file.mode
+                ):
+                    changes.unchanged_files.append(UnchangedFileEntry(base_file))
+                else:
+                    changes.modified_files.append(
+                        ModifiedFileEntry(previous=base_file, content=source_file)
+                    )
+            elif base_file is not None:
+                changes.deleted_files.append(
+                    DeletedFileEntry(self._at_path(base_file, prefix))
                 )
-                current_position += 1
-            elif operation == "delete":
-                deletions.append(
-                    DeletedLine(position=current_position, content=base_lines[x])
+            elif source_file is not None:
+                changes.added_files.append(
+                    AddedFileEntry(self._at_path(source_file, prefix))
                 )
-                # En delete, no avanzamos la posición porque removemos
-            elif operation == "insert":
-                additions.append(
-                    AddedLine(position=current_position, content=source_lines[y])
+
+        for name in sorted(base_dirs.keys() | source_dirs.keys()):
+            base_dir = base_dirs.get(name)
+            source_dir = source_dirs.get(name)
+            if base_dir is not None and source_dir is not None:
+                if base_dir.sha == source_dir.sha:
+                    # Mismo sha: todo el subdirectorio es igual, no se carga
+                    changes.unchanged_dirs.append(
+                        UnchangedDirEntry(self._at_path(base_dir, prefix))
+                    )
+                elif self._repository is not None:
+                    self._diff_tree_level(
+                        self._load_tree(base_dir.sha),
+                        self._load_tree(source_dir.sha),
+                        f"{prefix}{name}/",
+                        changes,
+                    )
+                else:
+                    # Sin repositorio no se puede bajar: el directorio cambió,
+                    # así que se informa como borrado y vuelto a agregar
+                    self._collect_tree(base_dir, prefix, changes, added=False)
+                    self._collect_tree(source_dir, prefix, changes, added=True)
+            elif base_dir is not None:
+                self._collect_tree(base_dir, prefix, changes, added=False)
+            elif source_dir is not None:
+                self._collect_tree(source_dir, prefix, changes, added=True)
+
+    def _collect_tree(
+        self, directory: DirEntry, prefix: str, changes: _TreeChanges, added: bool
+    ):
+        """Reporta un directorio entero (y su contenido) como agregado o borrado"""
+        entry = self._at_path(directory, prefix)
+        if added:
+            changes.added_dirs.append(AddedDirEntry(entry))
+        else:
+            changes.deleted_dirs.append(DeletedDirEntry(entry))
+
+        if self._repository is None:
+            return
+
+        tree = self._load_tree(directory.sha)
+        prefix = f"{entry.name}/"
+        for file in tree.files:
+            file = self._at_path(file, prefix)
+            if added:
+                changes.added_files.append(AddedFileEntry(file))
+            else:
+                changes.deleted_files.append(DeletedFileEntry(file))
+        for subdirectory in tree.directories:
+            self._collect_tree(subdirectory, prefix, changes, added)
+
+    def _find_renames(
+        self, changes: _TreeChanges
+    ) -> tuple[list[RenamedFileEntry], list[CopiedFileEntry]]:
+        """
+        Empareja los archivos agregados con su origen: primero por sha (un
+        diccionario, O(n)) y después por parecido. Los renombrados y los
+        copiados se sacan de las listas de agregados y borrados.
+        """
+        # Los borrados se pueden renombrar una sola vez; los modificados
+        # siguen existiendo y sólo pueden ser origen de una copia
+        deleted = [entry.content for entry in changes.deleted_files]
+        sources = deleted + (
+            [entry.previous for entry in changes.modified_files]
+            if self._detect_copies
+            else []
+        )
+        renamed: list[RenamedFileEntry] = []
+        copied: list[CopiedFileEntry] = []
+        used: set[int] = set()
+
+        free_by_sha: dict[Sha256Hash, list[int]] = {}
+        first_by_sha: dict[Sha256Hash, int] = {}
+        for index in reversed(range(len(sources))):
+            sha = sources[index].sha
+            first_by_sha[sha] = index
+            if index < len(deleted):
+                free_by_sha.setdefault(sha, []).append(index)
+
+        remaining: list[AddedFileEntry] = []
+        for added in changes.added_files:
+            sha = added.content.sha
+            free = free_by_sha.get(sha)
+            if free:
+                index = free.pop()
+                used.add(index)
+                renamed.append(RenamedFileEntry(sources[index], added.content))
+            elif self._detect_copies and sha in first_by_sha:
+                copied.append(
+                    CopiedFileEntry(sources[first_by_sha[sha]], added.content)
                 )
-                current_position += 1
+            else:
+                remaining.append(added)
+
+        if (
+            self._rename_threshold is not None
+            and self._repository is not None
+            and remaining
+        ):
+            candidates = [
+                index
+                for index in range(len(sources))
+                if self._detect_copies or index not in used
+            ]
+            assigned: set[int] = set()
+            for similarity, added_index, candidate in self._similar_pairs(
+                [added.content for added in remaining],
+                [sources[index] for index in candidates],
+                self._rename_threshold,
+            ):
+                if added_index in assigned:
+                    continue
+                index = candidates[candidate]
+                content = remaining[added_index].content
+                if index < len(deleted) and index not in used:
+                    used.add(index)
+                    renamed.append(
+                        RenamedFileEntry(sources[index], content, similarity)
+                    )
+                elif self._detect_copies:
+                    copied.append(CopiedFileEntry(sources[index], content, similarity))
+                else:
+                    continue
+                assigned.add(added_index)
+            remaining = [
+                added
+                for added_index, added in enumerate(remaining)
+                if added_index not in assigned
+            ]
+
+        changes.added_files = remaining
+        if used:
+            changes.deleted_files = [
+                entry
+                for index, entry in enumerate(changes.deleted_files)
+                if index not in used
+            ]
+        return renamed, copied
+
+    def _similar_pairs(
+        self, added: list[FileEntry], sources: list[FileEntry], threshold: int
+    ) -> list[tuple[int, int, int]]:
+        """
+        Pares (parecido, agregado, origen) con parecido >= threshold, del
+        mejor al peor. El parecido es el porcentaje de bytes en común (por
+        trozos) sobre el tamaño del más grande, como en git.
+        """
+        fingerprints = [self._fingerprint(source.sha) for source in sources]
+        # Índice invertido: trozo -> [(origen, bytes de ese trozo)]
+        index: dict[int, list[tuple[int, int]]] = {}
+        for number, (_, chunks) in enumerate(fingerprints):
+            for chunk, length in chunks.items():
+                index.setdefault(chunk, []).append((number, length))
+
+        pairs: list[tuple[int, int, int]] = []
+        for added_index, entry in enumerate(added):
+            size, chunks = self._fingerprint(entry.sha)
 
-        return BlobDiff(
-            additions=additions, deletions=deletions, unchanged_lines=unchanged
+            # Bytes en común contando sólo los trozos poco comunes; los otros
+            # suman a lo sumo `skipped` bytes más
+            shared: dict[int, int] = {}
+            skipped = 0
+            for chunk, length in chunks.items():
+                postings = index.get(chunk)
+                if postings is None:
+                    continue
+                if len(postings) > self.COMMON_CHUNK:
+                    skipped += length
+                    continue
+                for number, source_length in postings:
+                    shared[number] = shared.get(number, 0) + min(
+                        length, source_length
+                    )
+
+            for number in nlargest(
+                self._rename_candidates, shared, key=shared.__getitem__
+            ):
+                source_size, source_chunks = fingerprints[number]
+                largest = max(size, source_size)
+                # Con tamaños tan distintos no se puede llegar al umbral
+                if min(size, source_size) * 100 < threshold * largest:
+                    continue
+                if (shared[number] + skipped) * 100 < threshold * largest:
+                    continue
+                common = shared[number]
+                if skipped:
+                    common = sum(
+                        min(length, source_chunks.get(chunk, 0))
+                        for chunk, length in chunks.items()
+                    )
+                # 100 queda reservado para el mismo contenido
+                similarity = min(common * 100 // largest, 99)
+                if similarity >= threshold:
+                    pairs.append((similarity, added_index, number))
+
+        # A igual parecido se prefiere el mismo nombre de archivo
+        pairs.sort(
+            key=lambda pair: (
+                -pair[0],
+                _basename(added[pair[1]].name) != _basename(sources[pair[2]].name),
+                pair[1],
+                pair[2],
+            )
         )
+        return pairs
 
-    def _find_added_files(
-        self, base_files: list[FileEntry], source_files: list[FileEntry]
-    ) -> list[AddedFileEntry]:
-        """Encuentra archivos añadidos."""
-        base_names = {f.name for f in base_files}
-        return [AddedFileEntry(f) for f in source_files if f.name not in base_names]
-
-    def _find_deleted_files(
-        self, base_files: list[FileEntry], source_files: list[FileEntry]
-    ) -> list[DeletedFileEntry]:
-        """Encuentra archivos eliminados."""
-        source_names = {f.name for f in source_files}
-        return [DeletedFileEntry(f) for f in base_files if f.name not in source_names]
-
-    def _find_unchanged_files(
-        self, base_files: list[FileEntry], source_files: list[FileEntry]
-    ) -> list[UnchangedFileEntry]:
-        """Encuentra archivos sin cambios."""
-        source_file_map = {f.name: f for f in source_files}
-        unchanged = []
-
-        for base_file in base_files:
-            if base_file.name in source_file_map:
-                source_file = source_file_map[base_file.name]
-                # Considerar unchanged si tienen el mismo nombre y SHA
-                if (
-                    base_file.name == source_file.name
-                    and base_file.sha == source_file.sha
+    def _fingerprint(self, sha: Sha256Hash) -> tuple[int, dict[int, int]]:
+        """
+        Tamaño de un blob y su huella: hash de cada trozo -> bytes. Un trozo
+        es una línea, cortada cada CHUNK_SIZE bytes si es más larga.
+        """
+        assert self._repository is not None
+        blob = self._repository.load(sha)
+        if not isinstance(blob, Blob):
+            raise ValueError(f"Object {sha.sha} is not a Blob")
+
+        content = bytes(blob.content)
+        chunk_size = self.CHUNK_SIZE
+        chunks: dict[int, int] = {}
+        for line in content.splitlines(keepends=True):
+            if len(line) <= chunk_size:
+                key = hash(line)
+                chunks[key] = chunks.get(key, 0) + len(line)
+                continue
+            for start in range(0, len(line), chunk_size):
+                piece = line[start : start + chunk_size]
+                key = hash(piece)
+                chunks[key] = chunks.get(key, 0) + len(piece)
+        return len(content), chunks
+
+    def _load_tree(self, sha: Sha256Hash) -> Tree:
+        assert self._repository is not None
+        tree = self._repository.load(sha)
+        if not isinstance(tree, Tree):
+            raise ValueError(f"Object {sha.sha} is not a Tree")
+        return tree
+
+    def _at_path[Entry: (FileEntry, DirEntry)](
+        self, entry: Entry, prefix: str
+    ) -> Entry:
+        """Copia de la entrada nombrada con su ruta completa"""
+        if not prefix:
+            return entry
+        return type(entry)(name=f"{prefix}{entry.name}", mode=entry.mode, sha=entry.sha)
+
+
+class PatienceDiff(MyersDiff):
+    """
+    Patience diff: las líneas que aparecen una sola vez en cada lado se usan
+    como anclas (su subsecuencia creciente más larga) y se resuelve cada
+    tramo entre anclas por separado. Los tramos sin anclas se resuelven con
+    Myers. Da hunks más legibles cuando hay bloques movidos o muchas líneas
+    repetidas (llaves, líneas en blanco).
+    """
+
+    @override
+    def _core_matches[Line](
+        self, a: list[Line], b: list[Line]
+    ) -> list[tuple[int, int]]:
+        return self._patience_matches(a, b)
+
+    def _patience_matches[Line](
+        self, a: list[Line], b: list[Line]
+    ) -> list[tuple[int, int]]:
+        matches: list[tuple[int, int]] = []
+        # Pila de tareas: tramos a resolver o pares ya resueltos
+        stack: list[tuple[int, int, int, int] | tuple[int, int]] = [
+            (0, len(a), 0, len(b))
+        ]
+        while stack:
+            task = stack.pop()
+            if len(task) == 2:
+                matches.append(task)
+                continue
+            a_start, a_end, b_start, b_end = task
+
+            # Prefijo y sufijo comunes del tramo
+            prefix: list[tuple[int, int]] = []
+            while a_start < a_end and b_start < b_end and a[a_start] == b[b_start]:
+                prefix.append((a_start, b_start))
+                a_start += 1
+                b_start += 1
+            suffix: list[tuple[int, int]] = []
+            while a_start < a_end and b_start < b_end and a[a_end - 1] == b[b_end - 1]:
+                a_end -= 1
+                b_end -= 1
+                suffix.append((a_end, b_end))
+            matches.extend(prefix)
+
+            anchors = self._anchors(a, b, a_start, a_end, b_start, b_end)
+            if not anchors:
+                middle = (
+                    self._myers_matches(a, b, a_start, a_end, b_start, b_end)
+                    if a_start < a_end and b_start < b_end
+                    else []
+                )
+                stack.extend(reversed(middle + suffix[::-1]))
+                continue
+
+            # Los tramos entre anclas se apilan al revés para salir en orden
+            tasks: list[tuple[int, int, int, int] | tuple[int, int]] = []
+            x, y = a_start, b_start
+            for anchor_x, anchor_y in anchors:
+                tasks.append((x, anchor_x, y, anchor_y))
+                tasks.append((anchor_x, anchor_y))
+                x, y = anchor_x + 1, anchor_y + 1
+            tasks.append((x, a_end, y, b_end))
+            tasks.extend(suffix[::-1])
+            stack.extend(reversed(tasks))
+
+        return matches
+
+    def _anchors[Line](
+        self,
+        a: list[Line],
+        b: list[Line],
+        a_start: int,
+        a_end: int,
+        b_start: int,
+        b_end: int,
+    ) -> list[tuple[int, int]]:
+        """Líneas únicas en los dos lados, en su subsecuencia creciente más larga"""
+        # Posición de cada línea en a, o -1 si se repite
+        in_a: dict[Line, int] = {}
+        for x in range(a_start, a_end):
+            in_a[a[x]] = -1 if a[x] in in_a else x
+        in_b: dict[Line, int] = {}
+        for y in range(b_start, b_end):
+            line = b[y]
+            if in_a.get(line, -1) >= 0:
+                in_b[line] = -1 if line in in_b else y
+
+        # Pares ordenados por la posición en b (una sola vez en cada lado)
+        unique = [(in_a[line], y) for line, y in in_b.items() if y >= 0]
+        unique.sort(key=lambda pair: pair[1])
+
+        # Subsecuencia creciente más larga de las posiciones en a (patience)
+        tails: list[int] = []
+        tail_index: list[int] = []
+        previous: list[int] = [-1] * len(unique)
+        for index, (x, _) in enumerate(unique):
+            position = bisect_left(tails, x)
+            if position == len(tails):
+                tails.append(x)
+                tail_index.append(index)
+            else:
+                tails[position] = x
+                tail_index[position] = index
+            previous[index] = tail_index[position - 1] if position else -1
+
+        anchors: list[tuple[int, int]] = []
+        index = tail_index[-1] if tail_index else -1
+        while index >= 0:
+            anchors.append(unique[index])
+            index = previous[index]
+        anchors.reverse()
+        return anchors
+
+
+class HistogramDiff(MyersDiff):
+    """
+    Histogram diff (como el de git/jgit): en cada tramo busca la zona común
+    cuya línea menos frecuente aparece menos veces en la base, la usa como
+    separador y sigue con los tramos de cada lado. Las líneas que se repiten
+    más de max_chain veces no se usan como separador; si no queda ninguna,
+    el tramo se resuelve con Myers.
+    """
+
+    _max_chain: int
+
+    def __init__(
+        self,
+        repository: ObjectRepository | None = None,
+        linear_threshold: int = 1024,
+        preprocess: bool = True,
+        max_chain: int = 64,
+        rename_threshold: int | None = 50,
+        rename_candidates: int = 16,
+        detect_copies: bool = False,
+    ) -> None:
+        super().__init__(
+            repository,
+            linear_threshold,
+            preprocess,
+            rename_threshold,
+            rename_candidates,
+            detect_copies,
+        )
+        self._max_chain = max_chain
+
+    @override
+    def _core_matches[Line](
+        self, a: list[Line], b: list[Line]
+    ) -> list[tuple[int, int]]:
+        return self._histogram_matches(a, b)
+
+    def _histogram_matches[Line](
+        self, a: list[Line], b: list[Line]
+    ) -> list[tuple[int, int]]:
+        matches: list[tuple[int, int]] = []
+        stack: list[tuple[int, int, int, int] | tuple[int, int]] = [
+            (0, len(a), 0, len(b))
+        ]
+        while stack:
+            task = stack.pop()
+            if len(task) == 2:
+                matches.append(task)
+                continue
+            a_start, a_end, b_start, b_end = task
+            if a_start >= a_end or b_start >= b_end:
+                continue
+
+            region = self._best_region(a, b, a_start, a_end, b_start, b_end)
+            if region is None:
+                matches.extend(
+                    self._myers_matches(a, b, a_start, a_end, b_start, b_end)
+                )
+                continue
+
+            x, y, length = region
+            tasks: list[tuple[int, int, int, int] | tuple[int, int]] = [
+                (a_start, x, b_start, y)
+            ]
+            tasks.extend((x + offset, y + offset) for offset in range(length))
+            tasks.append((x + length, a_end, y + length, b_end))
+            stack.extend(reversed(tasks))
+
+        return matches
+
+    def _best_region[Line](
+        self,
+        a: list[Line],
+        b: list[Line],
+        a_start: int,
+        a_end: int,
+        b_start: int,
+        b_end: int,
+    ) -> tuple[int, int, int] | None:
+        """
+        La zona común (x, y, largo) con la menor cantidad de apariciones en la
+        base; a igual cantidad, la más larga.
+        """
+        occurrences: dict[Line, list[int]] = {}
+        for x in range(a_start, a_end):
+            occurrences.setdefault(a[x], []).append(x)
+
+        best: tuple[int, int, int] | None = None
+        best_count = self._max_chain + 1
+        y = b_start
+        while y < b_end:
+            positions = occurrences.get(b[y])
+            if positions is None or len(positions) > min(best_count, self._max_chain):
+                y += 1
+                continue
+
+            next_y = y + 1
+            for x in positions:
+                # Extender la zona hacia atrás y hacia adelante
+                start_x, start_y = x, y
+                while (
+                    start_x > a_start
+                    and start_y > b_start
+                    and a[start_x - 1] == b[start_y - 1]
                 ):
-                    unchanged.append(UnchangedFileEntry(base_file))
-
-        return unchanged
-
-    def _find_added_dirs(
-        self, base_dirs: list[DirEntry], source_dirs: list[DirEntry]
-    ) -> list[AddedDirEntry]:
-        """Encuentra directorios añadidos."""
-        base_names = {d.name for d in base_dirs}
-        return [AddedDirEntry(d) for d in source_dirs if d.name not in base_names]
-
-    def _find_deleted_dirs(
-        self, base_dirs: list[DirEntry], source_dirs: list[DirEntry]
-    ) -> list[DeletedDirEntry]:
-        """Encuentra directorios eliminados."""
-        source_names = {d.name for d in source_dirs}
-        return [DeletedDirEntry(d) for d in base_dirs if d.name not in source_names]
-
-    def _find_unchanged_dirs(
-        self, base_dirs: list[DirEntry], source_dirs: list[DirEntry]
-    ) -> list[UnchangedDirEntry]:
-        """Encuentra directorios sin cambios."""
-        source_dir_map = {d.name: d for d in source_dirs}
-        unchanged = []
-
-        for base_dir in base_dirs:
-            if base_dir.name in source_dir_map:
-                source_dir = source_dir_map[base_dir.name]
-                if base_dir.name == source_dir.name and base_dir.sha == source_dir.sha:
-                    unchanged.append(UnchangedDirEntry(base_dir))
-
-        return unchanged
+                    start_x -= 1
+                    start_y -= 1
+                end_x, end_y = x + 1, y + 1
+                while end_x < a_end and end_y < b_end and a[end_x] == b[end_y]:
+                    end_x += 1
+                    end_y += 1
+
+                count = min(
+                    len(occurrences[a[position]]) for position in range(start_x, end_x)
+                )
+                length = end_x - start_x
+                if count < best_count or (
+                    count == best_count and best is not None and length > best[2]
+                ):
+                    best = (start_x, start_y, length)
+                    best_count = count
+                next_y = max(next_y, end_y)
+            y = next_y
+
+        return best
+
+
+class HeuristicDiff(PatienceDiff, HistogramDiff):
+    """
+    Elige el algoritmo para cada par de blobs:
+      - si muchas líneas se repiten (llaves, líneas en blanco), HistogramDiff
+      - si los archivos son grandes, PatienceDiff, que ancla rápido
+      - si no, MyersDiff, que da el script mínimo
+    """
+
+    REPEATED_RATIO: float = 0.5
+    LARGE_FILE: int = 2000
+
+    @override
+    def _core_matches[Line](
+        self, a: list[Line], b: list[Line]
+    ) -> list[tuple[int, int]]:
+        total = len(a) + len(b)
+        if total == 0:
+            return []
+
+        repeated = 1 - len(set(a) | set(b)) / total
+        if repeated > self.REPEATED_RATIO:
+            return self._histogram_matches(a, b)
+        if total > self.LARGE_FILE:
+            return self._patience_matches(a, b)
+        return self._myers_matches(a, b, 0, len(a), 0, len(b))
+
+
+def _load_blob(repository: ObjectRepository, sha: Sha256Hash) -> Blob:
+    blob = repository.load(sha)
+    if not isinstance(blob, Blob):
+        raise ValueError(f"Object {sha.sha} is not a Blob")
+    return blob
+
+
+def _basename(path: str) -> str:
+    return path.rsplit("/", 1)[-1]
@@ -1,4 +1,7 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from mmap import ACCESS_READ, mmap
+from os import fsync, replace
 from pathlib import Path
 from typing import override
 
@@ -13,10 +16,32 @@ class FileStore(ABC):
     def write(self, path: Path, data: bytes):
         pass
 
+    @abstractmethod
+    def write_stream(self, path: Path, chunks: Iterable[bytes]):
+        pass
+
+    @abstractmethod
+    def append(self, path: Path, data: bytes):
+        """Appends to the end of the file and flushes it to disk (durable)."""
+        pass
+
+    @abstractmethod
+    def move(self, source: Path, target: Path):
+        pass
+
     @abstractmethod
     def read(self, path: Path) -> bytes:
         pass
 
+    @abstractmethod
+    def read_range(self, path: Path, offset: int, length: int) -> bytes:
+        pass
+
+    @abstractmethod
+    def read_view(self, path: Path) -> memoryview:
+        """Returns a read-only view of the whole file without copying it."""
+        pass
+
     @abstractmethod
     def delete(self, path: Path):
         pass
@@ -31,11 +56,47 @@ class LocalFileStore(FileStore):
         with open(path, "wb") as f:
             _ = f.write(data)
 
+    @override
+    def write_stream(self, path: Path, chunks: Iterable[bytes]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            for chunk in chunks:
+                _ = f.write(chunk)
+
+    @override
+    def append(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "ab") as f:
+            _ = f.write(data)
+            f.flush()
+            fsync(f.fileno())
+
+    @override
+    def move(self, source: Path, target: Path):
+        # os.replace es atómico dentro del mismo sistema de archivos
+        target.parent.mkdir(parents=True, exist_ok=True)
+        replace(source, target)
+
     @override
     def read(self, path: Path) -> bytes:
         with open(path, "rb") as f:
             return f.read()
 
+    @override
+    def read_range(self, path: Path, offset: int, length: int) -> bytes:
+        with open(path, "rb") as f:
+            _ = f.seek(offset)
+            return f.read(length)
+
+    @override
+    def read_view(self, path: Path) -> memoryview:
+        with open(path, "rb") as f:
+            # mmap no admite archivos vacíos
+            if f.seek(0, 2) == 0:
+                return memoryview(b"")
+            # El mapeo sigue vivo mientras exista la vista, aunque se cierre f
+            return memoryview(mmap(f.fileno(), 0, access=ACCESS_READ))
+
     @override
     def delete(self, path: Path):
         path.unlink()
@@ -49,10 +110,30 @@ class WorkingDirectory(FileStore):
     def write(self, path: Path, data: bytes):
         return super().write(path, data)
 
+    @override
+    def write_stream(self, path: Path, chunks: Iterable[bytes]):
+        return super().write_stream(path, chunks)
+
+    @override
+    def append(self, path: Path, data: bytes):
+        return super().append(path, data)
+
+    @override
+    def move(self, source: Path, target: Path):
+        return super().move(source, target)
+
     @override
     def read(self, path: Path) -> bytes:
         return super().read(path)
 
+    @override
+    def read_range(self, path: Path, offset: int, length: int) -> bytes:
+        return super().read_range(path, offset, length)
+
+    @override
+    def read_view(self, path: Path) -> memoryview:
+        return super().read_view(path)
+
     @override
     def delete(self, path: Path):
         return super().delete(path)
@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from itertools import islice
 from pathlib import Path
 from typing import override
 
@@ -34,13 +36,64 @@ class LogRepository(ABC):
     def pop(self, sha: Sha256Hash | None = None) -> Commit:
         pass
 
+    @abstractmethod
+    def iter_commits(
+        self,
+        start: Sha256Hash | None = None,
+        reverse: bool = True,
+        limit: int | None = None,
+        offset: int = 0,
+    ) -> Iterator[tuple[Sha256Hash, Commit]]:
+        """
+        Lazily yield (sha, commit) pairs. With reverse=True the walk goes
+        newest-first from start (the head by default); otherwise it goes
+        oldest-first up to start. Only the yielded commits are loaded.
+        """
+        pass
+
 
 class LocalLogRepository(LogRepository):
+    """
+    Log de commits en archivos locales.
+
+    - logfile: registros append-only "parent US child RS". Un registro que
+      empieza con "-" es una lápida que anula una entrada anterior; así pop
+      tampoco reescribe el archivo. compact() descarta las entradas anuladas.
+    - tip: sha del último commit ("root" si no hay ninguno) + US + tamaño del
+      logfile al escribirlo + US + cantidad de commits en index. Si el tamaño
+      no coincide, por ejemplo porque se cortó una escritura, el tip se
+      recalcula desde el log.
+    - index: los shas de la cadena, del más antiguo al más reciente, en
+      registros de largo fijo. Vale sólo si el tip vale y el archivo tiene
+      exactamente la cantidad de commits anotada; así len() y la primera
+      página de iter_commits() no leen el log completo. push agrega un
+      registro; pop y compact lo reescriben.
+
+    Un registro sin RS final quedó a medio escribir y se ignora; antes de
+    volver a escribir se cierra con un RS para no pegarlo al registro nuevo.
+
+    En memoria se mantiene un índice padre -> hijo e hijo -> padre junto con
+    el tip. El índice recuerda hasta qué byte del logfile leyó: si el archivo
+    creció sólo se leen los registros nuevos, y si se achicó (compact) se
+    reconstruye.
+    """
+
+    UNIT_SEPARATOR: str = "\x1f"
+    RECORD_SEPARATOR: str = "\x1e"
+    TOMBSTONE: str = "-"
+    ROOT: str = "root"
+    INDEX_RECORD: int = 65  # sha + "\n"
+    INDEX_PAGE: int = 256
+
     _base_path: Path
     _encoder: DataEncoder
     _file_store: FileStore
     _path_builder: ObjectPathBuilder
     _repository: ObjectRepository
+    _children: dict[str, str]
+    _parents: dict[str, str]
+    _tip: str
+    _indexed_size: int | None
 
     def __init__(
         self,
@@ -55,6 +108,10 @@ class LocalLogRepository(LogRepository):
         self._encoder = encoder
         self._path_builder = path_builder
         self._repository = repository
+        self._children = {}
+        self._parents = {}
+        self._tip = self.ROOT
+        self._indexed_size = None
 
         # Asegurar que el directorio base existe
         self._base_path.mkdir(parents=True, exist_ok=True)
@@ -66,11 +123,8 @@ class LocalLogRepository(LogRepository):
             return False
 
         # Además, verificar que está en el log
-        log_entries = self._load_log_entries()
-        for _, child in log_entries:
-            if child == sha.sha:
-                return True
-        return False
+        self._refresh_index()
+        return sha.sha in self._parents
 
     @override
     def search(self, sha: Sha256Hash) -> Commit:
@@ -94,193 +148,386 @@ class LocalLogRepository(LogRepository):
         if not isinstance(result, Commit):
             raise ValueError(f"Object {sha.sha} is not a Commit")
 
-        # Cargar las entradas existentes del log
-        log_entries = self._load_log_entries()
-
-        if not log_entries:
-            # Primer commit: (root, nuevo_commit)
-            log_entries.append(("root", sha.sha))
-        else:
-            # Encontrar el último commit (el que no tiene hijo)
-            last_commit = self._find_last_commit(log_entries)
-            # Agregar nuevo commit como hijo del último
-            log_entries.append((last_commit, sha.sha))
-
-        # Guardar el log actualizado
-        self._save_log_entries(log_entries)
+        # El nuevo commit cuelga del tip actual (o de root si es el primero).
+        # Sólo se agrega un registro y se reescribe el tip: O(1) en disco
+        head = self.get_head()
+        parent = head.sha if head is not None else self.ROOT
+        count = self._indexed_count()
+        self._append_records(added=[(parent, sha.sha)])
+        if count is None:
+            # Sin índice persistido válido: se arma una vez desde el log
+            self._save_index()
+            return
+        self._file_store.append(
+            self._index_file(), self._encoder.encode(f"{sha.sha}\n")
+        )
+        self._write_tip(sha.sha, count + 1)
 
     @override
     def pop(self, sha: Sha256Hash | None = None) -> Commit:
-        log_entries = self._load_log_entries()
+        self._refresh_index()
 
-        if not log_entries:
+        if not self._parents:
             raise IndexError("Cannot pop from empty log")
 
         if sha is None:
             # Eliminar el último commit (el que no tiene hijo)
-            last_commit_sha = self._find_last_commit(log_entries)
-
-            # Encontrar y eliminar la entrada que tiene este commit como hijo
-            entry_to_remove = None
-            for entry in log_entries:
-                if entry[1] == last_commit_sha:
-                    entry_to_remove = entry
-                    break
-
-            if entry_to_remove:
-                log_entries.remove(entry_to_remove)
-                removed_commit = self.search(Sha256Hash(last_commit_sha))
-                self._save_log_entries(log_entries)
-                return removed_commit
-            else:
-                raise ValueError("Could not find last commit in log")
+            sha = Sha256Hash(self._tip)
+
+        # Encontrar el padre y el hijo del commit a eliminar
+        parent = self._parents.get(sha.sha)
+        if parent is None:
+            raise KeyError(f"Commit {sha.sha} not found in log")
+        child = self._children.get(sha.sha)
+
+        removed_commit = self.search(sha)
+
+        # Reconectar la cadena si hay un hijo
+        if child is not None:
+            # Reemplazar: (padre -> este) y (este -> hijo) por (padre -> hijo)
+            self._append_records(
+                added=[(parent, child)],
+                removed=[(parent, sha.sha), (sha.sha, child)],
+            )
         else:
-            # Eliminar un commit específico
-            # Esto es más complejo porque rompe la cadena
-            entry_to_remove = None
-            for entry in log_entries:
-                if entry[1] == sha.sha:
-                    entry_to_remove = entry
-                    break
-
-            if not entry_to_remove:
-                raise KeyError(f"Commit {sha.sha} not found in log")
-
-            # Encontrar el padre y el hijo del commit a eliminar
-            parent_entry = entry_to_remove
-            child_entry = None
-            for entry in log_entries:
-                if entry[0] == sha.sha:
-                    child_entry = entry
-                    break
-
-            # Reconectar la cadena si hay un hijo
-            if child_entry:
-                # Reemplazar: (padre -> este) y (este -> hijo) por (padre -> hijo)
-                log_entries.remove(parent_entry)
-                log_entries.remove(child_entry)
-                log_entries.append((parent_entry[0], child_entry[1]))
-            else:
-                # Solo eliminar la entrada si es el último
-                log_entries.remove(parent_entry)
+            # Solo anular la entrada si es el último
+            self._append_records(removed=[(parent, sha.sha)])
 
-            removed_commit = self.search(sha)
-            self._save_log_entries(log_entries)
-            return removed_commit
+        self._save_index()
+        return removed_commit
 
     @override
     def load(self) -> list[Commit]:
-        log_entries = self._load_log_entries()
-        commits: list[Commit] = []
+        # Orden cronológico: del más antiguo al más reciente
+        return [commit for _, commit in self.iter_commits(reverse=False)]
 
-        # Reconstruir el orden cronológico
-        commit_order = self._get_commit_order(log_entries)
+    @override
+    def iter_commits(
+        self,
+        start: Sha256Hash | None = None,
+        reverse: bool = True,
+        limit: int | None = None,
+        offset: int = 0,
+    ) -> Iterator[tuple[Sha256Hash, Commit]]:
+        count = None
+        if reverse and start is None and self._indexed_size is None:
+            count = self._indexed_count()
+
+        if count is not None:
+            # Sin índice en memoria: el persistido se lee desde el final y
+            # sólo hasta donde se recorra, salteando offset sin leerlo
+            shas = self._walk_index(count - offset)
+        else:
+            shas = islice(self._chain(start, reverse), offset, None)
 
-        for commit_sha in commit_order:
+        yielded = 0
+        for commit_sha in shas:
+            if limit is not None and yielded >= limit:
+                return
+
+            sha = Sha256Hash(commit_sha)
             try:
-                commit = self.search(Sha256Hash(commit_sha))
-                commits.append(commit)
-            except (KeyError, ValueError) as e:
+                commit = self._repository.load(sha)
+            except (FileNotFoundError, ValueError) as e:
                 print(f"Warning: Could not load commit {commit_sha}: {e}")
                 continue
+            if not isinstance(commit, Commit):
+                print(f"Warning: Object {commit_sha} is not a Commit")
+                continue
 
-        return commits
+            yielded += 1
+            yield sha, commit
+
+    def _chain(self, start: Sha256Hash | None, reverse: bool) -> Iterator[str]:
+        """Los shas de la cadena según el índice en memoria"""
+        self._refresh_index()
+
+        if start is not None and start.sha not in self._parents:
+            raise KeyError(f"Commit {start.sha} not found in log")
+
+        if reverse:
+            # Del commit pedido hacia atrás, siguiendo hijo -> padre
+            shas = self._walk(
+                self._tip if start is None else start.sha, self._parents
+            )
+        else:
+            # Desde root hacia adelante, hasta el commit pedido
+            shas = self._walk(self._children.get(self.ROOT), self._children)
+            if start is not None:
+                shas = self._until(shas, start.sha)
+        return shas
+
+    def __len__(self) -> int:
+        """Cantidad de commits en el log"""
+        if self._indexed_size is None:
+            count = self._indexed_count()
+            if count is not None:
+                return count
+        self._refresh_index()
+        return len(self._parents)
 
     def get_head(self) -> Sha256Hash | None:
         """Obtener el último commit (HEAD)"""
-        log_entries = self._load_log_entries()
-        if not log_entries:
+        tip = None
+        if self._indexed_size is None:
+            # Sin índice todavía: el archivo tip evita leer todo el log
+            tip = self._read_tip()
+        if tip is None:
+            self._refresh_index()
+            tip = self._tip
+
+        if tip == self.ROOT:
             return None
+        return Sha256Hash(tip)
+
+    def compact(self) -> int:
+        """
+        Reescribe el log sólo con las entradas vigentes, descartando las
+        lápidas y lo que anulan. Devuelve cuántos registros se descartaron.
+        """
+        records = self._read_records()
+        log_entries = self._load_log_entries()
 
-        last_commit_sha = self._find_last_commit(log_entries)
-        return Sha256Hash(last_commit_sha)
-
-    def _load_log_entries(self) -> list[tuple[str, str]]:
-        """Cargar todas las entradas del log"""
-        log_file = self._base_path / "logfile"
+        self._save_log_entries(log_entries)
+        self._save_index()
+        return len(records) - len(log_entries)
 
-        if not log_file.exists():
-            return []
+    def _log_file(self) -> Path:
+        return self._base_path / "logfile"
 
-        try:
-            encoded_log = self._file_store.read(log_file)
-            serialized_log = self._encoder.decode(encoded_log)
+    def _tip_file(self) -> Path:
+        return self._base_path / "tip"
 
-            # Eliminar el separador final si existe
-            serialized_log = serialized_log.rstrip("\x1e")
+    def _index_file(self) -> Path:
+        return self._base_path / "index"
 
-            if not serialized_log:
-                return []
+    def _log_size(self) -> int:
+        log_file = self._log_file()
+        return log_file.stat().st_size if log_file.exists() else 0
 
-            log_lines = serialized_log.split("\x1e")
-            logs: list[tuple[str, str]] = []
+    def _read_records(self, offset: int = 0) -> list[str]:
+        """Leer los registros completos del log (los que terminan en RS)"""
+        log_file = self._log_file()
 
-            for line in log_lines:
-                if line.strip():
-                    parent, child = line.split("\x1f")
-                    logs.append((parent, child))
+        if not log_file.exists():
+            return []
 
-            return logs
+        if offset:
+            encoded_log = self._file_store.read_range(
+                log_file, offset, self._log_size() - offset
+            )
+        else:
+            encoded_log = self._file_store.read(log_file)
+        serialized_log = self._encoder.decode(encoded_log)
+
+        # El último fragmento es "" o un registro a medio escribir
+        return [
+            record
+            for record in serialized_log.split(self.RECORD_SEPARATOR)[:-1]
+            if record.strip()
+        ]
+
+    def _parse_record(self, record: str) -> tuple[bool, str, str] | None:
+        """Devuelve (es lápida, padre, hijo), o None si el registro está roto"""
+        removed = record.startswith(self.TOMBSTONE)
+        fields = record.removeprefix(self.TOMBSTONE).split(self.UNIT_SEPARATOR)
+        # Restos de una escritura interrumpida: campos faltantes o cortados
+        if len(fields) != 2 or not self._is_sha(fields[1]):
+            return None
+        if fields[0] != self.ROOT and not self._is_sha(fields[0]):
+            return None
+        return removed, fields[0], fields[1]
+
+    def _is_sha(self, value: str) -> bool:
+        return Sha256Hash.is_valid(value)
+
+    def _refresh_index(self):
+        """Pone al día el índice en memoria con lo que haya en el logfile"""
+        log_size = self._log_size()
+        if log_size == self._indexed_size:
+            return
+
+        offset = self._indexed_size or 0
+        if log_size < offset:
+            # El log se reescribió: reconstruir desde cero
+            offset = 0
+        if offset == 0:
+            self._children = {}
+            self._parents = {}
+            self._tip = self.ROOT
 
+        try:
+            records = self._read_records(offset)
         except Exception as e:
             print(f"Warning: Could not load log file: {e}")
-            return []
-
-    def _save_log_entries(self, log_entries: list[tuple[str, str]]):
-        """Guardar las entradas del log"""
-        serialized_log = ""
-        for parent, child in log_entries:
-            serialized_log += f"{parent}\x1f{child}\x1e"
-
-        encoded_log = self._encoder.encode(serialized_log)
-        self._file_store.write(self._base_path / "logfile", encoded_log)
+            records = []
 
-    def _find_last_commit(self, log_entries: list[tuple[str, str]]) -> str:
-        """Encontrar el último commit (el que no es padre de nadie)"""
-        # Colectar todos los padres
-        parents = set(entry[0] for entry in log_entries)
-
-        # Encontrar el commit que no es padre de nadie
-        for entry in log_entries:
-            if entry[1] not in parents:
-                return entry[1]
+        for record in records:
+            parsed = self._parse_record(record)
+            if parsed is None:
+                continue
+            removed, parent, child = parsed
+
+            if removed:
+                if self._children.get(parent) == child:
+                    del self._children[parent]
+                if self._parents.get(child) == parent:
+                    del self._parents[child]
+                if self._tip == child:
+                    self._tip = parent
+            else:
+                self._children[parent] = child
+                self._parents[child] = parent
+
+        # Sacar un commit del medio anula el tip (con su lápida) antes de que
+        # el registro que reconecta la cadena lo reemplace: si el tip quedó
+        # fuera de la cadena, se busca de nuevo desde root
+        if self._tip != self.ROOT and self._tip not in self._parents:
+            self._tip = self.ROOT
+        # El tip es el último commit de la cadena, que no tiene hijo
+        while self._tip in self._children:
+            self._tip = self._children[self._tip]
+
+        # Sólo se avanza hasta el último RS: un registro a medio escribir se
+        # vuelve a leer (y a ignorar) hasta que se complete
+        consumed = sum(
+            len(self._encoder.encode(record + self.RECORD_SEPARATOR))
+            for record in records
+        )
+        self._indexed_size = log_size if consumed == log_size - offset else None
 
-        # Si todos los commits son padres de alguien, hay un ciclo (error)
-        raise ValueError("Circular reference detected in log")
+    def _load_log_entries(self) -> list[tuple[str, str]]:
+        """Cargar todas las entradas vigentes del log"""
+        self._refresh_index()
+        return [(parent, child) for child, parent in self._parents.items()]
 
-    def _get_commit_order(self, log_entries: list[tuple[str, str]]) -> list[str]:
-        """Obtener el orden cronológico de los commits"""
-        if not log_entries:
-            return []
+    def _append_records(
+        self,
+        added: list[tuple[str, str]] | None = None,
+        removed: list[tuple[str, str]] | None = None,
+    ):
+        """Agregar lápidas y registros al final del log, en una sola escritura"""
+        records = [(self.TOMBSTONE, entry) for entry in removed or []]
+        records += [("", entry) for entry in added or []]
+        serialized = "".join(
+            f"{prefix}{parent}{self.UNIT_SEPARATOR}{child}{self.RECORD_SEPARATOR}"
+            for prefix, (parent, child) in records
+        )
+
+        # Si la última escritura se cortó, cerrar ese registro incompleto
+        log_file = self._log_file()
+        if (log_size := self._log_size()) > 0:
+            last_byte = self._file_store.read_range(log_file, log_size - 1, 1)
+            if last_byte != self._encoder.encode(self.RECORD_SEPARATOR):
+                serialized = self.RECORD_SEPARATOR + serialized
+
+        self._file_store.append(log_file, self._encoder.encode(serialized))
 
-        # Construir el orden desde el primero hasta el último
-        commit_order: list[str] = []
+    def _save_log_entries(self, log_entries: list[tuple[str, str]]):
+        """Reescribir el log completo de forma atómica"""
+        serialized_log = "".join(
+            f"{parent}{self.UNIT_SEPARATOR}{child}{self.RECORD_SEPARATOR}"
+            for parent, child in log_entries
+        )
 
-        # Encontrar el primer commit (el que tiene "root" como padre)
-        first_commit = None
-        for entry in log_entries:
-            if entry[0] == "root":
-                first_commit = entry[1]
-                break
+        encoded_log = self._encoder.encode(serialized_log)
+        temp_file = self._base_path / "logfile.tmp"
+        self._file_store.write(temp_file, encoded_log)
+        self._file_store.move(temp_file, self._log_file())
+        self._indexed_size = None
+
+    def _read_tip(self) -> str | None:
+        """Leer el tip; None si no existe o no corresponde al log actual"""
+        state = self._read_tip_state()
+        return state[0] if state is not None else None
+
+    def _read_tip_state(self) -> tuple[str, int | None] | None:
+        """
+        (tip, commits en el índice persistido) o None si el tip no existe o
+        no corresponde al log actual. Los tips escritos antes del índice no
+        tienen la cantidad.
+        """
+        tip_file = self._tip_file()
+        if not tip_file.exists():
+            return None
 
-        if not first_commit:
-            raise ValueError("No root commit found in log")
+        # Un tip roto (campos de más o un tamaño que no es número) se ignora
+        try:
+            tip, size, *count = self._encoder.decode(
+                self._file_store.read(tip_file)
+            ).split(self.UNIT_SEPARATOR)
+            if int(size) != self._log_size() or len(count) > 1:
+                return None
+            return tip, int(count[0]) if count else None
+        except ValueError:
+            return None
 
-        # Seguir la cadena
-        current_commit = first_commit
+    def _write_tip(self, tip: str, count: int):
+        """Guardar el tip junto con el tamaño actual del log y del índice"""
+        temp_file = self._base_path / "tip.tmp"
+        self._file_store.write(
+            temp_file,
+            self._encoder.encode(
+                f"{tip}{self.UNIT_SEPARATOR}{self._log_size()}"
+                f"{self.UNIT_SEPARATOR}{count}"
+            ),
+        )
+        self._file_store.move(temp_file, self._tip_file())
+
+    def _indexed_count(self) -> int | None:
+        """Commits en el índice persistido, o None si no se puede usar"""
+        state = self._read_tip_state()
+        if state is None or state[1] is None:
+            return None
+        # Una escritura cortada entre el índice y el tip deja otro largo
+        index_file = self._index_file()
+        if (
+            not index_file.exists()
+            or index_file.stat().st_size != state[1] * self.INDEX_RECORD
+        ):
+            return None
+        return state[1]
+
+    def _save_index(self):
+        """Reescribe el índice persistido y el tip desde el índice en memoria"""
+        chain = self._get_commit_order()
+        temp_file = self._base_path / "index.tmp"
+        self._file_store.write(
+            temp_file, self._encoder.encode("".join(f"{sha}\n" for sha in chain))
+        )
+        self._file_store.move(temp_file, self._index_file())
+        self._write_tip(self._tip, len(chain))
+
+    def _walk_index(self, end: int) -> Iterator[str]:
+        """Los shas del índice persistido antes de la posición end, hacia atrás"""
+        while end > 0:
+            start = max(0, end - self.INDEX_PAGE)
+            page = self._file_store.read_range(
+                self._index_file(),
+                start * self.INDEX_RECORD,
+                (end - start) * self.INDEX_RECORD,
+            )
+            yield from reversed(self._encoder.decode(page).split("\n")[:-1])
+            end = start
+
+    def _get_commit_order(self) -> list[str]:
+        """Obtener el orden cronológico de los commits, siguiendo padre -> hijo"""
+        self._refresh_index()
+
+        # Seguir la cadena desde root
+        return list(self._walk(self._children.get(self.ROOT), self._children))
+
+    def _walk(self, current: str | None, links: dict[str, str]) -> Iterator[str]:
+        """Recorre la cadena desde current siguiendo links, sin pasar por root"""
         visited: set[str] = set()
-
-        while current_commit and current_commit not in visited:
-            visited.add(current_commit)
-            commit_order.append(current_commit)
-
-            # Encontrar el siguiente commit
-            next_commit = None
-            for entry in log_entries:
-                if entry[0] == current_commit:
-                    next_commit = entry[1]
-                    break
-
-            current_commit = next_commit
-
-        return commit_order
+        while current is not None and current != self.ROOT and current not in visited:
+            visited.add(current)
+            yield current
+            current = links.get(current)
+
+    def _until(self, shas: Iterator[str], last: str) -> Iterator[str]:
+        """Corta el recorrido después de last"""
+        for sha in shas:
+            yield sha
+            if sha == last:
+                return
@@ -0,0 +1,307 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Iterable
+from hashlib import sha256
+from pathlib import Path
+from struct import Struct
+from typing import override
+
+from ..object_values import Sha256Hash
+from .data_compressor import DataCompressor
+from .delta_encoder import DeltaEncoder
+from .file_store import FileStore
+
+
+class ObjectPack(ABC):
+    """
+    A dependency that keeps many objects inside a few append-only pack files,
+    each one with a sorted sha -> offset index. It reads and writes the raw
+    (uncompressed) object content and handles its own compression.
+    """
+
+    @abstractmethod
+    def contains(self, sha: Sha256Hash) -> bool:
+        pass
+
+    @abstractmethod
+    def read(self, sha: Sha256Hash) -> bytes | memoryview:
+        pass
+
+    @abstractmethod
+    def write(self, objects: Iterable[tuple[Sha256Hash, bytes]]) -> int:
+        pass
+
+
+class _PackIndex:
+    """Índice de un pack cargado en memoria: shas ordenados y sus ubicaciones"""
+
+    __slots__ = ("pack_path", "shas", "locations")
+
+    pack_path: Path
+    shas: list[bytes]
+    locations: list[tuple[int, int]]
+
+    def __init__(
+        self, pack_path: Path, shas: list[bytes], locations: list[tuple[int, int]]
+    ) -> None:
+        self.pack_path = pack_path
+        self.shas = shas
+        self.locations = locations
+
+    def find(self, sha: bytes) -> tuple[int, int] | None:
+        position = bisect_left(self.shas, sha)
+        if position < len(self.shas) and self.shas[position] == sha:
+            return self.locations[position]
+        return None
+
+
+class LocalObjectPack(ObjectPack):
+    """
+    Packs en el sistema de archivos local.
+
+    Cada pack es un par de archivos:
+      - pack-<id>.pack: MAGIC + entradas (tipo + tamaño + datos)
+      - pack-<id>.idx: MAGIC + cantidad + registros (sha, offset, tamaño)
+        ordenados por sha para poder buscar con bisección.
+
+    Una entrada FULL guarda el objeto comprimido. Una entrada DELTA guarda el
+    sha del objeto base seguido de las instrucciones del delta comprimidas;
+    sólo los blobs se guardan como delta, y las cadenas de deltas nunca
+    superan max_depth.
+
+    Los packs nunca se modifican: cada llamada a write crea un pack nuevo.
+    El .idx se escribe después del .pack, así que un pack sin índice se ignora.
+
+    Si el compresor no comprime (zero_copy), los packs se mapean en memoria y
+    las entradas FULL se devuelven como vistas sin copiar.
+    """
+
+    PACK_MAGIC: bytes = b"MGPK\x01"
+    INDEX_MAGIC: bytes = b"MGIX\x01"
+    # Tipos de entrada dentro del pack
+    FULL_ENTRY: int = 0
+    DELTA_ENTRY: int = 1
+    # Prefijo del contenido crudo de un blob ("blob" + US)
+    BLOB_PREFIX: bytes = b"blob\x1e"
+
+    _ENTRY_HEADER: Struct = Struct(">BQ")
+    _INDEX_COUNT: Struct = Struct(">I")
+    _INDEX_RECORD: Struct = Struct(">32sQQ")
+
+    _base_dir: Path
+    _store: FileStore
+    _compressor: DataCompressor
+    _delta_encoder: DeltaEncoder | None
+    _max_depth: int
+    _window: int
+    _indexes: list[_PackIndex]
+    _scanned_mtime: int | None
+    _views: dict[Path, memoryview]
+
+    def __init__(
+        self,
+        base_dir: Path,
+        store: FileStore,
+        compressor: DataCompressor,
+        delta_encoder: DeltaEncoder | None = None,
+        max_depth: int = 10,
+        window: int = 10,
+    ) -> None:
+        self._base_dir = base_dir
+        self._store = store
+        self._compressor = compressor
+        self._delta_encoder = delta_encoder
+        self._max_depth = max_depth
+        self._window = window
+        self._indexes = []
+        self._scanned_mtime = None
+        self._views = {}
+
+    @override
+    def contains(self, sha: Sha256Hash) -> bool:
+        return self._locate(sha) is not None
+
+    @override
+    def read(self, sha: Sha256Hash) -> bytes | memoryview:
+        location = self._locate(sha)
+        if location is None:
+            raise FileNotFoundError(f"Object with hash {sha.sha} not found in packs")
+
+        pack_path, offset, length = location
+        if self._compressor.zero_copy:
+            entry = self._pack_view(pack_path)[offset : offset + length]
+        else:
+            entry = self._store.read_range(pack_path, offset, length)
+        kind, size = self._ENTRY_HEADER.unpack_from(entry)
+        data = entry[self._ENTRY_HEADER.size : self._ENTRY_HEADER.size + size]
+
+        if kind == self.FULL_ENTRY:
+            return self._compressor.decompress(data)
+        elif kind == self.DELTA_ENTRY:
+            if self._delta_encoder is None:
+                raise ValueError("Pack contains deltas but no delta encoder is set")
+            base = self.read(Sha256Hash.from_bytes(bytes(data[:32])))
+            delta = self._compressor.decompress(data[32:])
+            return self._delta_encoder.apply_delta(base, delta)
+        else:
+            raise ValueError(f"Unknown pack entry type: {kind}")
+
+    @override
+    def write(self, objects: Iterable[tuple[Sha256Hash, bytes]]) -> int:
+        """
+        Escribe un pack nuevo con los objetos dados (sha, contenido crudo).
+        Devuelve la cantidad de objetos empaquetados.
+        """
+        unique: dict[bytes, bytes] = {}
+        for sha, content in objects:
+            unique.setdefault(sha.digest, content)
+
+        pack_parts: list[bytes] = [self.PACK_MAGIC]
+        records: dict[bytes, tuple[int, int]] = {}
+        offset = len(self.PACK_MAGIC)
+
+        for raw_sha, kind, data in self._build_entries(unique):
+            entry = self._ENTRY_HEADER.pack(kind, len(data)) + data
+            pack_parts.append(entry)
+            records[raw_sha] = (offset, len(entry))
+            offset += len(entry)
+
+        if not records:
+            return 0
+
+        index_parts: list[bytes] = [
+            self.INDEX_MAGIC,
+            self._INDEX_COUNT.pack(len(records)),
+        ]
+        for raw_sha in sorted(records):
+            entry_offset, entry_length = records[raw_sha]
+            index_parts.append(
+                self._INDEX_RECORD.pack(raw_sha, entry_offset, entry_length)
+            )
+        index_data = b"".join(index_parts)
+
+        # El nombre del pack depende de su índice, así que es estable
+        pack_id = sha256(index_data).hexdigest()
+        pack_path = self._base_dir / f"pack-{pack_id}.pack"
+        index_path = self._base_dir / f"pack-{pack_id}.idx"
+        self._store.write(pack_path, b"".join(pack_parts))
+        self._store.write(index_path, index_data)
+
+        self._indexes.append(self._parse_index(pack_path, index_data))
+        return len(records)
+
+    def _build_entries(
+        self, objects: dict[bytes, bytes]
+    ) -> list[tuple[bytes, int, bytes]]:
+        """
+        Decide cómo guardar cada objeto. Los blobs se ordenan por tamaño y cada
+        uno se compara contra los `window` anteriores; si el delta comprimido
+        es más chico que la copia completa, se guarda como delta.
+        """
+        entries: list[tuple[bytes, int, bytes]] = []
+        blobs: list[bytes] = []
+        for raw_sha, content in objects.items():
+            if self._delta_encoder is not None and content.startswith(
+                self.BLOB_PREFIX
+            ):
+                blobs.append(raw_sha)
+            else:
+                entries.append(
+                    (raw_sha, self.FULL_ENTRY, self._compressor.compress(content))
+                )
+
+        if self._delta_encoder is None:
+            return entries
+
+        # Los más grandes primero: así los deltas tienden a ser eliminaciones
+        blobs.sort(key=lambda raw_sha: len(objects[raw_sha]), reverse=True)
+        depths: dict[bytes, int] = {}
+
+        for position, raw_sha in enumerate(blobs):
+            content = objects[raw_sha]
+            best_kind = self.FULL_ENTRY
+            best_data = self._compressor.compress(content)
+            best_depth = 0
+
+            for base_sha in blobs[max(0, position - self._window) : position]:
+                base_depth = depths[base_sha]
+                if base_depth >= self._max_depth:
+                    continue
+                delta = self._delta_encoder.make_delta(objects[base_sha], content)
+                # Un delta más grande que el objeto no vale la pena comprimirlo
+                if len(delta) >= len(content):
+                    continue
+                data = base_sha + self._compressor.compress(delta)
+                if len(data) < len(best_data):
+                    best_kind, best_data, best_depth = (
+                        self.DELTA_ENTRY,
+                        data,
+                        base_depth + 1,
+                    )
+
+            depths[raw_sha] = best_depth
+            entries.append((raw_sha, best_kind, best_data))
+
+        return entries
+
+    def _pack_view(self, pack_path: Path) -> memoryview:
+        """Vista mapeada en memoria de un pack (los packs nunca cambian)"""
+        view = self._views.get(pack_path)
+        if view is None:
+            view = self._store.read_view(pack_path)
+            self._views[pack_path] = view
+        return view
+
+    def _locate(self, sha: Sha256Hash) -> tuple[Path, int, int] | None:
+        raw_sha = sha.digest
+        location = self._find(raw_sha)
+        # Otro proceso pudo haber escrito un pack nuevo: volver a escanear
+        if location is None and self._refresh():
+            location = self._find(raw_sha)
+        return location
+
+    def _find(self, raw_sha: bytes) -> tuple[Path, int, int] | None:
+        for index in self._indexes:
+            found = index.find(raw_sha)
+            if found is not None:
+                return index.pack_path, found[0], found[1]
+        return None
+
+    def _refresh(self) -> bool:
+        """Recarga los índices si el directorio de packs cambió"""
+        if not self._base_dir.exists():
+            return False
+
+        mtime = self._base_dir.stat().st_mtime_ns
+        if mtime == self._scanned_mtime:
+            return False
+        self._scanned_mtime = mtime
+
+        known = {index.pack_path for index in self._indexes}
+        changed = False
+        for index_path in sorted(self._base_dir.glob("pack-*.idx")):
+            pack_path = index_path.with_suffix(".pack")
+            if pack_path in known or not pack_path.exists():
+                continue
+            self._indexes.append(
+                self._parse_index(pack_path, self._store.read(index_path))
+            )
+            changed = True
+        return changed
+
+    def _parse_index(self, pack_path: Path, index_data: bytes) -> _PackIndex:
+        if not index_data.startswith(self.INDEX_MAGIC):
+            raise ValueError(f"Invalid pack index: {pack_path}")
+
+        position = len(self.INDEX_MAGIC)
+        (count,) = self._INDEX_COUNT.unpack_from(index_data, position)
+        position += self._INDEX_COUNT.size
+
+        shas: list[bytes] = []
+        locations: list[tuple[int, int]] = []
+        for raw_sha, offset, length in self._INDEX_RECORD.iter_unpack(
+            index_data[position : position + count * self._INDEX_RECORD.size]
+        ):
+            shas.append(raw_sha)
+            locations.append((offset, length))
+        return _PackIndex(pack_path, shas, locations)
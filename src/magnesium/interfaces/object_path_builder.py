@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from re import fullmatch
 from typing import override
 from ..object_values import Sha256Hash
 from pathlib import Path
@@ -17,6 +19,10 @@ class ObjectPathBuilder(ABC):
     def exists(self, sha: Sha256Hash) -> bool:
         pass
 
+    @abstractmethod
+    def list_objects(self) -> Iterator[Sha256Hash]:
+        pass
+
 
 class LocalObjectPathBuilder(ObjectPathBuilder):
     """Constructor de rutas para objetos locales"""
@@ -35,3 +41,15 @@ class LocalObjectPathBuilder(ObjectPathBuilder):
     @override
     def exists(self, sha: Sha256Hash) -> bool:
         return self.build_object_path(sha).exists()
+
+    @override
+    def list_objects(self) -> Iterator[Sha256Hash]:
+        # Recorre objects/<32 hex>/<32 hex>, ignorando cualquier otro archivo
+        if not self._base_dir.exists():
+            return
+        for prefix_dir in sorted(self._base_dir.iterdir()):
+            if not prefix_dir.is_dir() or not fullmatch(r"[0-9a-f]{32}", prefix_dir.name):
+                continue
+            for object_file in sorted(prefix_dir.iterdir()):
+                if fullmatch(r"[0-9a-f]{32}", object_file.name):
+                    yield Sha256Hash(prefix_dir.name + object_file.name)
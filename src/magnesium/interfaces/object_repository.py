@@ -1,14 +1,17 @@
 from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
 from datetime import datetime
 from hashlib import sha256
 from os import makedirs
 from pathlib import Path
 from typing import override
+from uuid import uuid4
 from ..object_values import Blob, Commit, DirEntry, Email, FileEntry, Sha256Hash, Tree
 from .object_path_builder import ObjectPathBuilder
 from .data_compressor import DataCompressor
 from .data_encoder import DataEncoder
 from .file_store import FileStore
+from .object_pack import ObjectPack
 
 
 class ObjectRepository(ABC):
@@ -28,6 +31,10 @@ class ObjectRepository(ABC):
     def save(self, object: Blob | Tree | Commit) -> Sha256Hash:
         pass
 
+    def save_many(self, objects: Iterable[Blob | Tree | Commit]) -> list[Sha256Hash]:
+        """Saves a batch of objects and returns their hashes, in order."""
+        return [self.save(object) for object in objects]
+
     @abstractmethod
     def load(self, sha: Sha256Hash) -> Blob | Tree | Commit:
         pass
@@ -43,10 +50,15 @@ class LocalObjectRepository(ObjectRepository):
     _compressor: DataCompressor
     _path_builder: ObjectPathBuilder
     _base_path: Path
+    _pack: ObjectPack | None
     # Caracteres de control ASCII para separación
     UNIT_SEPARATOR: str = "\x1e"  # ASCII US (Unit Separator)
     RECORD_SEPARATOR: str = "\x1f"  # ASCII RS (Record Separator)
     GROUP_SEPARATOR: str = "\x1d"  # ASCII GS (Group Separator)
+    # Tamaño de los bloques al guardar archivos en streaming
+    CHUNK_SIZE: int = 1024 * 1024
+    # El header (type + US + size) nunca es más largo que esto
+    MAX_HEADER_SIZE: int = 64
 
     def __init__(
         self,
@@ -55,12 +67,14 @@ class LocalObjectRepository(ObjectRepository):
         encoder: DataEncoder,
         compressor: DataCompressor,
         path_builder: ObjectPathBuilder,
+        pack: ObjectPack | None = None,
     ) -> None:
         self._store = store
         self._path_builder = path_builder
         self._encoder = encoder
         self._compressor = compressor
         self._base_path = base_path
+        self._pack = pack
 
     @override
     def init(self):
@@ -69,104 +83,84 @@ class LocalObjectRepository(ObjectRepository):
     @override
     def exists(self, sha: Sha256Hash) -> bool:
         object_path = self._path_builder.build_object_path(sha)
-        return object_path.exists()
+        if object_path.exists():
+            return True
+        return self._pack is not None and self._pack.contains(sha)
 
     @override
     def hash_object(self, object: Blob | Tree | Commit) -> Sha256Hash:
-        content = ""
-        if isinstance(object, Blob):
-            encoded_blob = self._encoder.encode(object.content)
-            content = f"blob{self.UNIT_SEPARATOR}{len(encoded_blob)}{self.GROUP_SEPARATOR}{encoded_blob}"
-        elif isinstance(object, Tree):
-            content = f"tree{self.UNIT_SEPARATOR}"
-            body = ""
-            for entry in object.directories:
-                body += f"tree{self.UNIT_SEPARATOR}{entry.mode}{self.UNIT_SEPARATOR}{entry.sha.sha}{self.UNIT_SEPARATOR}{entry.name}{self.RECORD_SEPARATOR}"
-            body += self.GROUP_SEPARATOR
-            for entry in object.files:
-                body += f"blob{self.UNIT_SEPARATOR}{entry.mode}{self.UNIT_SEPARATOR}{entry.sha.sha}{self.UNIT_SEPARATOR}{entry.name}{self.RECORD_SEPARATOR}"
-            encoded_body = self._encoder.encode(body)
-            content += f"{len(encoded_body)}{self.GROUP_SEPARATOR}{encoded_body}"
-        else:
-            body = f"{object.author}{self.UNIT_SEPARATOR}{object.email.email}{self.UNIT_SEPARATOR}{object.date.isoformat()}{self.UNIT_SEPARATOR}{object.message}{self.UNIT_SEPARATOR}{object.tree.sha}{self.UNIT_SEPARATOR}"
-            for parent in object.parents:
-                body += f"{parent.sha}{self.UNIT_SEPARATOR}"
-            encoded_body = self._encoder.encode(body)
-            content = f"commit{self.UNIT_SEPARATOR}{len(encoded_body)}{self.GROUP_SEPARATOR}{encoded_body}"
-        encoded_content = self._encoder.encode(content)
-        hexdigest = sha256(encoded_content).hexdigest()
-        hash = Sha256Hash(hexdigest)
-        return hash
+        return Sha256Hash.from_bytes(sha256(self._serialize(object)).digest())
 
     @override
     def save(self, object: Blob | Tree | Commit) -> Sha256Hash:
-        # Calcular el hash del objeto
-        object_hash = self.hash_object(object)
+        # Una sola serialización alimenta tanto al hash como al compresor
+        encoded_content = self._serialize(object)
+        object_hash = Sha256Hash.from_bytes(sha256(encoded_content).digest())
 
         # Si el objeto ya existe, no hacer nada
-        if self.exists(object_hash):
-            return object_hash
-
-        # Construir el contenido según el formato especificado
-        if isinstance(object, Blob):
-            # Header: type + US + size
-            header = f"blob{self.UNIT_SEPARATOR}{len(object.content)}"
-            # Body: contenido directo
-            body = object.content
-            # Contenido final: header + GS + body
-            content = f"{header}{self.GROUP_SEPARATOR}{body}"
+        if not self.exists(object_hash):
+            self._write_object(object_hash, encoded_content)
 
-        elif isinstance(object, Tree):
-            # Construir el body con entradas separadas por RS
-            body_parts: list[str] = []
-
-            # Directorios
-            for dir_entry in object.directories:
-                entry_str = f"tree{self.UNIT_SEPARATOR}{dir_entry.mode}{self.UNIT_SEPARATOR}{dir_entry.sha.sha}{self.UNIT_SEPARATOR}{dir_entry.name}"
-                body_parts.append(entry_str)
-
-            # Files
-            for file_entry in object.files:
-                entry_str = f"blob{self.UNIT_SEPARATOR}{file_entry.mode}{self.UNIT_SEPARATOR}{file_entry.sha.sha}{self.UNIT_SEPARATOR}{file_entry.name}"
-                body_parts.append(entry_str)
-
-            # Unir todas las entradas con RS
-            body = self.RECORD_SEPARATOR.join(body_parts)
-
-            # Header: type + US + tamaño del body
-            header = f"tree{self.UNIT_SEPARATOR}{len(body)}"
-            # Contenido final: header + GS + body
-            content = f"{header}{self.GROUP_SEPARATOR}{body}"
-
-        else:  # Commit
-            # Construir el body con campos separados por US
-            body_parts = [
-                object.author,
-                object.email.email,
-                object.date.isoformat(),
-                object.message,
-                object.tree.sha,
-            ]
-
-            # Agregar padres
-            for parent in object.parents:
-                body_parts.append(parent.sha)
-
-            # Unir campos con US
-            body = self.UNIT_SEPARATOR.join(body_parts)
-
-            # Header: type + US + tamaño del body
-            header = f"commit{self.UNIT_SEPARATOR}{len(body)}"
-            # Contenido final: header + GS + body
-            content = f"{header}{self.GROUP_SEPARATOR}{body}"
-
-        # Codificar, comprimir y guardar
-        encoded_content = self._encoder.encode(content)
-        compressed_content = self._compressor.compress(encoded_content)
+        return object_hash
 
-        object_path = self._path_builder.build_object_path(object_hash)
-        self._store.write(object_path, compressed_content)
+    @override
+    def save_many(self, objects: Iterable[Blob | Tree | Commit]) -> list[Sha256Hash]:
+        hashes: list[Sha256Hash] = []
+        written: set[Sha256Hash] = set()
+        for object in objects:
+            encoded_content = self._serialize(object)
+            object_hash = Sha256Hash.from_bytes(sha256(encoded_content).digest())
+            hashes.append(object_hash)
+
+            # Los repetidos dentro del lote se guardan una sola vez
+            if object_hash in written:
+                continue
+            written.add(object_hash)
+            if not self.exists(object_hash):
+                self._write_object(object_hash, encoded_content)
+
+        return hashes
+
+    def save_file(self, file_path: Path) -> Sha256Hash:
+        """
+        Guarda un archivo como Blob sin cargarlo entero en memoria.
+
+        El archivo se lee por bloques que alimentan a la vez al sha256 y al
+        compresor; lo comprimido va a un archivo temporal que se renombra a su
+        ruta final una vez que se conoce el hash. Produce el mismo hash que
+        save(Blob(...)) con el mismo contenido.
+        """
+        size = file_path.stat().st_size
+        header = self._header("blob", size)
+        hasher = sha256(header)
+
+        def read_chunks() -> Iterator[bytes]:
+            yield header
+            read = 0
+            with open(file_path, "rb") as f:
+                while chunk := f.read(self.CHUNK_SIZE):
+                    read += len(chunk)
+                    hasher.update(chunk)
+                    yield chunk
+            if read != size:
+                raise ValueError(f"File {file_path} changed while being saved")
+
+        temp_path = self._base_path / "tmp" / uuid4().hex
+        try:
+            self._store.write_stream(
+                temp_path, self._compressor.compress_stream(read_chunks())
+            )
+        except BaseException:
+            if temp_path.exists():
+                self._store.delete(temp_path)
+            raise
 
+        object_hash = Sha256Hash.from_bytes(hasher.digest())
+        if self.exists(object_hash):
+            self._store.delete(temp_path)
+        else:
+            object_path = self._path_builder.build_object_path(object_hash)
+            self._store.move(temp_path, object_path)
         return object_hash
 
     @override
@@ -174,21 +168,18 @@ class LocalObjectRepository(ObjectRepository):
         if not self.exists(sha):
             raise FileNotFoundError(f"Object with hash {sha.sha} not found")
 
-        # Obtener la ruta y leer el contenido
-        object_path = self._path_builder.build_object_path(sha)
-        compressed_content = self._store.read(object_path)
-
-        # Descomprimir y decodificar
-        encoded_content = self._compressor.decompress(compressed_content)
-        content = self._encoder.decode(encoded_content)
+        # Leer el contenido desde el objeto suelto o, si no está, desde los packs
+        encoded_content = self._read_raw(sha)
 
-        # Parsear el contenido según el formato: header + GS + body
-        gs_pos = content.find(self.GROUP_SEPARATOR)
+        # Parsear el contenido según el formato: header + GS + body.
+        # Sólo se copia el header; el body puede ser una vista sobre un mmap
+        head = bytes(encoded_content[: self.MAX_HEADER_SIZE])
+        gs_pos = head.find(self._encoder.encode(self.GROUP_SEPARATOR))
         if gs_pos == -1:
             raise ValueError("Invalid object format: missing group separator")
 
-        header = content[:gs_pos]
-        body = content[gs_pos + 1 :]
+        header = self._encoder.decode(head[:gs_pos])
+        encoded_body = encoded_content[gs_pos + 1 :]
 
         # Parsear header: type + US + size
         us_pos = header.find(self.UNIT_SEPARATOR)
@@ -198,18 +189,24 @@ class LocalObjectRepository(ObjectRepository):
         type_name = header[:us_pos]
         size_str = header[us_pos + 1 :]
 
-        # Verificar que el tamaño coincida
+        # Verificar que el tamaño (en bytes) coincida
         expected_size = int(size_str)
-        if len(body) != expected_size:
+        if (
+            len(encoded_body) != expected_size
+            and self._legacy_size(encoded_body) != expected_size
+        ):
             raise ValueError(
-                f"Size mismatch: expected {expected_size}, got {len(body)}"
+                f"Size mismatch: expected {expected_size}, got {len(encoded_body)}"
             )
 
-        # Parsear según el tipo
+        # Los blobs se devuelven tal cual: sólo trees y commits son texto
         if type_name == "blob":
-            return Blob(content=body)
+            return Blob(content=encoded_body)
+
+        body = self._encoder.decode(bytes(encoded_body))
 
-        elif type_name == "tree":
+        # Parsear según el tipo
+        if type_name == "tree":
             directories: list[DirEntry] = []
             files: list[FileEntry] = []
 
@@ -278,6 +275,111 @@ class LocalObjectRepository(ObjectRepository):
 
         # Eliminar el archivo
         object_path = self._path_builder.build_object_path(sha)
+        if not object_path.exists():
+            raise ValueError(f"Object {sha.sha} is packed and cannot be deleted")
         self._store.delete(object_path)
 
         return object
+
+    def repack(self) -> int:
+        """
+        Mueve todos los objetos sueltos a un pack nuevo y borra los sueltos.
+        Devuelve la cantidad de objetos empaquetados.
+        """
+        if self._pack is None:
+            raise ValueError("Repository has no pack storage configured")
+
+        loose: list[tuple[Sha256Hash, bytes]] = []
+        for sha in self._path_builder.list_objects():
+            object_path = self._path_builder.build_object_path(sha)
+            compressed_content = self._store.read(object_path)
+            loose.append((sha, self._compressor.decompress(compressed_content)))
+
+        if not loose:
+            return 0
+
+        # Los sueltos se borran sólo después de que el pack quedó escrito
+        packed = self._pack.write(loose)
+        for sha, _ in loose:
+            object_path = self._path_builder.build_object_path(sha)
+            self._store.delete(object_path)
+            try:
+                object_path.parent.rmdir()
+            except OSError:
+                pass
+
+        return packed
+
+    def _serialize(self, object: Blob | Tree | Commit) -> bytes:
+        """
+        Serialización canónica de un objeto: header + GS + body, donde el
+        header es type + US + tamaño del body en bytes. Estos mismos bytes se
+        hashean y se guardan.
+        """
+        us = self.UNIT_SEPARATOR
+
+        if isinstance(object, Blob):
+            # El contenido de un blob ya son bytes: no pasa por el encoder
+            return self._header("blob", len(object.content)) + object.content
+
+        elif isinstance(object, Tree):
+            # Entradas type + US + mode + US + sha + US + name, separadas por RS
+            body_parts = [
+                f"tree{us}{entry.mode}{us}{entry.sha.sha}{us}{entry.name}"
+                for entry in object.directories
+            ]
+            body_parts.extend(
+                f"blob{us}{entry.mode}{us}{entry.sha.sha}{us}{entry.name}"
+                for entry in object.files
+            )
+            body = self._encoder.encode(self.RECORD_SEPARATOR.join(body_parts))
+            return self._header("tree", len(body)) + body
+
+        else:  # Commit
+            # Campos separados por US, seguidos de los padres
+            body_parts = [
+                object.author,
+                object.email.email,
+                object.date.isoformat(),
+                object.message,
+                object.tree.sha,
+            ]
+            body_parts.extend(parent.sha for parent in object.parents)
+            body = self._encoder.encode(us.join(body_parts))
+            return self._header("commit", len(body)) + body
+
+    def _legacy_size(self, encoded_body: bytes | memoryview) -> int | None:
+        """
+        Los objetos escritos antes de contar bytes guardaban en el header la
+        cantidad de caracteres del body: se siguen aceptando al leerlos.
+        """
+        try:
+            return len(self._encoder.decode(bytes(encoded_body)))
+        except ValueError:
+            return None
+
+    def _header(self, type_name: str, size: int) -> bytes:
+        """Header de un objeto (type + US + size en bytes + GS)"""
+        return self._encoder.encode(
+            f"{type_name}{self.UNIT_SEPARATOR}{size}{self.GROUP_SEPARATOR}"
+        )
+
+    def _write_object(self, sha: Sha256Hash, encoded_content: bytes):
+        """Comprime y guarda un objeto suelto de forma atómica"""
+        compressed_content = self._compressor.compress(encoded_content)
+        temp_path = self._base_path / "tmp" / uuid4().hex
+        self._store.write(temp_path, compressed_content)
+        self._store.move(temp_path, self._path_builder.build_object_path(sha))
+
+    def _read_raw(self, sha: Sha256Hash) -> bytes | memoryview:
+        """
+        Lee el contenido descomprimido de un objeto suelto o empaquetado.
+        Si el compresor no transforma los datos, devuelve una vista sobre el
+        archivo mapeado en memoria en lugar de copiarlo.
+        """
+        object_path = self._path_builder.build_object_path(sha)
+        if object_path.exists() or self._pack is None:
+            if self._compressor.zero_copy:
+                return self._compressor.decompress(self._store.read_view(object_path))
+            return self._compressor.decompress(self._store.read(object_path))
+        return self._pack.read(sha)
@@ -0,0 +1,193 @@
+from abc import ABC, abstractmethod
+from hashlib import sha256
+from os import stat_result
+from pathlib import Path
+from time import time_ns
+from typing import override
+
+from ..object_values import DirEntry, FileEntry, Sha256Hash
+from .data_encoder import DataEncoder
+from .file_store import FileStore
+
+
+class SnapshotIndex(ABC):
+    """
+    A persistent stat cache used while building snapshots. It remembers the
+    blob sha of every file (by its stat data) and the tree sha of every
+    directory (by its entries), so unchanged files are never read again.
+    """
+
+    @abstractmethod
+    def lookup_file(self, path: str, stat: stat_result) -> Sha256Hash | None:
+        pass
+
+    @abstractmethod
+    def record_file(self, path: str, stat: stat_result, sha: Sha256Hash):
+        pass
+
+    @abstractmethod
+    def lookup_tree(
+        self, path: str, directories: list[DirEntry], files: list[FileEntry]
+    ) -> Sha256Hash | None:
+        pass
+
+    @abstractmethod
+    def record_tree(
+        self,
+        path: str,
+        directories: list[DirEntry],
+        files: list[FileEntry],
+        sha: Sha256Hash,
+    ):
+        pass
+
+    @abstractmethod
+    def save(self):
+        pass
+
+
+class LocalSnapshotIndex(SnapshotIndex):
+    """
+    Índice guardado en un archivo local.
+
+    Formato: registros separados por RS, campos separados por US.
+      - T US <timestamp ns>                               (cabecera)
+      - f US path US size US mtime_ns US inode US sha     (archivos)
+      - d US path US digest de las entradas US sha        (directorios)
+
+    Cada snapshot arma un índice nuevo con sólo las rutas visitadas, así que
+    las rutas borradas desaparecen al guardar. Un archivo modificado después
+    de escribir el índice, pero con el mismo mtime (el caso "racy" de git),
+    se detecta porque su mtime no es anterior a la cabecera y se vuelve a leer.
+    """
+
+    UNIT_SEPARATOR: str = "\x1f"
+    RECORD_SEPARATOR: str = "\x1e"
+
+    _index_path: Path
+    _store: FileStore
+    _encoder: DataEncoder
+    _written_at: int
+    _files: dict[str, tuple[int, int, int, str]]
+    _trees: dict[str, tuple[str, str]]
+    _next_files: dict[str, tuple[int, int, int, str]]
+    _next_trees: dict[str, tuple[str, str]]
+
+    def __init__(self, index_path: Path, store: FileStore, encoder: DataEncoder):
+        self._index_path = index_path
+        self._store = store
+        self._encoder = encoder
+        self._written_at = 0
+        self._files = {}
+        self._trees = {}
+        self._next_files = {}
+        self._next_trees = {}
+        self._load()
+
+    @override
+    def lookup_file(self, path: str, stat: stat_result) -> Sha256Hash | None:
+        cached = self._files.get(path)
+        if cached is None:
+            return None
+
+        size, mtime_ns, inode, sha = cached
+        if (
+            size != stat.st_size
+            or mtime_ns != stat.st_mtime_ns
+            or inode != stat.st_ino
+            or mtime_ns >= self._written_at
+        ):
+            return None
+
+        self._next_files[path] = cached
+        return Sha256Hash(sha)
+
+    @override
+    def record_file(self, path: str, stat: stat_result, sha: Sha256Hash):
+        self._next_files[path] = (
+            stat.st_size,
+            stat.st_mtime_ns,
+            stat.st_ino,
+            sha.sha,
+        )
+
+    @override
+    def lookup_tree(
+        self, path: str, directories: list[DirEntry], files: list[FileEntry]
+    ) -> Sha256Hash | None:
+        cached = self._trees.get(path)
+        if cached is None:
+            return None
+
+        digest, sha = cached
+        if digest != self._entries_digest(directories, files):
+            return None
+
+        self._next_trees[path] = cached
+        return Sha256Hash(sha)
+
+    @override
+    def record_tree(
+        self,
+        path: str,
+        directories: list[DirEntry],
+        files: list[FileEntry],
+        sha: Sha256Hash,
+    ):
+        self._next_trees[path] = (self._entries_digest(directories, files), sha.sha)
+
+    @override
+    def save(self):
+        us = self.UNIT_SEPARATOR
+        written_at = time_ns()
+        records = [f"T{us}{written_at}"]
+        for path, (size, mtime_ns, inode, sha) in self._next_files.items():
+            records.append(
+                f"f{us}{path}{us}{size}{us}{mtime_ns}{us}{inode}{us}{sha}"
+            )
+        for path, (digest, sha) in self._next_trees.items():
+            records.append(f"d{us}{path}{us}{digest}{us}{sha}")
+
+        serialized = self.RECORD_SEPARATOR.join(records) + self.RECORD_SEPARATOR
+        self._store.write(self._index_path, self._encoder.encode(serialized))
+
+        # El índice recién escrito pasa a ser la base del próximo snapshot
+        self._written_at = written_at
+        self._files, self._next_files = self._next_files, {}
+        self._trees, self._next_trees = self._next_trees, {}
+
+    def _load(self):
+        """Carga el índice del disco; si no existe o está dañado, empieza vacío"""
+        if not self._index_path.exists():
+            return
+
+        try:
+            serialized = self._encoder.decode(self._store.read(self._index_path))
+            for record in serialized.split(self.RECORD_SEPARATOR):
+                if not record:
+                    continue
+                kind, *fields = record.split(self.UNIT_SEPARATOR)
+                if kind == "T":
+                    self._written_at = int(fields[0])
+                elif kind == "f":
+                    path, size, mtime_ns, inode, sha = fields
+                    self._files[path] = (int(size), int(mtime_ns), int(inode), sha)
+                elif kind == "d":
+                    path, digest, sha = fields
+                    self._trees[path] = (digest, sha)
+        except Exception as e:
+            print(f"Warning: Could not load snapshot index: {e}")
+            self._files = {}
+            self._trees = {}
+
+    def _entries_digest(
+        self, directories: list[DirEntry], files: list[FileEntry]
+    ) -> str:
+        """Resumen de las entradas de un directorio (nombre, modo y sha)"""
+        us = self.UNIT_SEPARATOR
+        digest = sha256()
+        for kind, entries in (("d", directories), ("f", files)):
+            for entry in entries:
+                record = f"{kind}{us}{entry.name}{us}{entry.mode}{us}{entry.sha.sha}"
+                digest.update(self._encoder.encode(record + self.RECORD_SEPARATOR))
+        return digest.hexdigest()
@@ -10,15 +10,21 @@ from .diffs import (
     AddedLine,
     DeletedLine,
     UnchangedLine,
+    InlineDiff,
     AddedDirEntry,
     AddedFileEntry,
     UnchangedFileEntry,
     UnchangedDirEntry,
     DeletedFileEntry,
     DeletedDirEntry,
+    ModifiedFileEntry,
+    RenamedFileEntry,
+    CopiedFileEntry,
     BlobDiff,
+    OpcodeBlobDiff,
     TreeDiff,
 )
+from .merge import ConflictHunk, MergeConflict, MergeResult
 
 __all__ = [
     "Sha256Hash",
@@ -35,12 +41,20 @@ __all__ = [
     "AddedLine",
     "DeletedLine",
     "UnchangedLine",
+    "InlineDiff",
     "AddedDirEntry",
     "AddedFileEntry",
     "UnchangedFileEntry",
     "UnchangedDirEntry",
     "DeletedFileEntry",
     "DeletedDirEntry",
+    "ModifiedFileEntry",
+    "RenamedFileEntry",
+    "CopiedFileEntry",
     "BlobDiff",
+    "OpcodeBlobDiff",
     "TreeDiff",
+    "ConflictHunk",
+    "MergeConflict",
+    "MergeResult",
 ]
@@ -1,13 +1,31 @@
+import io
 from dataclasses import dataclass
+from functools import cached_property
 
 
 @dataclass
 class Blob:
-    content: str
+    # Puede ser una vista (memoryview) sobre un objeto mapeado en memoria
+    content: bytes | memoryview
 
     def __post_init__(self):
-        pass
+        # Por compatibilidad se acepta texto, que se guarda como UTF-8
+        if isinstance(self.content, str):
+            self.content = self.content.encode("utf-8")
+
+    @cached_property
+    def text(self) -> str:
+        """Vista de texto del contenido, decodificada sólo cuando se pide"""
+        return str(self.content, "utf-8", errors="replace")
+
+    def is_binary(self) -> bool:
+        """Heurística de git: un byte nulo al principio indica binario"""
+        return b"\x00" in bytes(self.content[:8000])
 
     def get_lines(self) -> list[str]:
-        """Divide el contenido en líneas para el diff"""
-        return self.content.splitlines(keepends=True)
+        r"""
+        Divide el contenido en líneas para el diff. Sólo "\n" termina una
+        línea: str.splitlines() también corta en "\r", "\x0c" o "\u2028", y
+        el patch marcaría esos cortes como líneas sin salto final.
+        """
+        return io.StringIO(self.text, newline="\n").readlines()
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from .tree import DirEntry, FileEntry
 
@@ -39,6 +39,22 @@ class UnchangedLine:
             print(e)
 
 
+@dataclass
+class InlineDiff:
+    """
+    Diff dentro de un par de líneas reemplazadas: base_position y
+    source_position son los índices de las líneas en cada blob, y opcodes
+    son tramos como los de OpcodeBlobDiff, pero en caracteres de la línea.
+    """
+
+    base_position: int
+    source_position: int
+    opcodes: list[tuple[str, int, int, int, int]]
+
+    def __post_init__(self):
+        assert self.base_position >= 0 and self.source_position >= 0
+
+
 @dataclass
 class DeletedFileEntry:
     content: FileEntry
@@ -63,6 +79,36 @@ class UnchangedFileEntry:
         pass
 
 
+@dataclass
+class ModifiedFileEntry:
+    previous: FileEntry
+    content: FileEntry
+
+    def __post_init__(self):
+        pass
+
+
+@dataclass
+class RenamedFileEntry:
+    previous: FileEntry
+    content: FileEntry
+    # Porcentaje de contenido en común; 100 si el sha es el mismo
+    similarity: int = 100
+
+    def __post_init__(self):
+        assert 0 <= self.similarity <= 100
+
+
+@dataclass
+class CopiedFileEntry:
+    previous: FileEntry
+    content: FileEntry
+    similarity: int = 100
+
+    def __post_init__(self):
+        assert 0 <= self.similarity <= 100
+
+
 @dataclass
 class DeletedDirEntry:
     content: DirEntry
@@ -87,7 +133,7 @@ class UnchangedDirEntry:
         pass
 
 
-@dataclass
+@dataclass(slots=True)
 class BlobDiff:
     additions: list[AddedLine]
     deletions: list[DeletedLine]
@@ -99,6 +145,104 @@ class BlobDiff:
         )
 
 
+class OpcodeBlobDiff(BlobDiff):
+    """
+    BlobDiff guardado como tramos (operation, base_start, base_length,
+    source_start, source_length), con operation "equal", "delete", "insert"
+    o "replace", más referencias a las líneas de los dos blobs.
+
+    Las listas additions, deletions y unchanged_lines de BlobDiff se arman
+    recién la primera vez que se piden, con las mismas posiciones de
+    siempre: un diff grande que sólo se recorre por tramos no crea un objeto
+    por línea. La igualdad también se define sobre esas listas, así que es
+    igual a un BlobDiff con las mismas líneas.
+
+    A diferencia de BlobDiff, puede no tener líneas: el diff entre dos
+    archivos vacíos no tiene tramos.
+    """
+
+    __slots__ = ("opcodes", "base_lines", "source_lines", "_lines")
+
+    opcodes: list[tuple[str, int, int, int, int]]
+    base_lines: list[str]
+    source_lines: list[str]
+    _lines: tuple[list[AddedLine], list[DeletedLine], list[UnchangedLine]] | None
+
+    def __init__(
+        self,
+        opcodes: list[tuple[str, int, int, int, int]],
+        base_lines: list[str],
+        source_lines: list[str],
+    ) -> None:
+        self.opcodes = opcodes
+        self.base_lines = base_lines
+        self.source_lines = source_lines
+        self._lines = None
+        self.__post_init__()
+
+    def __post_init__(self):
+        # Los tramos son consecutivos y cubren las líneas de los dos blobs
+        base_end = source_end = 0
+        for operation, base_start, base_length, source_start, source_length in (
+            self.opcodes
+        ):
+            assert operation in ("equal", "delete", "insert", "replace")
+            assert base_start == base_end and source_start == source_end
+            base_end += base_length
+            source_end += source_length
+        assert base_end == len(self.base_lines)
+        assert source_end == len(self.source_lines)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, BlobDiff):
+            return NotImplemented
+        return (
+            self.additions == other.additions
+            and self.deletions == other.deletions
+            and self.unchanged_lines == other.unchanged_lines
+        )
+
+    @property
+    def additions(self) -> list[AddedLine]:
+        return self._materialize()[0]
+
+    @property
+    def deletions(self) -> list[DeletedLine]:
+        return self._materialize()[1]
+
+    @property
+    def unchanged_lines(self) -> list[UnchangedLine]:
+        return self._materialize()[2]
+
+    def _materialize(
+        self,
+    ) -> tuple[list[AddedLine], list[DeletedLine], list[UnchangedLine]]:
+        if self._lines is not None:
+            return self._lines
+
+        additions: list[AddedLine] = []
+        deletions: list[DeletedLine] = []
+        unchanged: list[UnchangedLine] = []
+        # Posición en el resultado: avanza con las líneas iguales y agregadas
+        position = 0
+        for operation, base_start, base_length, source_start, source_length in (
+            self.opcodes
+        ):
+            if operation == "equal":
+                for line in self.base_lines[base_start : base_start + base_length]:
+                    unchanged.append(UnchangedLine(position=position, content=line))
+                    position += 1
+                continue
+            for line in self.base_lines[base_start : base_start + base_length]:
+                deletions.append(DeletedLine(position=position, content=line))
+            for line in self.source_lines[source_start : source_start + source_length]:
+                additions.append(AddedLine(position=position, content=line))
+                position += 1
+
+        self._lines = (additions, deletions, unchanged)
+        return self._lines
+
+
 @dataclass
 class TreeDiff:
     added_files: list[AddedFileEntry]
@@ -107,6 +251,9 @@ class TreeDiff:
     added_dirs: list[AddedDirEntry]
     deleted_dirs: list[DeletedDirEntry]
     unchanged_dirs: list[UnchangedDirEntry]
+    modified_files: list[ModifiedFileEntry] = field(default_factory=list)
+    renamed_files: list[RenamedFileEntry] = field(default_factory=list)
+    copied_files: list[CopiedFileEntry] = field(default_factory=list)
 
     def __post_init__(self):
         assert (
@@ -116,4 +263,7 @@ class TreeDiff:
             or self.deleted_files != []
             or self.unchanged_dirs != []
             or self.unchanged_files != []
+            or self.modified_files != []
+            or self.renamed_files != []
+            or self.copied_files != []
         )
@@ -1,15 +1,95 @@
-from dataclasses import dataclass
-from re import fullmatch
+from typing import ClassVar, Self
+from weakref import WeakValueDictionary
 
 
-@dataclass
 class Sha256Hash:
-    sha: str
+    """
+    Hash SHA-256 inmutable. Guarda los 32 bytes del digest en vez de los 64
+    caracteres hexadecimales: ocupa menos, se compara y se hashea rápido y
+    sirve como clave de diccionarios y conjuntos. `sha` sigue devolviendo
+    el texto hexadecimal.
+    """
 
-    def __post_init__(self):
-        try:
-            assert fullmatch(r"[0-9a-f]{64}", self.sha), (
-                "El formato del hash es inválido. Un hash string sólo puede contener dígitos hexadecimales y debe ser de 256 bits de longitud."
+    __slots__ = ("_digest", "__weakref__")
+
+    _digest: bytes
+
+    # Instancias canónicas de intern(), mientras alguien las use
+    _interned: ClassVar[WeakValueDictionary[bytes, "Sha256Hash"]] = (
+        WeakValueDictionary()
+    )
+
+    def __init__(self, sha: str) -> None:
+        digest = self._parse(sha)
+        if digest is None:
+            raise ValueError(
+                "El formato del hash es inválido. Un hash string sólo puede "
+                "contener dígitos hexadecimales y debe ser de 256 bits de "
+                f"longitud: {sha!r}"
             )
-        except Exception as e:
-            print(e)
+        _set_digest(self, digest)
+
+    @classmethod
+    def is_valid(cls, sha: str) -> bool:
+        """Si el texto es un hash válido (64 dígitos hexadecimales en minúscula)"""
+        return cls._parse(sha) is not None
+
+    @classmethod
+    def from_bytes(cls, digest: bytes) -> Self:
+        """Crea el hash desde el digest crudo, sin pasar por hexadecimal"""
+        if len(digest) != 32:
+            raise ValueError(f"A SHA-256 digest has 32 bytes, not {len(digest)}")
+        instance = object.__new__(cls)
+        _set_digest(instance, bytes(digest))
+        return instance
+
+    @property
+    def sha(self) -> str:
+        return self._digest.hex()
+
+    @property
+    def digest(self) -> bytes:
+        return self._digest
+
+    def intern(self) -> "Sha256Hash":
+        """
+        La instancia canónica con este valor: los hashes que se repiten
+        mucho (entradas de trees, padres de commits) comparten un objeto.
+        """
+        return self._interned.setdefault(self._digest, self)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sha256Hash):
+            return NotImplemented
+        return self._digest == other._digest
+
+    def __hash__(self) -> int:
+        return hash(self._digest)
+
+    def __repr__(self) -> str:
+        return f"Sha256Hash(sha={self.sha!r})"
+
+    def __setattr__(self, name: str, value: object):
+        raise AttributeError(f"Sha256Hash is immutable: cannot set {name!r}")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"Sha256Hash is immutable: cannot delete {name!r}")
+
+    def __reduce__(self):
+        return (Sha256Hash.from_bytes, (self._digest,))
+
+    @staticmethod
+    def _parse(sha: str) -> bytes | None:
+        # bytes.fromhex (en C) reemplaza al fullmatch: rechaza lo que no es
+        # hexadecimal, y el largo del texto descarta los espacios que acepta
+        if not isinstance(sha, str) or len(sha) != 64 or sha.lower() != sha:
+            return None
+        try:
+            digest = bytes.fromhex(sha)
+        except ValueError:
+            return None
+        return digest if len(digest) == 32 else None
+
+
+# El único camino para escribir el slot, ya que __setattr__ lo prohíbe
+_set_digest = Sha256Hash._digest.__set__
@@ -0,0 +1,47 @@
+from dataclasses import dataclass, field
+
+from .hash import Sha256Hash
+
+
+@dataclass
+class ConflictHunk:
+    # Línea del resultado donde empieza el bloque con marcadores
+    position: int
+    base: list[str]
+    ours: list[str]
+    theirs: list[str]
+
+    def __post_init__(self):
+        try:
+            assert self.position >= 0
+        except Exception as e:
+            print(e)
+
+
+@dataclass
+class MergeConflict:
+    path: str
+    # "content", "add/add", "modify/delete" o "file/directory"
+    kind: str
+    base: Sha256Hash | None
+    ours: Sha256Hash | None
+    theirs: Sha256Hash | None
+    hunks: list[ConflictHunk] = field(default_factory=list)
+
+    def __post_init__(self):
+        try:
+            assert self.kind in (
+                "content",
+                "add/add",
+                "modify/delete",
+                "file/directory",
+            ), "Tipo de conflicto desconocido."
+        except Exception as e:
+            print(e)
+
+
+@dataclass
+class MergeResult:
+    tree: Sha256Hash | None
+    base: Sha256Hash | None
+    conflicts: list[MergeConflict]
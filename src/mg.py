@@ -1,20 +1,26 @@
 # simple_snapshot.py
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
-from magnesium.interfaces.data_compressor import GzipCompressor
+from magnesium.application.patch import commit_patch
+from magnesium.interfaces.cached_differ import CachedDiffer
+from magnesium.interfaces.cached_object_repository import CachedObjectRepository
+from magnesium.interfaces.commit_graph import CommitGraph, LocalCommitGraph
+from magnesium.interfaces.data_compressor import TaggedCompressor, ZlibCompressor
 
 # Asumimos que estas implementaciones existen
 from magnesium.interfaces.data_encoder import Utf8Encoder
+from magnesium.interfaces.delta_encoder import LineDeltaEncoder
+from magnesium.interfaces.differ import Differ, MyersDiff
 from magnesium.interfaces.file_store import LocalFileStore
+from magnesium.interfaces.object_pack import LocalObjectPack
 from magnesium.interfaces.object_path_builder import LocalObjectPathBuilder
-from magnesium.interfaces.object_repository import (
-    LocalObjectRepository,
-    ObjectRepository,
-)
-from magnesium.interfaces.logs_repository import LocalLogRepository, LogRepository
+from magnesium.interfaces.object_repository import LocalObjectRepository
+from magnesium.interfaces.logs_repository import LocalLogRepository
+from magnesium.interfaces.snapshot_index import LocalSnapshotIndex, SnapshotIndex
 from magnesium.object_values import (
-    Blob,
     Commit,
     DirEntry,
     Email,
@@ -28,24 +34,50 @@ class SimpleSnapshotTool:
     """Herramienta simple para crear snapshots del directorio actual"""
 
     repo_dir: Path
-    repository: ObjectRepository
-    log_repo: LogRepository
+    repository: LocalObjectRepository
+    log_repo: LocalLogRepository
+    commit_graph: CommitGraph
+    differ: Differ
+    index: SnapshotIndex
     work_dir: Path
+    workers: int
 
-    def __init__(self, work_dir: str, repo_dir: str = ".mg"):
+    def __init__(self, work_dir: str, repo_dir: str = ".mg", workers: int = 1):
         self.repo_dir = Path(repo_dir)
         self.work_dir = Path(work_dir)
+        # Hilos para leer, hashear y comprimir archivos (1 = modo serial)
+        self.workers = workers
         encoder = Utf8Encoder()
-        compressor = GzipCompressor()
+        # zlib nivel 6 es mucho más rápido que gzip nivel 9; los objetos gzip
+        # de repositorios anteriores se siguen leyendo
+        compressor = TaggedCompressor(ZlibCompressor(6))
         store = LocalFileStore()
         path_builder = LocalObjectPathBuilder(self.repo_dir / "objects")
+        pack = LocalObjectPack(
+            self.repo_dir / "packs", store, compressor, LineDeltaEncoder()
+        )
 
         self.repository = LocalObjectRepository(
-            self.repo_dir, store, encoder, compressor, path_builder
+            self.repo_dir, store, encoder, compressor, path_builder, pack
         )
 
+        # El log vuelve a cargar los mismos commits una y otra vez
         self.log_repo = LocalLogRepository(
-            self.repo_dir / "logs", store, encoder, path_builder, self.repository
+            self.repo_dir / "logs",
+            store,
+            encoder,
+            path_builder,
+            CachedObjectRepository(self.repository),
+        )
+
+        self.index = LocalSnapshotIndex(self.repo_dir / "index", store, encoder)
+        self.commit_graph = LocalCommitGraph(self.repo_dir / "graph", store)
+        # El diff entre dos shas no cambia nunca: se guarda entre ejecuciones
+        self.differ = CachedDiffer(
+            MyersDiff(self.repository),
+            self.repository,
+            self.repo_dir / "diff-cache",
+            store,
         )
 
     def initialize_repository(self) -> bool:
@@ -81,17 +113,59 @@ class SimpleSnapshotTool:
 
     def create_blob_from_file(self, file_path: Path) -> Sha256Hash:
         """Crea un blob a partir de un archivo"""
-        try:
-            assert self.repository is not None
-            content = file_path.read_text(encoding="utf-8")
-            blob = Blob(content=content)
-            return self.repository.save(blob)
-        except UnicodeDecodeError:
-            # Para archivos binarios, podríamos usar base64, pero por simplicidad los omitimos
-            raise ValueError(f"Archivo no es texto UTF-8: {file_path}")
+        assert self.repository is not None
+        # Se guarda en streaming: el archivo nunca se carga entero.
+        # Los blobs son bytes, así que los archivos binarios también se guardan
+        return self.repository.save_file(file_path)
 
     def build_tree(self, directory: Path) -> Sha256Hash:
         """Construye un tree recursivamente desde un directorio"""
+        hashed: dict[str, tuple[os.stat_result, Sha256Hash | Exception]] = {}
+        if self.workers > 1:
+            hashed = self._hash_files_in_parallel(directory)
+        return self._build_tree(directory, hashed)
+
+    def _hash_files_in_parallel(
+        self, directory: Path
+    ) -> dict[str, tuple[os.stat_result, Sha256Hash | Exception]]:
+        """
+        Guarda en paralelo los blobs de los archivos que cambiaron.
+        hashlib y zlib liberan el GIL, así que los hilos aprovechan varios
+        núcleos. El tree se arma después en orden, igual que en modo serial.
+        """
+        pending: list[tuple[str, Path, os.stat_result]] = []
+        directories = [directory]
+        while directories:
+            current = directories.pop()
+            for item in current.iterdir():
+                if item.name.startswith("."):
+                    continue
+                if item.is_file():
+                    relative_path = item.relative_to(self.work_dir).as_posix()
+                    stat = item.stat()
+                    if self.index.lookup_file(relative_path, stat) is None:
+                        pending.append((relative_path, item, stat))
+                elif item.is_dir():
+                    directories.append(item)
+
+        def save_blob(file_path: Path) -> Sha256Hash | Exception:
+            try:
+                return self.create_blob_from_file(file_path)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(save_blob, [item for _, item, _ in pending])
+            return {
+                relative_path: (stat, result)
+                for (relative_path, _, stat), result in zip(pending, results)
+            }
+
+    def _build_tree(
+        self,
+        directory: Path,
+        hashed: dict[str, tuple[os.stat_result, Sha256Hash | Exception]],
+    ) -> Sha256Hash:
         assert self.repository is not None
         directories: list[DirEntry] = []
         files: list[FileEntry] = []
@@ -105,7 +179,21 @@ class SimpleSnapshotTool:
 
             if item.is_file():
                 try:
-                    file_hash = self.create_blob_from_file(item)
+                    # Sólo se vuelve a leer el archivo si cambió su stat
+                    relative_path = item.relative_to(self.work_dir).as_posix()
+                    if relative_path in hashed:
+                        # Ya se guardó en paralelo
+                        stat, result = hashed[relative_path]
+                        if isinstance(result, Exception):
+                            raise result
+                        file_hash = result
+                        self.index.record_file(relative_path, stat, file_hash)
+                    else:
+                        stat = item.stat()
+                        file_hash = self.index.lookup_file(relative_path, stat)
+                        if file_hash is None:
+                            file_hash = self.create_blob_from_file(item)
+                            self.index.record_file(relative_path, stat, file_hash)
                     file_mode = 0o644  # Permisos por defecto
 
                     files.append(
@@ -118,7 +206,7 @@ class SimpleSnapshotTool:
 
             elif item.is_dir():
                 # Procesar subdirectorio recursivamente
-                subdir_hash = self.build_tree(item)
+                subdir_hash = self._build_tree(item, hashed)
                 dir_mode = 0o755
 
                 directories.append(
@@ -126,9 +214,17 @@ class SimpleSnapshotTool:
                 )
                 print(f"  📁 {item.name}/")
 
+        # Si las entradas no cambiaron, reutilizar el tree del índice
+        relative_dir = directory.relative_to(self.work_dir).as_posix()
+        tree_hash = self.index.lookup_tree(relative_dir, directories, files)
+        if tree_hash is not None and self.repository.exists(tree_hash):
+            return tree_hash
+
         # Crear y guardar el tree
         tree = Tree(directories=directories, files=files)
-        return self.repository.save(tree)
+        tree_hash = self.repository.save(tree)
+        self.index.record_tree(relative_dir, directories, files, tree_hash)
+        return tree_hash
 
     def create_snapshot(self):
         """Crea un snapshot del directorio actual"""
@@ -141,46 +237,95 @@ class SimpleSnapshotTool:
         # Construir el tree del directorio actual
         print("\n📁 Procesando archivos...")
         tree_hash = self.build_tree(current_dir)
+        self.index.save()
         print(f"✅ Tree creado: {tree_hash.sha[:8]}...")
 
-        # Crear el commit
+        # Crear el commit sobre el HEAD actual
+        head = self.log_repo.get_head()
         commit = Commit(
             author=author,
             email=Email(email),
             message=message,
             date=datetime.now(),
             tree=tree_hash,
-            parents=[],  # Por simplicidad, sin padres
+            parents=[head] if head is not None else [],
         )
 
         # Guardar el commit
         commit_hash = self.repository.save(commit)
         # Loggear el commit
         self.log_repo.push(commit_hash)
+        self.update_commit_graph(commit_hash)
         print(f"✅ Commit creado: {commit_hash.sha}")
 
         return commit_hash
 
-    def show_history(self):
-        """Show commit history"""
-        if not self.log_repo:
+    def update_commit_graph(self, commit_hash: Sha256Hash):
+        """
+        Agrega el commit al grafo, junto con los ancestros que falten (por
+        ejemplo, en un repositorio creado antes de que existiera el grafo).
+        """
+        pending: list[tuple[Sha256Hash, Commit]] = []
+        seen: set[Sha256Hash] = set()
+        stack = [commit_hash]
+        while stack:
+            sha = stack.pop()
+            if sha in seen or self.commit_graph.contains(sha):
+                continue
+            seen.add(sha)
+            commit = self.repository.load(sha)
+            if not isinstance(commit, Commit):
+                raise ValueError(f"Object {sha.sha} is not a Commit")
+            pending.append((sha, commit))
+            stack.extend(commit.parents)
+        self.commit_graph.add(pending)
+
+    def show_history(self, limit: int = 20):
+        """Show the most recent commits, newest first"""
+        if self.log_repo is None:
             print("Log repository not initialized")
             return
 
-        commits = self.log_repo.load()
+        total = len(self.log_repo)
 
         print("\n📜 Commit History:")
         print("=" * 80)
 
-        # Mostrar en orden inverso (más reciente primero)
-        for i, commit in enumerate(reversed(commits)):
-            print(f"\n┌── Commit #{len(commits) - i}")
-            print(f"├─ Hash: {self.repository.hash_object(commit).sha}...")
+        # El log se recorre desde el HEAD: sólo se cargan los commits mostrados
+        for i, (sha, commit) in enumerate(self.log_repo.iter_commits(limit=limit)):
+            print(f"\n┌── Commit #{total - i}")
+            print(f"├─ Hash: {sha.sha}...")
             print(f"├─ Autor: {commit.author} <{commit.email.email}>")
             print(f"├─ Fecha: {commit.date.strftime('%Y-%m-%d %H:%M:%S')}")
             print(f"└─ Mensaje: {commit.message}")
             print("─" * 80)
 
+        if total > limit:
+            print(f"... y {total - limit} commits más antiguos")
+
+    def show_patch(self, commit_hash: Sha256Hash | None = None):
+        """Muestra el patch de un commit (por defecto, el último)"""
+        if commit_hash is None:
+            head = next(self.log_repo.iter_commits(limit=1), None)
+            if head is None:
+                print("No hay commits todavía")
+                return
+            commit_hash = head[0]
+
+        print(f"\n🩹 Patch de {commit_hash.sha}")
+        print("=" * 80)
+        # El patch se imprime a medida que se genera, archivo por archivo
+        for line in commit_patch(self.repository, commit_hash, differ=self.differ):
+            print(line, end="")
+
+    def repack_objects(self):
+        """Empaqueta los objetos sueltos y compacta el log de commits"""
+        print("\n📦 Empaquetando objetos...")
+        packed = self.repository.repack()
+        print(f"✅ {packed} objetos empaquetados")
+        discarded = self.log_repo.compact()
+        print(f"✅ {discarded} registros descartados del log")
+
     def show_menu(self):
         """Muestra el menú principal"""
         print("\n" + "=" * 50)
@@ -188,6 +333,8 @@ class SimpleSnapshotTool:
         print("=" * 50)
         print("1. 📷 Crear nuevo snapshot")
         print("2. 📜 Mostrar historial de commits")
+        print("3. 📦 Empaquetar objetos (repack)")
+        print("4. 🩹 Ver patch del último commit")
         print("0. ❌ Salir")
 
     def run(self):
@@ -203,7 +350,7 @@ class SimpleSnapshotTool:
             self.show_menu()
 
             try:
-                choice = input("\n👉 Selecciona una opción (0-2): ").strip()
+                choice = input("\n👉 Selecciona una opción (0-4): ").strip()
 
                 if choice == "1":
                     # Crear snapshot
@@ -220,12 +367,18 @@ class SimpleSnapshotTool:
                 elif choice == "2":
                     self.show_history()
 
+                elif choice == "3":
+                    self.repack_objects()
+
+                elif choice == "4":
+                    self.show_patch()
+
                 elif choice == "0":
                     print("\n👋 ¡Hasta luego!")
                     break
 
                 else:
-                    print("❌ Opción inválida. Por favor selecciona 1-4.")
+                    print("❌ Opción inválida. Por favor selecciona 0-4.")
 
             except KeyboardInterrupt:
                 print("\n\n⚠️  Operación cancelada por el usuario")
@@ -238,7 +391,7 @@ class SimpleSnapshotTool:
 
 def main():
     """Función principal"""
-    tool = SimpleSnapshotTool(Path(".mg").parent._str)
+    tool = SimpleSnapshotTool(Path(".mg").parent._str, workers=os.cpu_count() or 1)
     return tool.run()
 
 
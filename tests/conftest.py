@@ -0,0 +1,21 @@
+import contextlib
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from mg import SimpleSnapshotTool  # noqa: E402
+
+
+@pytest.fixture
+def tool(tmp_path: Path) -> SimpleSnapshotTool:
+    """Una herramienta con un repositorio vacío en un directorio temporal"""
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    tool = SimpleSnapshotTool(str(work_dir), str(tmp_path / ".mg"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        tool.initialize_repository()
+    return tool
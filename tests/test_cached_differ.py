@@ -0,0 +1,52 @@
+from magnesium.application.patch import file_patch
+from magnesium.interfaces.cached_differ import CachedDiffer
+from magnesium.interfaces.differ import MyersDiff
+from magnesium.interfaces.file_store import LocalFileStore
+from magnesium.object_values import Blob, FileEntry
+
+
+def make_differ(tool, **options) -> CachedDiffer:
+    return CachedDiffer(
+        MyersDiff(tool.repository),
+        tool.repository,
+        tool.repo_dir / "diff-cache",
+        LocalFileStore(),
+        **options,
+    )
+
+
+def test_patch_uses_the_known_shas(tool, monkeypatch):
+    previous = FileEntry("a.txt", 0o644, tool.repository.save(Blob("uno\ndos\n")))
+    current = FileEntry("a.txt", 0o644, tool.repository.save(Blob("uno\ntres\n")))
+    differ = make_differ(tool)
+
+    def hash_object(obj):
+        raise AssertionError("the blobs were hashed again")
+
+    monkeypatch.setattr(tool.repository, "hash_object", hash_object)
+    patch = "".join(file_patch(tool.repository, differ, previous, current))
+
+    assert "-dos\n+tres\n" in patch
+    assert differ.misses == 1
+
+
+def test_memory_limit_counts_the_decoded_lines(tool):
+    base = tool.repository.save(Blob("x\n" * 100))
+    source = tool.repository.save(Blob("y\n" * 100))
+    # Los blobs ocupan 400 bytes, pero sus 200 líneas decodificadas mucho más
+    differ = make_differ(tool, max_bytes=4096)
+
+    differ.diff_shas(tool.repository, base, source)
+
+    assert len(differ) == 0
+
+
+def test_callers_cannot_modify_cached_diffs(tool):
+    base = tool.repository.save(Blob("uno\n"))
+    source = tool.repository.save(Blob("uno\ndos\n"))
+    differ = make_differ(tool)
+
+    differ.diff_shas(tool.repository, base, source).additions.clear()
+
+    assert len(differ.diff_shas(tool.repository, base, source).additions) == 1
+    assert differ.hits == 1
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from magnesium.interfaces.cached_object_repository import CachedObjectRepository
+from magnesium.object_values import Blob, Commit, Email, FileEntry, Tree
+
+
+def test_callers_cannot_modify_cached_objects(tool):
+    blob = tool.repository.save(Blob("hola\n"))
+    tree = tool.repository.save(
+        Tree(directories=[], files=[FileEntry("a.txt", 0o644, blob)])
+    )
+    commit = tool.repository.save(
+        Commit(
+            "autor",
+            Email("autor@ejemplo.cl"),
+            "mensaje",
+            datetime(2024, 1, 1),
+            tree,
+            [],
+        )
+    )
+    cache = CachedObjectRepository(tool.repository)
+
+    for _ in range(2):
+        loaded_tree = cache.load(tree)
+        assert isinstance(loaded_tree, Tree)
+        loaded_tree.files[0].name = "b.txt"
+        loaded_tree.files.clear()
+        loaded_commit = cache.load(commit)
+        assert isinstance(loaded_commit, Commit)
+        loaded_commit.parents.append(tree)
+
+    assert cache.hits == 2
+    assert [file.name for file in cache.load(tree).files] == ["a.txt"]
+    assert cache.load(commit).parents == []
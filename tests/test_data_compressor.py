@@ -0,0 +1,29 @@
+import pytest
+
+from magnesium.interfaces.data_compressor import (
+    GzipCompressor,
+    LzmaCompressor,
+    TaggedCompressor,
+    ZlibCompressor,
+)
+
+
+def test_tagged_round_trip_and_legacy_gzip():
+    compressor = TaggedCompressor(ZlibCompressor())
+    data = b"contenido " * 100
+
+    assert compressor.decompress(compressor.compress(data)) == data
+    assert compressor.decompress(b"".join(compressor.compress_stream([data]))) == data
+    # Los objetos sin etiqueta son gzip puro
+    assert compressor.decompress(GzipCompressor().compress(data)) == data
+    # Se descomprime con el codec de la etiqueta, no con el de por defecto
+    lzma_object = TaggedCompressor(LzmaCompressor()).compress(data)
+    assert compressor.decompress(lzma_object) == data
+
+
+@pytest.mark.parametrize("data", [b"", b"\xfe\x00"])
+def test_tagged_rejects_missing_or_unknown_tag(data):
+    compressor = TaggedCompressor(ZlibCompressor())
+
+    with pytest.raises(ValueError, match="Unknown compression codec tag"):
+        compressor.decompress(data)
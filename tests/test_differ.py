@@ -0,0 +1,305 @@
+import random
+from hashlib import sha256
+
+import pytest
+
+from magnesium.interfaces.differ import (
+    Differ,
+    HeuristicDiff,
+    HistogramDiff,
+    MyersDiff,
+    PatienceDiff,
+)
+from magnesium.object_values import Blob, DirEntry, FileEntry, Sha256Hash, Tree
+
+
+def sha_of(text: str) -> Sha256Hash:
+    return Sha256Hash(sha256(text.encode()).hexdigest())
+
+
+def save_tree(tool, files: dict[str, str]) -> Tree:
+    """Un tree plano con los archivos dados, guardando sus blobs"""
+    return Tree(
+        directories=[],
+        files=[
+            FileEntry(name, 0o644, tool.repository.save(Blob(content)))
+            for name, content in files.items()
+        ],
+    )
+
+
+def text(lines: int, changed: int = 0) -> str:
+    """`lines` líneas distintas, de las que las primeras `changed` cambian"""
+    return "".join(
+        f"línea {i} {'cambiada' if i < changed else 'original'} del archivo\n"
+        for i in range(lines)
+    )
+
+
+def names(entries) -> list[tuple[str, str]]:
+    return [(entry.previous.name, entry.content.name) for entry in entries]
+
+
+def test_changed_directory_without_repository_is_deleted_and_added():
+    base = Tree(directories=[DirEntry("src", 0o40000, sha_of("antes"))], files=[])
+    source = Tree(directories=[DirEntry("src", 0o40000, sha_of("después"))], files=[])
+
+    diff = MyersDiff().diff_trees(base, source)
+
+    assert [entry.content.sha for entry in diff.deleted_dirs] == [sha_of("antes")]
+    assert [entry.content.sha for entry in diff.added_dirs] == [sha_of("después")]
+
+
+ALGORITHMS = [MyersDiff, PatienceDiff, HistogramDiff, HeuristicDiff]
+
+BASE_C = """#include <stdio.h>
+
+// Frobs foo heartily
+int frobnitz(int foo)
+{
+    int i;
+    for(i = 0; i < 10; i++)
+    {
+        printf("Your answer is: ");
+        printf("%d\\n", foo);
+    }
+}
+
+int fact(int n)
+{
+    if(n > 1)
+    {
+        return fact(n-1) * n;
+    }
+    return 1;
+}
+
+int main(int argc, char **argv)
+{
+    frobnitz(fact(10));
+}
+"""
+
+FIB = """int fib(int n)
+{
+    if(n > 2)
+    {
+        return fib(n-1) + fib(n-2);
+    }
+    return 1;
+}
+
+"""
+
+SOURCE_C = """#include <stdio.h>
+
+""" + FIB + """// Frobs foo heartily
+int frobnitz(int foo)
+{
+    int i;
+    for(i = 0; i < 10; i++)
+    {
+        printf("%d\\n", foo);
+    }
+}
+
+int main(int argc, char **argv)
+{
+    frobnitz(fib(10));
+}
+"""
+
+
+def rebuild(
+    opcodes: list[tuple[str, int, int, int, int]], base: list[str], source: list[str]
+) -> list[str]:
+    """Arma el resultado desde la base: los tramos iguales salen de la base"""
+    result: list[str] = []
+    base_end = source_end = 0
+    for operation, base_start, base_length, source_start, source_length in opcodes:
+        assert (base_start, source_start) == (base_end, source_end)
+        base_end += base_length
+        source_end += source_length
+        if operation == "equal":
+            assert base[base_start:base_end] == source[source_start:source_end]
+            result += base[base_start:base_end]
+        else:
+            result += source[source_start:source_end]
+    assert base_end == len(base)
+    return result
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_opcodes_rebuild_the_source(algorithm: type[Differ]):
+    generator = random.Random(20)
+    alphabet = ["{\n", "}\n", "\n", "a\n", "b\n", "c\n", "return x;\n"]
+    differ = algorithm()
+    for size in [0, 1, 5, 40] * 25 + [3000]:
+        base = generator.choices(alphabet, k=generator.randint(0, size))
+        source = generator.choices(alphabet, k=generator.randint(0, size))
+        assert rebuild(differ.diff_lines(base, source), base, source) == source
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_braces_do_not_split_an_added_function(algorithm: type[Differ]):
+    base, source = BASE_C.splitlines(True), SOURCE_C.splitlines(True)
+
+    opcodes = algorithm().diff_lines(base, source)
+
+    changes = [operation for operation in opcodes if operation[0] != "equal"]
+    shapes = [(op, base_len, source_len) for op, _, base_len, _, source_len in changes]
+    assert shapes == [
+        ("insert", 0, 9),
+        ("delete", 1, 0),
+        ("delete", 9, 0),
+        ("replace", 1, 1),
+    ]
+    _, _, _, start, length = changes[0]
+    assert "".join(source[start : start + length]) == FIB
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_moved_block_is_one_deletion_and_one_insertion(algorithm: type[Differ]):
+    base = ["uno\n", "dos\n", "tres\n", "cuatro\n", "cinco\n", "seis\n"]
+    source = base[3:] + base[:3]
+
+    opcodes = algorithm().diff_lines(base, source)
+
+    changes = sorted(operation[0] for operation in opcodes if operation[0] != "equal")
+    assert changes == ["delete", "insert"]
+    assert rebuild(opcodes, base, source) == source
+
+
+def test_inline_diff_offsets_by_word_and_by_char():
+    differ = MyersDiff()
+    base = Blob("el gato negro\nigual\n")
+    source = Blob("el perro negro\nigual\n")
+    diff = differ.diff_blobs(base, source)
+
+    [by_word] = differ.diff_inline(diff)
+    [by_char] = differ.diff_inline(diff, granularity="char")
+
+    assert (by_word.base_position, by_word.source_position) == (0, 0)
+    assert by_word.opcodes == [
+        ("equal", 0, 3, 0, 3),
+        ("replace", 3, 4, 3, 5),
+        ("equal", 7, 7, 8, 7),
+    ]
+    # "gato" -> "perro" comparten la "o" final
+    assert by_char.opcodes == [
+        ("equal", 0, 3, 0, 3),
+        ("replace", 3, 3, 3, 4),
+        ("equal", 6, 8, 7, 8),
+    ]
+
+
+def test_inline_diff_skips_long_lines():
+    differ = MyersDiff()
+    base = Blob("uno dos\n" + "x" * 40 + "\n")
+    source = Blob("uno tres\n" + "y" * 40 + "\n")
+
+    inline = differ.diff_inline(differ.diff_blobs(base, source), max_line_length=20)
+
+    assert [(line.base_position, line.source_position) for line in inline] == [(0, 0)]
+
+
+def test_exact_rename_is_found_by_sha(tool):
+    base = save_tree(tool, {"viejo.txt": text(10)})
+    source = save_tree(tool, {"nuevo.txt": text(10)})
+
+    diff = MyersDiff(tool.repository).diff_trees(base, source)
+
+    assert names(diff.renamed_files) == [("viejo.txt", "nuevo.txt")]
+    assert diff.renamed_files[0].similarity == 100
+    assert diff.added_files == [] and diff.deleted_files == []
+
+
+@pytest.mark.parametrize("changed, renamed", [(2, True), (8, False)])
+def test_edited_rename_depends_on_the_threshold(tool, changed: int, renamed: bool):
+    base = save_tree(tool, {"viejo.txt": text(10)})
+    source = save_tree(tool, {"nuevo.txt": text(10, changed)})
+
+    diff = MyersDiff(tool.repository).diff_trees(base, source)
+
+    if renamed:
+        assert names(diff.renamed_files) == [("viejo.txt", "nuevo.txt")]
+        assert 50 <= diff.renamed_files[0].similarity < 100
+        assert diff.added_files == [] and diff.deleted_files == []
+    else:
+        assert diff.renamed_files == []
+        assert [entry.content.name for entry in diff.added_files] == ["nuevo.txt"]
+        assert [entry.content.name for entry in diff.deleted_files] == ["viejo.txt"]
+
+
+def test_closest_added_file_takes_the_only_source(tool):
+    base = save_tree(tool, {"viejo.txt": text(10)})
+    source = save_tree(tool, {"a.txt": text(10, 3), "b.txt": text(10, 1)})
+
+    diff = MyersDiff(tool.repository).diff_trees(base, source)
+
+    assert names(diff.renamed_files) == [("viejo.txt", "b.txt")]
+    assert [entry.content.name for entry in diff.added_files] == ["a.txt"]
+    assert diff.deleted_files == []
+
+
+def test_copies_of_modified_files_need_detect_copies(tool):
+    base = save_tree(tool, {"modelo.txt": text(10)})
+    source = save_tree(
+        tool,
+        {
+            "modelo.txt": text(10, 1),
+            "exacta.txt": text(10),
+            "parecida.txt": text(10, 2),
+        },
+    )
+
+    plain = MyersDiff(tool.repository).diff_trees(base, source)
+    with_copies = MyersDiff(tool.repository, detect_copies=True).diff_trees(
+        base, source
+    )
+
+    assert plain.copied_files == [] and len(plain.added_files) == 2
+    assert sorted(names(with_copies.copied_files)) == [
+        ("modelo.txt", "exacta.txt"),
+        ("modelo.txt", "parecida.txt"),
+    ]
+    assert with_copies.added_files == []
+    assert len(with_copies.modified_files) == 1
+
+
+def test_rename_threshold_none_keeps_only_exact_renames(tool):
+    base = save_tree(tool, {"a.txt": text(10), "b.txt": text(12)})
+    source = save_tree(tool, {"c.txt": text(10), "d.txt": text(12, 1)})
+
+    diff = MyersDiff(tool.repository, rename_threshold=None).diff_trees(base, source)
+
+    assert names(diff.renamed_files) == [("a.txt", "c.txt")]
+    assert [entry.content.name for entry in diff.added_files] == ["d.txt"]
+    assert [entry.content.name for entry in diff.deleted_files] == ["b.txt"]
+
+
+def test_common_chunks_do_not_change_the_similarity(tool):
+    shared = "".join(f"licencia {i}\n" for i in range(5))
+    other = "".join(f"otro archivo {i}\n" for i in range(20))
+    base = save_tree(tool, {"uno.txt": shared + text(10), "dos.txt": shared + other})
+    source = save_tree(tool, {"tres.txt": shared + text(10, 2)})
+
+    differ = MyersDiff(tool.repository)
+    expected = differ.diff_trees(base, source).renamed_files
+    # Con un límite de 1, las líneas de licencia (en los dos borrados) se
+    # saltean al elegir candidatos, pero el parecido final es el mismo
+    differ.COMMON_CHUNK = 1
+    renamed = differ.diff_trees(base, source).renamed_files
+
+    assert names(renamed) == names(expected) == [("uno.txt", "tres.txt")]
+    assert renamed[0].similarity == expected[0].similarity
+
+
+def test_files_of_very_different_size_are_not_paired(tool):
+    base = save_tree(tool, {"grande.txt": text(40)})
+    source = save_tree(tool, {"chico.txt": text(4)})
+
+    diff = MyersDiff(tool.repository).diff_trees(base, source)
+
+    assert diff.renamed_files == []
+    assert len(diff.added_files) == len(diff.deleted_files) == 1
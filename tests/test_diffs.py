@@ -0,0 +1,27 @@
+import pytest
+
+from magnesium.object_values import AddedLine, DeletedLine, UnchangedLine
+from magnesium.object_values.diffs import BlobDiff, OpcodeBlobDiff
+
+
+def test_opcode_diff_is_slotted_and_equal_to_its_blob_diff_view():
+    diff = OpcodeBlobDiff(
+        [("equal", 0, 1, 0, 1), ("replace", 1, 1, 1, 2)],
+        ["uno\n", "dos\n"],
+        ["uno\n", "DOS\n", "tres\n"],
+    )
+    view = BlobDiff(
+        additions=[AddedLine(1, "DOS\n"), AddedLine(2, "tres\n")],
+        deletions=[DeletedLine(1, "dos\n")],
+        unchanged_lines=[UnchangedLine(0, "uno\n")],
+    )
+
+    assert not hasattr(diff, "__dict__")
+    assert diff == view
+    assert view == diff
+    assert diff != BlobDiff([], [], [UnchangedLine(0, "uno\n")])
+
+
+def test_opcodes_must_cover_both_blobs():
+    with pytest.raises(AssertionError):
+        OpcodeBlobDiff([("equal", 0, 1, 0, 1)], ["uno\n", "dos\n"], ["uno\n"])
@@ -0,0 +1,52 @@
+import copy
+import pickle
+from hashlib import sha256
+
+import pytest
+
+from magnesium.object_values import Sha256Hash
+
+HEX = sha256(b"hola").hexdigest()
+
+
+def test_hash_from_bytes_equals_hash_from_hex():
+    from_hex = Sha256Hash(HEX)
+    from_bytes = Sha256Hash.from_bytes(sha256(b"hola").digest())
+
+    assert from_hex == from_bytes
+    assert hash(from_hex) == hash(from_bytes)
+    assert len({from_hex, from_bytes}) == 1
+    assert from_bytes.sha == HEX
+    assert from_hex != Sha256Hash(sha256(b"chao").hexdigest())
+
+
+@pytest.mark.parametrize(
+    "value", [HEX.upper(), HEX[:-1], f" {HEX[1:]}", f"{HEX[:-1]} ", "g" * 64, 42]
+)
+def test_invalid_hashes_are_rejected(value):
+    with pytest.raises(ValueError):
+        Sha256Hash(value)
+    assert not Sha256Hash.is_valid(value)
+
+
+def test_from_bytes_requires_a_full_digest():
+    with pytest.raises(ValueError):
+        Sha256Hash.from_bytes(b"\x00" * 31)
+
+
+def test_hash_is_immutable_and_survives_copies():
+    sha = Sha256Hash(HEX)
+
+    with pytest.raises(AttributeError):
+        sha._digest = b"\x00" * 32
+    assert pickle.loads(pickle.dumps(sha)) == sha
+    assert copy.deepcopy(sha) == sha
+    assert copy.copy(sha).sha == HEX
+
+
+def test_intern_returns_the_canonical_instance():
+    first = Sha256Hash(HEX).intern()
+    second = Sha256Hash.from_bytes(bytes.fromhex(HEX)).intern()
+
+    assert first is second
+    assert Sha256Hash(HEX).intern() is first
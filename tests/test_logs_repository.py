@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from magnesium.interfaces.data_encoder import Utf8Encoder
+from magnesium.interfaces.file_store import LocalFileStore
+from magnesium.interfaces.logs_repository import LocalLogRepository
+from magnesium.interfaces.object_path_builder import LocalObjectPathBuilder
+from magnesium.object_values import Commit, Email, Sha256Hash, Tree
+
+
+def make_commits(tool, count: int) -> list[Sha256Hash]:
+    """Crea `count` commits encadenados y los agrega al log"""
+    tree = tool.repository.save(Tree(directories=[], files=[]))
+    shas: list[Sha256Hash] = []
+    for i in range(count):
+        commit = Commit(
+            "autor",
+            Email("autor@ejemplo.cl"),
+            f"commit {i}",
+            datetime(2024, 1, 1, 0, i),
+            tree,
+            shas[-1:],
+        )
+        sha = tool.repository.save(commit)
+        tool.log_repo.push(sha)
+        shas.append(sha)
+    return shas
+
+
+def reopen_log(tool) -> LocalLogRepository:
+    """El log visto por otro proceso: sin índice en memoria"""
+    return LocalLogRepository(
+        tool.repo_dir / "logs",
+        LocalFileStore(),
+        Utf8Encoder(),
+        LocalObjectPathBuilder(tool.repo_dir / "objects"),
+        tool.repository,
+    )
+
+
+def test_persisted_index_follows_the_chain(tool):
+    shas = make_commits(tool, 3)
+    tool.log_repo.pop()
+
+    logs = tool.repo_dir / "logs"
+    index = (logs / "index").read_text(encoding="utf-8").split("\n")[:-1]
+    assert index == [sha.sha for sha in shas[:2]]
+    assert (logs / "tip").read_text(encoding="utf-8").endswith("\x1f2")
+
+
+def test_history_pages_come_from_the_persisted_index(tool):
+    shas = make_commits(tool, 5)
+    tool.log_repo.pop()
+
+    reopened = reopen_log(tool)
+    expected = shas[3::-1]
+    assert len(reopened) == 4
+    assert [sha for sha, _ in reopened.iter_commits(limit=2, offset=1)] == expected[1:3]
+    # Un índice que no coincide con el tip se ignora y se usa el log
+    (tool.repo_dir / "logs" / "index").write_text("", encoding="utf-8")
+    assert [sha for sha, _ in reopen_log(tool).iter_commits()] == expected
+
+
+def test_corrupt_tip_size_falls_back_to_the_log(tool):
+    shas = make_commits(tool, 2)
+    tip_file = tool.repo_dir / "logs" / "tip"
+    tip_file.write_text(f"{shas[0].sha}\x1fno-es-un-número", encoding="utf-8")
+
+    assert reopen_log(tool).get_head() == shas[-1]
+
+
+def test_pop_from_the_middle_keeps_the_last_commit_as_head(tool):
+    root, first, middle, last = make_commits(tool, 4)
+
+    tool.log_repo.pop(middle)
+
+    assert tool.log_repo.get_head() == last
+    reopened = reopen_log(tool)
+    assert reopened.get_head() == last
+    assert [sha for sha, _ in reopened.iter_commits()] == [last, first, root]
@@ -0,0 +1,15 @@
+from magnesium.application.merge import merge_blobs
+from magnesium.object_values import Blob
+
+
+def test_merge_keeps_bytes_that_are_not_utf8():
+    base = Blob("acción\nuno\ndos\n".encode("latin-1"))
+    ours = Blob("acción\nUNO\ndos\n".encode("latin-1"))
+    theirs = Blob("acción\nuno\ndos\ntres\r\x0cfin\n".encode("latin-1"))
+
+    merged, hunks = merge_blobs(base, ours, theirs)
+
+    assert hunks == []
+    assert bytes(merged.content) == "acción\nUNO\ndos\ntres\r\x0cfin\n".encode(
+        "latin-1"
+    )
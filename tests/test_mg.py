@@ -0,0 +1,6 @@
+def test_history_of_an_empty_log_is_shown(tool, capsys):
+    tool.show_history()
+
+    output = capsys.readouterr().out
+    assert "not initialized" not in output
+    assert "Commit History" in output
@@ -0,0 +1,62 @@
+from hashlib import sha256
+
+import pytest
+
+from magnesium.interfaces.object_repository import LocalObjectRepository
+from magnesium.object_values import Blob, Sha256Hash
+
+US = LocalObjectRepository.UNIT_SEPARATOR
+GS = LocalObjectRepository.GROUP_SEPARATOR
+RS = LocalObjectRepository.RECORD_SEPARATOR
+
+
+def write_raw(tool, content: str) -> Sha256Hash:
+    """Guarda un objeto ya serializado, tal cual"""
+    data = content.encode("utf-8")
+    sha = Sha256Hash(sha256(data).hexdigest())
+    tool.repository._write_object(sha, data)
+    return sha
+
+
+def write_legacy(tool, type_name: str, body: str) -> Sha256Hash:
+    """Como la versión original: el header lleva el tamaño en caracteres"""
+    return write_raw(tool, f"{type_name}{US}{len(body)}{GS}{body}")
+
+
+def test_legacy_blob_with_non_ascii_text(tool):
+    sha = write_legacy(tool, "blob", "canción\n")
+
+    blob = tool.repository.load(sha)
+
+    assert isinstance(blob, Blob)
+    assert bytes(blob.content) == "canción\n".encode("utf-8")
+
+
+def test_size_mismatch_is_still_rejected(tool):
+    sha = write_raw(tool, f"blob{US}99{GS}canción\n")
+
+    with pytest.raises(ValueError, match="Size mismatch"):
+        tool.repository.load(sha)
+
+
+def test_legacy_tree_and_commit_with_non_ascii_metadata(tool):
+    blob = tool.repository.save(Blob("hola\n"))
+    tree = write_legacy(
+        tool, "tree", f"blob{US}420{US}{blob.sha}{US}canción.txt{RS}"
+    )
+    commit = write_legacy(
+        tool,
+        "commit",
+        US.join(
+            ["José", "jose@ejemplo.cl", "2024-01-01T00:00:00", "Añadir función"]
+            + [tree.sha]
+        ),
+    )
+
+    loaded_tree = tool.repository.load(tree)
+    loaded_commit = tool.repository.load(commit)
+
+    assert [file.name for file in loaded_tree.files] == ["canción.txt"]
+    assert loaded_commit.author == "José"
+    assert loaded_commit.message == "Añadir función"
+    assert loaded_commit.tree == tree
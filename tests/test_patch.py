@@ -0,0 +1,17 @@
+from magnesium.application.patch import NO_NEWLINE, unified_diff
+from magnesium.interfaces.differ import MyersDiff
+from magnesium.object_values import Blob
+
+
+def test_only_newline_ends_a_patch_line():
+    base = Blob("uno\r dos\n\x0ctres cuatro\n")
+    source = Blob("uno\r dos\n\x0cTRES cuatro\n")
+
+    diff = MyersDiff().diff_blobs(base, source)
+
+    lines = list(unified_diff("texto", "texto", diff))
+
+    assert lines[:2] == ["--- a/texto\n", "+++ b/texto\n"]
+    patch = "".join(lines)
+    assert NO_NEWLINE not in patch
+    assert "-\x0ctres cuatro\n+\x0cTRES cuatro\n" in patch